@@ -1,9 +1,13 @@
+import logging
+
 from django.shortcuts import render, redirect
 from django.http import HttpRequest, HttpResponse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.forms import AuthenticationForm
 from .forms import SignUpForm
 
+logger = logging.getLogger(__name__)
+
 # Create your views here.
 
 
@@ -57,7 +61,6 @@ def register(request: HttpRequest) -> HttpRequest:
     """
     if request.method == 'POST':
         form = SignUpForm(request.POST)
-        print("Form errors:", form.errors)
         if form.is_valid():
             # Set Password
             user = form.save(commit=False)
@@ -68,6 +71,7 @@ def register(request: HttpRequest) -> HttpRequest:
             # Conditionally log user in if required, or redirect:
             # login(request, user)
             return redirect('accounts:login')
+        logger.debug("Registration form errors: %s", form.errors.as_json())
     else:
         form = SignUpForm()
     return render(request, 'authentication/register.html', {'form': form})
@@ -138,7 +142,6 @@ def show_user(request: HttpRequest) -> HttpRequest:
 
     :rtype: HttpRequest
     """
-    print(request.user.username)
     return render(request, 'authentication/user.html', {
         "username": request.user.username,
         "password": request.user.password
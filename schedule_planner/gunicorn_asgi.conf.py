@@ -0,0 +1,41 @@
+"""
+Gunicorn settings for serving the project over ASGI with uvicorn workers.
+
+Each worker runs an event loop, so clients that are slow to send a request
+or to read a response wait on the loop instead of holding a whole worker,
+and the schedule, message, export and feed pages are served by the async
+views in ``planner.async_views``. From the directory holding manage.py::
+
+    gunicorn -c gunicorn_asgi.conf.py
+
+The Procfile and Dockerfile keep the WSGI setup with sync workers.
+"""
+import multiprocessing
+import os
+
+wsgi_app = 'schedule_planner.asgi:application'
+worker_class = 'uvicorn_worker.UvicornWorker'
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# A worker handles many connections at once, so one per core is enough.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+
+timeout = 60
+graceful_timeout = 30
+keepalive = 5
+
+# Routes the read-heavy pages to the async views (PLANNER_ASYNC_VIEWS).
+raw_env = ['DJANGO_ASYNC_VIEWS=True']
+
+
+def on_starting(server):
+    """
+    Clears the request metrics of a previous run before any worker starts.
+    """
+    import django
+    from django.core.management import call_command
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE',
+                          'schedule_planner.settings')
+    django.setup()
+    call_command('clear_metrics')
@@ -1,8 +1,65 @@
 from django.contrib import admin
-from .models import Event, ContactMessage, SoundEngineer
+from django.urls import reverse
+from .models import (Event, ContactMessage, EngineerUnavailability,
+                     RecurrenceException, RecurringEvent, SoundEngineer)
 
 # Register your models here.
 
+
+class EngineerUnavailabilityInline(admin.TabularInline):
+    """
+    Periods an engineer cannot work, edited alongside the engineer.
+    """
+    model = EngineerUnavailability
+    extra = 0
+
+
+@admin.register(SoundEngineer)
+class SoundEngineerAdmin(admin.ModelAdmin):
+    """
+    Admin for sound engineers, showing each engineer's calendar feed link
+    and their declared unavailability.
+    """
+    readonly_fields = ['feed_url']
+    inlines = [EngineerUnavailabilityInline]
+
+    @admin.display(description="Calendar feed")
+    def feed_url(self, obj):
+        """
+        Returns the subscription URL of the engineer's calendar feed.
+        """
+        if not obj.pk:
+            return "-"
+        return reverse('planner:engineer_feed', args=[obj.feed_token])
+
+
+class RecurrenceExceptionInline(admin.TabularInline):
+    """
+    Cancelled or changed occurrences, edited alongside their residency.
+    """
+    model = RecurrenceException
+    extra = 0
+
+
+@admin.register(RecurringEvent)
+class RecurringEventAdmin(admin.ModelAdmin):
+    """
+    Admin for residencies and their per-occurrence exceptions.
+    """
+    list_display = ['performer', 'venue', 'frequency', 'start_date',
+                    'until', 'sound_engineer']
+    inlines = [RecurrenceExceptionInline]
+
+
+@admin.register(ContactMessage)
+class ContactMessageAdmin(admin.ModelAdmin):
+    """
+    Admin for contact messages, newest first, filterable by whether they
+    have been read and answered.
+    """
+    list_display = ['name', 'email', 'created_at', 'is_read', 'replied_to']
+    list_filter = ['is_read', 'replied_to']
+    ordering = ['-created_at']
+
+
 admin.site.register(Event)
-admin.site.register(ContactMessage)
-admin.site.register(SoundEngineer)
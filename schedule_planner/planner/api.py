@@ -0,0 +1,432 @@
+"""
+Read-only JSON API over events and sound engineers.
+
+Lists are paginated with the same opaque keyset cursors as the schedule
+page and accept a ``fields`` parameter for sparse fieldsets. Only the
+columns behind the requested fields are selected, and rows are serialized
+straight from ``values_list`` tuples without building model instances.
+
+The event list merges in the occurrences of residencies, with ids such as
+``"r3-20250606"``. The change log covers one-off events only; clients
+syncing residencies should re-read the list for the dates they hold.
+"""
+import base64
+import binascii
+import heapq
+from functools import wraps
+from itertools import islice
+
+from django.db.models.functions import Lower
+from django.http import HttpRequest, JsonResponse
+
+from .availability import busy_engineer_ids, free_engineers
+from .exporting import filter_events
+from .forms import ExportFilterForm, FreeSlotForm
+from .models import Event, RecurringEvent, SoundEngineer
+from .pagination import (KEYSET_ORDERING, decode_cursor, encode_cursor,
+                         keyset_after, sort_key)
+from .recurrence import occurrence_rows
+from .sync import changes_since
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+TYPEAHEAD_LIMIT = 20
+
+# Public field name -> database column for each resource.
+EVENT_FIELDS = {
+    'id': 'id',
+    'date': 'date',
+    'start': 'performance_time_start',
+    'end': 'performance_time_end',
+    'venue': 'venue',
+    'performer': 'performer',
+    'sound_engineer': 'sound_engineer_id',
+    'sound_engineer_name': 'sound_engineer__name',
+    'event_notes': 'event_notes',
+    'updated_at': 'updated_at',
+}
+EVENT_DEFAULT_FIELDS = ('id', 'date', 'start', 'end', 'venue', 'performer',
+                        'sound_engineer')
+# Event column -> position in an occurrence row; the engineer id is looked
+# up separately.
+OCCURRENCE_COLUMNS = {
+    'date': 0,
+    'performance_time_start': 1,
+    'performance_time_end': 2,
+    'venue': 3,
+    'performer': 4,
+    'sound_engineer__name': 5,
+    'event_notes': 6,
+    'id': 7,
+    'updated_at': 8,
+}
+
+ENGINEER_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'contact_email': 'contact_email',
+    'contact_number': 'contact_number',
+}
+ENGINEER_DEFAULT_FIELDS = ('id', 'name')
+# Contact details are only listed for staff.
+ENGINEER_STAFF_FIELDS = ('contact_email', 'contact_number')
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+# Columns that need converting before JSON encoding; the rest pass through.
+_CONVERTERS = {
+    'date': _isoformat,
+    'performance_time_start': _isoformat,
+    'performance_time_end': _isoformat,
+    'updated_at': _isoformat,
+}
+
+
+class ApiError(Exception):
+    """
+    Raised for invalid API parameters; turned into a 400 JSON response.
+    """
+
+
+def _encode_id_cursor(pk: int) -> str:
+    return base64.urlsafe_b64encode(str(pk).encode()).decode().rstrip('=')
+
+
+def _decode_id_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ApiError("Invalid cursor.")
+
+
+def api_login_required(view_func):
+    """
+    Like :func:`~django.contrib.auth.decorators.login_required`, but
+    answers anonymous requests with a JSON 401 instead of a redirect.
+    """
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': "Authentication required."},
+                                status=401)
+        try:
+            return view_func(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+    return _wrapped_view
+
+
+def parse_fields(request: HttpRequest, available: dict,
+                 default: tuple) -> list:
+    """
+    Reads the ``fields`` parameter as a comma-separated list of names.
+
+    :returns: The requested field names, in request order.
+    :rtype: list
+    """
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(default)
+    fields = list(dict.fromkeys(name.strip() for name in raw.split(',')
+                                if name.strip()))
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}. "
+                       f"Available: {', '.join(available)}.")
+    return fields
+
+
+def parse_limit(request: HttpRequest, default: int = DEFAULT_LIMIT) -> int:
+    """
+    Reads the ``limit`` parameter, clamped to :data:`MAX_LIMIT`.
+
+    :rtype: int
+    """
+    try:
+        limit = int(request.GET.get('limit', default))
+    except ValueError:
+        raise ApiError("limit must be an integer.")
+    if limit < 1:
+        raise ApiError("limit must be at least 1.")
+    return min(limit, MAX_LIMIT)
+
+
+def serialize_rows(rows, fields: list, columns: list):
+    """
+    Turns ``values_list`` tuples into dicts holding only ``fields``.
+
+    The converter for each output position is looked up once, so the
+    per-row work is a tight loop over tuples.
+
+    :param rows: Tuples whose leading values follow ``columns``.
+    :param fields: Public names of the output fields.
+    :type fields: list
+    :param columns: Database columns matching ``fields``.
+    :type columns: list
+
+    :returns: A list of JSON-ready dicts.
+    :rtype: list
+    """
+    converters = [_CONVERTERS.get(column) for column in columns]
+    width = len(fields)
+    results = []
+    for row in rows:
+        item = {}
+        for index in range(width):
+            value = row[index]
+            converter = converters[index]
+            item[fields[index]] = converter(value) if converter else value
+        results.append(item)
+    return results
+
+
+def _occurrence_values(columns: list, after_key: tuple | None, limit: int,
+                       **filters) -> list:
+    """
+    Reads the occurrences that can reach a page of the event list, shaped
+    like its ``values_list`` rows: ``columns`` then the ordering key.
+
+    :returns: Up to ``limit + 1`` rows in schedule order.
+    :rtype: list
+    """
+    rows = occurrence_rows(**filters)
+    if after_key is not None:
+        after = sort_key(after_key)
+        rows = (row for row in rows
+                if sort_key((row[0], row[1], _rule_key(row))) > after)
+    rows = list(islice(rows, limit + 1))
+    engineers = {}
+    if rows and 'sound_engineer_id' in columns:
+        engineers = dict(RecurringEvent.objects
+                         .filter(pk__in={int(_rule_key(row)[1:])
+                                         for row in rows})
+                         .values_list('id', 'sound_engineer_id'))
+    return [tuple(engineers.get(int(_rule_key(row)[1:]))
+                  if column == 'sound_engineer_id'
+                  else row[OCCURRENCE_COLUMNS[column]]
+                  for column in columns) + (row[0], row[1], _rule_key(row))
+            for row in rows]
+
+
+def _rule_key(row: tuple) -> str:
+    # "r3-20250606" -> "r3", the occurrence's place on the ordering key.
+    return row[7].partition('-')[0]
+
+
+@api_login_required
+def event_list(request: HttpRequest) -> JsonResponse:
+    """
+    Lists events in schedule order, one cursor page at a time.
+
+    Residency occurrences are merged in, after the events starting at the
+    same time; their ``id`` is the occurrence id string. Accepts
+    ``fields``, ``limit`` and ``after`` parameters plus the
+    ``start_date``, ``end_date``, ``venue`` and ``engineer`` filters of the
+    export endpoints.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :returns: ``{"results": [...], "next": cursor or null}``.
+
+    :rtype: JsonResponse
+    """
+    fields = parse_fields(request, EVENT_FIELDS, EVENT_DEFAULT_FIELDS)
+    limit = parse_limit(request)
+    filters = ExportFilterForm(request.GET)
+    if not filters.is_valid():
+        raise ApiError(filters.errors.as_text())
+
+    events = filter_events(Event.objects.order_by(*KEYSET_ORDERING),
+                           **filters.cleaned_data)
+    after = request.GET.get('after')
+    key = None
+    if after:
+        key = decode_cursor(after)
+        if key is None:
+            raise ApiError("Invalid cursor.")
+        events = events.filter(keyset_after(*key))
+
+    columns = [EVENT_FIELDS[name] for name in fields]
+    # The ordering key rides along at the end for building the cursor.
+    rows = list(events.values_list(*columns, *KEYSET_ORDERING)
+                [:limit + 1])
+    # Occurrences past the last event read cannot reach this page.
+    window = dict(filters.cleaned_data)
+    if key is not None:
+        window['start_date'] = max(key[0], window['start_date'] or key[0])
+    if len(rows) > limit:
+        window['end_date'] = rows[-1][-3]
+    occurrences = _occurrence_values(columns, key, limit, **window)
+    rows = list(islice(heapq.merge(rows, occurrences,
+                                   key=lambda row: sort_key(row[-3:])),
+                       limit + 1))
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*rows[-1][-len(KEYSET_ORDERING):])
+    return JsonResponse({'results': serialize_rows(rows, fields, columns),
+                         'next': next_cursor})
+
+
+@api_login_required
+def engineer_list(request: HttpRequest) -> JsonResponse:
+    """
+    Lists sound engineers by id, one cursor page at a time.
+
+    Accepts ``fields``, ``limit`` and ``after`` parameters. The contact
+    fields are only available to staff and superusers.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :returns: ``{"results": [...], "next": cursor or null}``.
+
+    :rtype: JsonResponse
+    """
+    available = ENGINEER_FIELDS
+    if not (request.user.is_staff or request.user.is_superuser):
+        available = {name: column for name, column in available.items()
+                     if name not in ENGINEER_STAFF_FIELDS}
+    fields = parse_fields(request, available, ENGINEER_DEFAULT_FIELDS)
+    limit = parse_limit(request)
+    engineers = SoundEngineer.objects.order_by('id')
+    after = request.GET.get('after')
+    if after:
+        engineers = engineers.filter(id__gt=_decode_id_cursor(after))
+
+    columns = [ENGINEER_FIELDS[name] for name in fields]
+    rows = list(engineers.values_list(*columns, 'id')[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_id_cursor(rows[-1][-1])
+    return JsonResponse({'results': serialize_rows(rows, fields, columns),
+                         'next': next_cursor})
+
+
+@api_login_required
+def event_changes(request: HttpRequest) -> JsonResponse:
+    """
+    Returns the events changed since a sync token.
+
+    ``since`` is the ``next`` token from the previous call (omit it, or pass
+    0, for a full sync). Changed events are returned as ``upserts`` with
+    their current values and removed events as ``deletes`` (tombstone ids).
+    While ``more`` is true the client should call again with ``next``.
+    Accepts ``fields`` and ``limit`` like :func:`event_list`. Residency
+    occurrences are not logged; only one-off events appear here.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :returns: ``{"upserts": [...], "deletes": [...], "next": token,
+              "more": bool}``.
+
+    :rtype: JsonResponse
+    """
+    fields = parse_fields(request, EVENT_FIELDS, EVENT_DEFAULT_FIELDS)
+    limit = parse_limit(request)
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        raise ApiError("since must be an integer sync token.")
+    if since < 0:
+        raise ApiError("since must not be negative.")
+
+    columns = [EVENT_FIELDS[name] for name in fields]
+    upserts, deletes, next_token, more = changes_since(since, limit, columns)
+    return JsonResponse({
+        'upserts': serialize_rows(upserts, fields, columns),
+        'deletes': deletes,
+        'next': next_token,
+        'more': more,
+    })
+
+
+@api_login_required
+def free_engineer_list(request: HttpRequest) -> JsonResponse:
+    """
+    Lists the sound engineers free for a slot.
+
+    Requires ``date``, ``start`` and ``end``; ``keep`` names an engineer to
+    include regardless, such as the one already assigned. Answered from
+    the availability bitmaps with one query plus the roster itself.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :returns: ``{"results": [{"id": ..., "name": ...}, ...]}``.
+
+    :rtype: JsonResponse
+    """
+    slot = FreeSlotForm(request.GET)
+    if not slot.is_valid():
+        raise ApiError(slot.errors.as_text())
+    engineers = free_engineers(slot.cleaned_data['date'],
+                               slot.cleaned_data['start'],
+                               slot.cleaned_data['end'],
+                               keep=slot.cleaned_data['keep'])
+    return JsonResponse({'results': [
+        {'id': pk, 'name': name}
+        for pk, name in engineers.values_list('id', 'name')]})
+
+
+def prefix_range(prefix: str) -> tuple:
+    """
+    Returns the ``[low, high)`` string range holding every value that
+    starts with ``prefix``, so a prefix match can be answered by an index
+    range scan.
+
+    :rtype: tuple
+    """
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+@api_login_required
+def engineer_search(request: HttpRequest) -> JsonResponse:
+    """
+    Typeahead for sound engineers: names starting with ``q``, ignoring
+    case, in name order.
+
+    The match is a range scan over the ``Lower(name)`` index. Given
+    ``date``, ``start`` and ``end``, only engineers free for that slot are
+    returned (``keep`` names one to include regardless). Accepts ``limit``
+    (default :data:`TYPEAHEAD_LIMIT`).
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :returns: ``{"results": [{"id": ..., "name": ...}, ...]}``.
+
+    :rtype: JsonResponse
+    """
+    limit = parse_limit(request, default=TYPEAHEAD_LIMIT)
+    prefix = request.GET.get('q', '').strip().lower()
+    engineers = (SoundEngineer.objects.annotate(name_lower=Lower('name'))
+                 .order_by('name_lower'))
+    if prefix:
+        low, high = prefix_range(prefix)
+        engineers = engineers.filter(name_lower__gte=low,
+                                     name_lower__lt=high)
+    if any(request.GET.get(name) for name in ('date', 'start', 'end')):
+        slot = FreeSlotForm(request.GET)
+        if not slot.is_valid():
+            raise ApiError(slot.errors.as_text())
+        busy = busy_engineer_ids(slot.cleaned_data['date'],
+                                 slot.cleaned_data['start'],
+                                 slot.cleaned_data['end'])
+        busy.discard(slot.cleaned_data['keep'])
+        engineers = engineers.exclude(pk__in=busy)
+    return JsonResponse({'results': [
+        {'id': pk, 'name': name}
+        for pk, name in engineers.values_list('id', 'name')[:limit]]})
@@ -20,3 +20,12 @@ class PlannerConfig(AppConfig):
     """
     default_auto_field = "django.db.models.BigAutoField"
     name = "planner"
+
+    def ready(self):
+        """
+        Connects the planner signal receivers, and the request timer,
+        query-budget counter and slow-query recorder to new database
+        connections, once the app registry is ready.
+        """
+        from . import (middleware, querybudget, signals,  # noqa: F401
+                       slowqueries)
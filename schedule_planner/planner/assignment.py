@@ -0,0 +1,227 @@
+"""
+Automatic sound engineer assignment.
+
+Unassigned events in a date range are handed out to the engineer roster with
+a greedy interval-colouring sweep: events are visited in start order, every
+engineer whose last set has finished is returned to a pool, and the least
+loaded engineer in the pool takes the event. Bookings that already exist
+and declared unavailability are respected, and the bookings' minutes count
+towards each engineer's workload so the result stays balanced. All changes are written with a single
+``bulk_update`` inside one transaction.
+"""
+import heapq
+from bisect import bisect_left
+from datetime import date, timedelta
+from itertools import chain
+
+from django.db import transaction
+from django.utils import timezone
+
+from .availability import (mask_clashes, refresh_bitmaps, slot_keys,
+                           unavailability_masks)
+from .cache import bump_schedule_version
+from .feeds import bump_feed_versions
+from .models import Event, EventChange, SoundEngineer
+from .recurrence import occurrence_bookings
+from .scheduling import event_interval
+from .stats import add_deltas, apply_deltas, stat_row
+from .sync import record_changes
+
+
+class AssignmentResult:
+    """
+    Outcome of an automatic assignment run.
+
+    :ivar assigned: ``(event, engineer)`` pairs that were filled.
+    :vartype assigned: list
+    :ivar unassigned: Events no engineer was free for.
+    :vartype unassigned: list
+    """
+
+    def __init__(self):
+        self.assigned = []
+        self.unassigned = []
+
+    @property
+    def assigned_count(self) -> int:
+        return len(self.assigned)
+
+    @property
+    def unassigned_count(self) -> int:
+        return len(self.unassigned)
+
+
+def _minutes(interval: tuple) -> int:
+    return int((interval[1] - interval[0]).total_seconds() // 60)
+
+
+def _fixed_bookings(start_date: date, end_date: date) -> dict:
+    """
+    Collects the intervals already booked for each engineer, by events
+    and by residency occurrences.
+
+    The range is widened by a day either side so sets crossing midnight
+    into or out of the window are taken into account. For each engineer the
+    booking starts are kept sorted next to the running maximum of their end
+    times, which is all :func:`_clashes_with` needs for a binary search.
+
+    :returns: A dict of engineer id to ``(starts, max_ends, minutes)``.
+    :rtype: dict
+    """
+    intervals = {}
+    window = (start_date - timedelta(days=1), end_date + timedelta(days=1))
+    rows = (Event.objects
+            .filter(sound_engineer__isnull=False, date__range=window)
+            .order_by()
+            .values_list('sound_engineer_id', 'date',
+                         'performance_time_start', 'performance_time_end'))
+    occurrences = ((engineer_id, day, start, end)
+                   for _, day, start, end, engineer_id, _, _
+                   in occurrence_bookings(*window)
+                   if engineer_id is not None)
+    for engineer_id, event_date, start, end in chain(rows, occurrences):
+        intervals.setdefault(engineer_id, []).append(
+            event_interval(event_date, start, end))
+    bookings = {}
+    for engineer_id, booked in intervals.items():
+        booked.sort()
+        max_ends = []
+        for _, end in booked:
+            max_ends.append(max(end, max_ends[-1]) if max_ends else end)
+        bookings[engineer_id] = ([start for start, _ in booked], max_ends,
+                                 sum(_minutes(interval)
+                                     for interval in booked))
+    return bookings
+
+
+def _clashes_with(booking, interval: tuple) -> bool:
+    """
+    Checks an engineer's existing bookings for an overlap with
+    ``interval``.
+
+    The bookings starting before ``interval`` ends overlap it exactly when
+    the latest end among them falls after ``interval`` starts.
+
+    :returns: ``True`` if the engineer is already booked during
+              ``interval``.
+    :rtype: bool
+    """
+    if booking is None:
+        return False
+    starts, max_ends, _ = booking
+    index = bisect_left(starts, interval[1])
+    return index > 0 and max_ends[index - 1] > interval[0]
+
+
+def plan_assignments(start_date: date, end_date: date) -> AssignmentResult:
+    """
+    Computes a conflict-free assignment without saving it.
+
+    Events are swept in start order. Engineers are kept in two heaps: one
+    of engineers still busy with a set ordered by when they finish, and a
+    pool of free engineers ordered by booked minutes. Each event therefore
+    costs O(log m) heap work, and the whole plan O(n log n + n log m).
+
+    :param start_date: First date of the range (inclusive).
+    :type start_date: date
+    :param end_date: Last date of the range (inclusive).
+    :type end_date: date
+
+    :returns: The planned assignment.
+    :rtype: AssignmentResult
+    """
+    result = AssignmentResult()
+    engineers = {engineer.pk: engineer
+                 for engineer in SoundEngineer.objects.all()}
+    events = list(Event.objects.filter(sound_engineer__isnull=True,
+                                       date__range=(start_date, end_date)))
+    if not events:
+        return result
+    if not engineers:
+        result.unassigned = events
+        return result
+
+    fixed = _fixed_bookings(start_date, end_date)
+    unavailable = unavailability_masks(start_date, end_date)
+    workload = {pk: fixed[pk][2] if pk in fixed else 0 for pk in engineers}
+    free = [(workload[pk], engineers[pk].name, pk) for pk in engineers]
+    heapq.heapify(free)
+    busy = []
+
+    slots = sorted(((event_interval(event.date,
+                                    event.performance_time_start,
+                                    event.performance_time_end), event)
+                    for event in events),
+                   key=lambda slot: (slot[0], slot[1].pk))
+    for interval, event in slots:
+        while busy and busy[0][0] <= interval[0]:
+            _, pk = heapq.heappop(busy)
+            heapq.heappush(free, (workload[pk], engineers[pk].name, pk))
+        # Skip engineers with an existing booking during this slot, or
+        # who are unavailable then.
+        skipped = []
+        chosen = None
+        while free:
+            candidate = heapq.heappop(free)
+            if _clashes_with(fixed.get(candidate[2]), interval) or \
+                    mask_clashes(unavailable, candidate[2], event.date,
+                                 event.performance_time_start,
+                                 event.performance_time_end):
+                skipped.append(candidate)
+            else:
+                chosen = candidate[2]
+                break
+        for candidate in skipped:
+            heapq.heappush(free, candidate)
+        if chosen is None:
+            result.unassigned.append(event)
+            continue
+        workload[chosen] += _minutes(interval)
+        heapq.heappush(busy, (interval[1], chosen))
+        event.sound_engineer = engineers[chosen]
+        result.assigned.append((event, engineers[chosen]))
+    return result
+
+
+def auto_assign(start_date: date, end_date: date,
+                commit: bool = True) -> AssignmentResult:
+    """
+    Assigns sound engineers to every unassigned event in a date range.
+
+    :param start_date: First date of the range (inclusive).
+    :type start_date: date
+    :param end_date: Last date of the range (inclusive).
+    :type end_date: date
+    :param commit: Save the assignment when ``True``; only plan it
+                   otherwise.
+    :type commit: bool
+
+    :returns: The assignment that was (or would be) saved.
+    :rtype: AssignmentResult
+    """
+    with transaction.atomic():
+        result = plan_assignments(start_date, end_date)
+        if commit and result.assigned:
+            now = timezone.now()
+            events = [event for event, _ in result.assigned]
+            # Move each event's stats from the values it was loaded with.
+            deltas = add_deltas({}, [event._loaded_stats
+                                     for event in events], sign=-1)
+            add_deltas(deltas, [stat_row(event) for event in events])
+            for event in events:
+                event.updated_at = now
+            Event.objects.bulk_update(events,
+                                      ['sound_engineer', 'updated_at'])
+            # bulk_update() sends no signals, so log and invalidate by hand.
+            record_changes([event.pk for event in events],
+                           EventChange.UPSERT)
+            bump_feed_versions({engineer.pk
+                                for _, engineer in result.assigned})
+            apply_deltas(deltas)
+            refresh_bitmaps(set().union(*(
+                slot_keys(event.sound_engineer_id, event.date,
+                          event.performance_time_start,
+                          event.performance_time_end)
+                for event in events)))
+            transaction.on_commit(bump_schedule_version)
+    return result
@@ -0,0 +1,210 @@
+"""
+Asynchronous versions of the schedule's read-heavy views.
+
+Under an ASGI server these views wait on the database and on the client
+without holding a worker thread, so slow clients downloading a large export
+or a feed no longer tie up a whole worker. They read through the async ORM
+(``aget``, ``afirst``, ``aiterator``) and answer conditional GETs with
+:func:`~planner.conditional.acondition`. Templates, which may still touch
+the session or lazy querysets, are rendered on a worker thread.
+
+The URLs use these views instead of :mod:`planner.views` when
+``PLANNER_ASYNC_VIEWS`` is set, as it is by the uvicorn deployment profile.
+Under WSGI the synchronous views are kept, since every async view would
+otherwise need its own event loop per request.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.http import (Http404, HttpRequest, HttpResponse,
+                         HttpResponseBadRequest, StreamingHttpResponse)
+from django.shortcuts import aget_object_or_404, render
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.cache import cache_control
+
+from .cache import aget_schedule_version
+from .conditional import (acondition, aengineer_feed_etag,
+                          aengineer_feed_state, amessage_etag,
+                          amessage_last_modified, aschedule_etag,
+                          aschedule_last_modified)
+from .exporting import acsv_lines, aexport_rows, aics_lines
+from .feeds import afeed_body
+from .forms import ExportFilterForm
+from .models import ContactMessage, Event
+from .pagination import apaginate_keyset, paginate_keyset
+from .querybudget import query_budget
+
+# The cached table fragment of each schedule template, as named in its
+# {% cache %} tag.
+SCHEDULE_FRAGMENTS = {
+    'pages/planner.html': 'schedule_table_admin',
+    'pages/planner_client.html': 'schedule_table_client',
+}
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@acondition(etag_func=aschedule_etag,
+            last_modified_func=aschedule_last_modified)
+# The page of events, the residencies and exceptions merged into it, and
+# whether anything comes before it: an earlier event or, failing that, an
+# earlier occurrence.
+@query_budget(6)
+async def index(request: HttpRequest) -> HttpResponse:
+    """
+    Displays the main event schedule for logged-in users.
+
+    Behaves like :func:`planner.views.index`. The page of events is only
+    read, through the async ORM, when the table fragment for this window
+    is missing from the cache.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :returns: An HTTP response rendering the appropriate schedule HTML page.
+
+    :rtype: HttpResponse
+    """
+    user = await request.auser()
+    template = ('pages/planner.html' if user.is_superuser
+                else 'pages/planner_client.html')
+    today = timezone.localdate()
+    version = await aget_schedule_version()
+    after = request.GET.get('after')
+    before = request.GET.get('before')
+    events = Event.objects.select_related('sound_engineer')
+    # The same values the template's {% cache %} tag varies on; a missing
+    # query parameter renders as ''.
+    fragment_key = make_template_fragment_key(
+        SCHEDULE_FRAGMENTS[template],
+        [version, today, after or '', before or ''])
+    if await cache.ahas_key(fragment_key):
+        # Only read if the fragment expires before the template gets to
+        # it, in which case it is read on the rendering thread.
+        page = SimpleLazyObject(lambda: paginate_keyset(
+            events, page_size=settings.PLANNER_PAGE_SIZE, after=after,
+            before=before, start_date=today, occurrences=True))
+    else:
+        page = await apaginate_keyset(
+            events, page_size=settings.PLANNER_PAGE_SIZE, after=after,
+            before=before, start_date=today, occurrences=True)
+    context = {
+        'events': page,
+        'page': page,
+        'window_start': today,
+        'schedule_version': version,
+        'cache_timeout': settings.SCHEDULE_CACHE_TIMEOUT,
+    }
+    return await sync_to_async(render)(request, template, context)
+
+
+async def _export_response(request: HttpRequest, formatter,
+                           content_type: str, filename: str):
+    """
+    Streams the filtered schedule through the async ``formatter``.
+
+    :returns: A streaming response, or a 400 response for invalid filters.
+    :rtype: HttpResponse
+    """
+    form = ExportFilterForm(request.GET)
+    # Validating the engineer filter reads the database.
+    if not await sync_to_async(form.is_valid)():
+        return HttpResponseBadRequest(form.errors.as_text())
+    response = StreamingHttpResponse(
+        formatter(aexport_rows(**form.cleaned_data)),
+        content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+async def export_csv(request: HttpRequest) -> HttpResponse:
+    """
+    Streams the schedule as a CSV file, like
+    :func:`planner.views.export_csv`.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :returns: A streaming CSV attachment.
+
+    :rtype: HttpResponse
+    """
+    return await _export_response(request, acsv_lines,
+                                  'text/csv; charset=utf-8', 'schedule.csv')
+
+
+@login_required
+async def export_ics(request: HttpRequest) -> HttpResponse:
+    """
+    Streams the schedule as an iCalendar (.ics) file, like
+    :func:`planner.views.export_ics`.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :returns: A streaming iCalendar attachment.
+
+    :rtype: HttpResponse
+    """
+    return await _export_response(request, aics_lines,
+                                  'text/calendar; charset=utf-8',
+                                  'schedule.ics')
+
+
+@acondition(etag_func=aengineer_feed_etag)
+async def engineer_feed(request: HttpRequest, token: str) -> HttpResponse:
+    """
+    Serves a sound engineer's bookings as an iCalendar subscription feed,
+    like :func:`planner.views.engineer_feed`.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :param token: The engineer's feed token.
+
+    :type token: str
+
+    :returns: The engineer's iCalendar feed.
+
+    :rtype: HttpResponse
+    """
+    state = await aengineer_feed_state(request, token)
+    if state is None:
+        raise Http404("Unknown feed.")
+    response = HttpResponse(await afeed_body(*state),
+                            content_type='text/calendar; charset=utf-8')
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@cache_control(private=True, no_cache=True)
+@acondition(etag_func=amessage_etag,
+            last_modified_func=amessage_last_modified)
+async def display_message(request: HttpRequest, pk: int) -> HttpResponse:
+    """
+    Displays the contents of a submitted contact message, like
+    :func:`planner.views.display_message`.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :param pk: The primary key of the ContactMessage instance to display.
+
+    :type pk: int
+
+    :returns: Renders the 'messages.html' template, displaying the message.
+
+    :rtype: HttpResponse
+    """
+    message = await aget_object_or_404(ContactMessage, pk=pk)
+    return await sync_to_async(render)(request, 'pages/messages.html',
+                                       {'message': message})
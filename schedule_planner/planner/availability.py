@@ -0,0 +1,321 @@
+"""
+Per-engineer, per-day bitmaps of busy 15-minute slots.
+
+Each :class:`~planner.models.EngineerDayBitmap` ORs together an engineer's
+events, residency occurrences and declared unavailability for one day as a
+96-bit mask. Checking whether an engineer is free for a slot is then a
+bitwise AND against the bitmaps of the slot's day and the next (for sets
+running past midnight), so the whole roster is checked with one query
+instead of an overlap query per engineer.
+
+A bitmap cannot be patched when a booking is removed, because another
+booking may cover the same slots; :func:`refresh_bitmaps` recomputes the
+affected engineer-days from their source rows instead.
+"""
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from .models import (EngineerDayBitmap, EngineerUnavailability, Event,
+                     SoundEngineer)
+from .recurrence import occurrence_bookings, occurrence_dates
+
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+DAY_MASK = (1 << SLOTS_PER_DAY) - 1
+BITMAP_BYTES = SLOTS_PER_DAY // 8
+
+REBUILD_BATCH_SIZE = 1000
+
+
+def interval_mask(start, end) -> int:
+    """
+    Returns the slots an interval touches, over two days.
+
+    Bits ``0`` to ``95`` cover the interval's own day and bits ``96`` to
+    ``191`` the next, for intervals that run past midnight. Partly covered
+    slots count as busy.
+
+    :param start: Start time.
+    :type start: time
+    :param end: End time; at or before ``start`` means the next day.
+    :type end: time
+
+    :rtype: int
+    """
+    start_minutes = start.hour * 60 + start.minute
+    end_minutes = end.hour * 60 + end.minute
+    if end_minutes <= start_minutes:
+        end_minutes += 24 * 60
+    first = start_minutes // SLOT_MINUTES
+    last = -(-end_minutes // SLOT_MINUTES)
+    return ((1 << (last - first)) - 1) << first
+
+
+def to_bytes(mask: int) -> bytes:
+    """
+    Packs a one-day mask for storage.
+
+    :rtype: bytes
+    """
+    return mask.to_bytes(BITMAP_BYTES, 'big')
+
+
+def from_bytes(value) -> int:
+    """
+    Unpacks a stored one-day mask.
+
+    :rtype: int
+    """
+    return int.from_bytes(bytes(value), 'big')
+
+
+def slot_keys(engineer_id, day, start, end) -> set:
+    """
+    Returns the ``(engineer id, date)`` bitmaps a booking touches: its own
+    day, and the next when it runs past midnight.
+
+    :rtype: set
+    """
+    if engineer_id is None:
+        return set()
+    keys = {(engineer_id, day)}
+    if interval_mask(start, end) >> SLOTS_PER_DAY:
+        keys.add((engineer_id, day + timedelta(days=1)))
+    return keys
+
+
+def rule_keys(engineer_id, start, end, start_date, until, frequency,
+              interval, weekdays) -> set:
+    """
+    Returns the ``(engineer id, date)`` bitmaps every occurrence of a
+    residency touches, ignoring its exceptions.
+
+    :rtype: set
+    """
+    if engineer_id is None:
+        return set()
+    keys = set()
+    for day in occurrence_dates(start_date, until, frequency, interval,
+                                weekdays, start_date, until):
+        keys |= slot_keys(engineer_id, day, start, end)
+    return keys
+
+
+def _add_mask(masks: dict, engineer_id, day, start, end, create=False):
+    mask = interval_mask(start, end)
+    for key, bits in (((engineer_id, day), mask & DAY_MASK),
+                      ((engineer_id, day + timedelta(days=1)),
+                       mask >> SLOTS_PER_DAY)):
+        if bits and (create or key in masks):
+            masks[key] = masks.get(key, 0) | bits
+
+
+def refresh_bitmaps(keys):
+    """
+    Recomputes the given engineer-day bitmaps from events, residency
+    occurrences and declared unavailability.
+
+    Costs three queries however many bitmaps change: one ``UNION`` read of
+    the events and unavailability, one read of the residencies, and one
+    upsert; a fourth reads exceptions when residencies are found.
+
+    :param keys: ``(engineer id, date)`` pairs to recompute.
+    """
+    keys = {key for key in keys if key[0] is not None}
+    if not keys:
+        return
+    engineer_ids = {engineer_id for engineer_id, _ in keys}
+    dates = [day for _, day in keys]
+    # Sets starting the day before can run into the first day.
+    window = (min(dates) - timedelta(days=1), max(dates))
+    events = (Event.objects
+              .filter(sound_engineer_id__in=engineer_ids,
+                      date__range=window)
+              .order_by()
+              .values_list('sound_engineer_id', 'date',
+                           'performance_time_start', 'performance_time_end'))
+    unavailable = (EngineerUnavailability.objects
+                   .filter(sound_engineer_id__in=engineer_ids,
+                           date__range=window)
+                   .order_by()
+                   .values_list('sound_engineer_id', 'date', 'start_time',
+                                'end_time'))
+
+    masks = dict.fromkeys(keys, 0)
+    for engineer_id, day, start, end in events.union(unavailable, all=True):
+        _add_mask(masks, engineer_id, day, start, end)
+    for _, day, start, end, engineer_id, _, _ in occurrence_bookings(
+            *window, engineer_ids=engineer_ids):
+        _add_mask(masks, engineer_id, day, start, end)
+    EngineerDayBitmap.objects.bulk_create(
+        [EngineerDayBitmap(sound_engineer_id=engineer_id, date=day,
+                           slots=to_bytes(mask))
+         for (engineer_id, day), mask in masks.items()],
+        update_conflicts=True,
+        unique_fields=['date', 'sound_engineer'],
+        update_fields=['slots'])
+
+
+def busy_engineer_ids(day, start, end) -> set:
+    """
+    Returns the engineers who are booked or unavailable during a slot.
+
+    Costs one query, reading the bitmaps of the slot's day and the next.
+
+    :param day: The date the slot starts on.
+    :type day: date
+    :param start: Start time of the slot.
+    :type start: time
+    :param end: End time of the slot; at or before ``start`` means the
+                next day.
+    :type end: time
+
+    :rtype: set
+    """
+    mask = interval_mask(start, end)
+    wanted = {day: mask & DAY_MASK,
+              day + timedelta(days=1): mask >> SLOTS_PER_DAY}
+    return {engineer_id for engineer_id, bitmap_day, slots
+            in (EngineerDayBitmap.objects
+                .filter(date__in=[bitmap_day for bitmap_day, bits
+                                  in wanted.items() if bits])
+                .values_list('sound_engineer_id', 'date', 'slots'))
+            if from_bytes(slots) & wanted[bitmap_day]}
+
+
+def free_engineers(day, start, end, keep=None):
+    """
+    Returns the engineers free for a slot.
+
+    :param day: The date the slot starts on.
+    :type day: date
+    :param start: Start time of the slot.
+    :type start: time
+    :param end: End time of the slot.
+    :type end: time
+    :param keep: An engineer id to include regardless, such as the one an
+                 event being edited is already assigned to.
+    :type keep: int
+
+    :returns: A lazy queryset of :class:`~planner.models.SoundEngineer`.
+    :rtype: QuerySet
+    """
+    busy = busy_engineer_ids(day, start, end)
+    busy.discard(keep)
+    return SoundEngineer.objects.exclude(pk__in=busy)
+
+
+def mask_clashes(masks: dict, engineer_id, day, start, end) -> bool:
+    """
+    Checks a booking against one-day masks, with the same AND test as
+    :func:`busy_engineer_ids`.
+
+    :param masks: One-day masks keyed by ``(engineer id, date)``, as
+                  returned by :func:`bitmap_masks` or
+                  :func:`unavailability_masks`.
+    :type masks: dict
+    :param engineer_id: The engineer of the booking.
+    :type engineer_id: int
+    :param day: The date the booking starts on.
+    :type day: date
+    :param start: Start time of the booking.
+    :type start: time
+    :param end: End time of the booking.
+    :type end: time
+
+    :returns: ``True`` if any slot of the booking is busy.
+    :rtype: bool
+    """
+    mask = interval_mask(start, end)
+    return bool(masks.get((engineer_id, day), 0) & mask & DAY_MASK
+                or masks.get((engineer_id, day + timedelta(days=1)), 0)
+                & mask >> SLOTS_PER_DAY)
+
+
+def bitmap_masks(engineer_ids, first_day, last_day) -> dict:
+    """
+    Reads the stored bitmaps of some engineers for bookings starting
+    between two dates. Costs one query.
+
+    :param engineer_ids: Engineers to read.
+    :param first_day: First date a booking starts on.
+    :type first_day: date
+    :param last_day: Last date a booking starts on.
+    :type last_day: date
+
+    :returns: One-day masks keyed by ``(engineer id, date)``.
+    :rtype: dict
+    """
+    return {(engineer_id, day): from_bytes(slots)
+            for engineer_id, day, slots
+            in EngineerDayBitmap.objects
+            .filter(sound_engineer_id__in=engineer_ids,
+                    date__range=(first_day, last_day + timedelta(days=1)))
+            .values_list('sound_engineer_id', 'date', 'slots')}
+
+
+def unavailability_masks(first_day, last_day, engineer_ids=None) -> dict:
+    """
+    Reads declared unavailability as one-day masks, for bookings starting
+    between two dates. Costs one query.
+
+    Unlike the stored bitmaps these leave out bookings, so they can be
+    checked for an event that is already booked in the bitmaps itself.
+
+    :param first_day: First date a booking starts on.
+    :type first_day: date
+    :param last_day: Last date a booking starts on.
+    :type last_day: date
+    :param engineer_ids: Engineers to read; every engineer when ``None``.
+
+    :returns: One-day masks keyed by ``(engineer id, date)``.
+    :rtype: dict
+    """
+    periods = EngineerUnavailability.objects.filter(
+        date__range=(first_day - timedelta(days=1),
+                     last_day + timedelta(days=1)))
+    if engineer_ids is not None:
+        periods = periods.filter(sound_engineer_id__in=engineer_ids)
+    masks = {}
+    for engineer_id, day, start, end in (
+            periods.order_by().values_list('sound_engineer_id', 'date',
+                                           'start_time', 'end_time')):
+        _add_mask(masks, engineer_id, day, start, end, create=True)
+    return masks
+
+
+def rebuild_bitmaps(batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """
+    Recomputes every bitmap from scratch, for backfills and repairs.
+
+    :param batch_size: Rows read per round trip.
+    :type batch_size: int
+
+    :returns: The number of bitmaps written.
+    :rtype: int
+    """
+    masks = {}
+    sources = (
+        Event.objects.filter(sound_engineer__isnull=False).order_by()
+        .values_list('sound_engineer_id', 'date', 'performance_time_start',
+                     'performance_time_end'),
+        EngineerUnavailability.objects.order_by()
+        .values_list('sound_engineer_id', 'date', 'start_time', 'end_time'),
+    )
+    for rows in sources:
+        for engineer_id, day, start, end in rows.iterator(
+                chunk_size=batch_size):
+            _add_mask(masks, engineer_id, day, start, end, create=True)
+    for _, day, start, end, engineer_id, _, _ in occurrence_bookings(
+            date.min, date.max):
+        if engineer_id is not None:
+            _add_mask(masks, engineer_id, day, start, end, create=True)
+    with transaction.atomic():
+        EngineerDayBitmap.objects.all().delete()
+        EngineerDayBitmap.objects.bulk_create(
+            (EngineerDayBitmap(sound_engineer_id=engineer_id, date=day,
+                               slots=to_bytes(mask))
+             for (engineer_id, day), mask in masks.items()),
+            batch_size=batch_size)
+    return len(masks)
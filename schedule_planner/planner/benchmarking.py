@@ -0,0 +1,402 @@
+"""
+Synthetic data and an in-process benchmark of the hot request paths.
+
+:func:`generate_schedule` bulk-creates engineers, events and contact
+messages with skewed, seeded distributions: a few busy venues and many
+quiet ones, weekend-heavy evenings, sets of one to four hours and most
+events staffed. The same seed always produces the same data.
+
+:func:`run_benchmark` grows the schedule through a series of sizes inside
+a transaction that is rolled back at the end. At each size it drives the
+schedule, add/edit/delete, contact and login pages through the full
+middleware stack with the test client, recording p50/p99 latency, queries
+per request and peak RSS. :func:`compare_results` checks a run against a
+saved baseline.
+"""
+import random
+import statistics
+import sys
+import time
+from datetime import date, datetime, time as dt_time, timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import Client
+from django.utils import timezone
+
+from .availability import rebuild_bitmaps
+from .cache import bump_schedule_version, invalidate_engineer_choices
+from .models import ContactMessage, Event, EventChange, SoundEngineer
+from .querybudget import QueryCounter
+from .stats import rebuild_stats
+from .sync import record_changes
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+GENERATE_BATCH_SIZE = 5000
+
+# Relative number of events on each weekday, Monday first.
+WEEKDAY_WEIGHTS = (0.6, 0.7, 0.9, 1.1, 1.6, 1.7, 1.0)
+# Start hours and their weights: mostly evenings, some matinees.
+START_HOURS = tuple(range(12, 24))
+START_HOUR_WEIGHTS = (1, 1, 1, 1, 2, 3, 6, 9, 10, 8, 5, 3)
+# Set lengths in minutes and their weights.
+SET_MINUTES = (60, 90, 120, 180, 240)
+SET_MINUTE_WEIGHTS = (4, 3, 5, 2, 1)
+# Share of events with an engineer, and with notes.
+ASSIGNED_SHARE = 0.85
+NOTES_SHARE = 0.3
+
+DEFAULT_SCALES = (1000, 10000)
+DEFAULT_REQUESTS = 30
+SCENARIOS = ('index', 'index_cached', 'add_event', 'edit_event',
+             'delete_view', 'contact_view', 'login')
+
+# Benchmark user; the password is only ever used inside the rolled-back
+# benchmark transaction.
+BENCHMARK_USERNAME = 'benchmark'
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+# Differences smaller than this are noise, whatever the tolerance.
+LATENCY_NOISE_MS = 1.0
+QUERY_NOISE = 0.5
+
+
+def default_counts(events: int) -> tuple:
+    """
+    Returns the engineers and contact messages that go with ``events``.
+
+    :returns: ``(engineers, messages)``.
+    :rtype: tuple
+    """
+    return max(5, events // 50), events // 20
+
+
+def _zipf_weights(count: int) -> list:
+    return [1 / rank for rank in range(1, count + 1)]
+
+
+def generate_schedule(events: int, engineers: int = 0, messages: int = 0,
+                      seed: int = 1,
+                      batch_size: int = GENERATE_BATCH_SIZE) -> dict:
+    """
+    Bulk-creates synthetic engineers, events and contact messages, then
+    rebuilds the derived tables that ``bulk_create`` bypasses.
+
+    :param events: Number of events to create.
+    :type events: int
+    :param engineers: Number of sound engineers to create.
+    :type engineers: int
+    :param messages: Number of contact messages to create.
+    :type messages: int
+    :param seed: Random seed; the same seed gives the same data.
+    :type seed: int
+    :param batch_size: Rows per ``bulk_create``.
+    :type batch_size: int
+
+    :returns: The number of rows created per model.
+    :rtype: dict
+    """
+    rng = random.Random(seed)
+    with transaction.atomic():
+        first = SoundEngineer.objects.count()
+        SoundEngineer.objects.bulk_create(
+            (SoundEngineer(name=f"Engineer {first + index:05d}",
+                           contact_number=f"07{rng.randrange(10 ** 9):09d}",
+                           contact_email=(f"engineer{first + index}"
+                                          f"@example.com"))
+             for index in range(engineers)),
+            batch_size=batch_size)
+        engineer_ids = list(SoundEngineer.objects.values_list('id',
+                                                              flat=True))
+
+        venue_count = min(200, max(5, events // 2000))
+        venues = [f"Venue {index:03d}" for index in range(venue_count)]
+        venue_weights = _zipf_weights(venue_count)
+        performers = [f"Performer {index:05d}"
+                      for index in range(max(10, events // 10))]
+        performer_weights = _zipf_weights(len(performers))
+        # About one and a half events per venue and day on average.
+        span = max(30, int(events / (venue_count * 1.5)))
+        first_day = timezone.localdate() - timedelta(days=span // 2)
+        days = [first_day + timedelta(days=offset) for offset in range(span)]
+        day_weights = [WEEKDAY_WEIGHTS[day.weekday()] for day in days]
+
+        created = 0
+        while created < events:
+            size = min(batch_size, events - created)
+            batch = []
+            for event_date, venue, performer, hour, minutes in zip(
+                    rng.choices(days, day_weights, k=size),
+                    rng.choices(venues, venue_weights, k=size),
+                    rng.choices(performers, performer_weights, k=size),
+                    rng.choices(START_HOURS, START_HOUR_WEIGHTS, k=size),
+                    rng.choices(SET_MINUTES, SET_MINUTE_WEIGHTS, k=size)):
+                start = datetime.combine(
+                    event_date, dt_time(hour, rng.choice((0, 15, 30, 45))))
+                engineer_id = (rng.choice(engineer_ids)
+                               if engineer_ids
+                               and rng.random() < ASSIGNED_SHARE else None)
+                notes = (f"Rider {rng.randrange(1000)}"
+                         if rng.random() < NOTES_SHARE else None)
+                batch.append(Event(
+                    date=event_date,
+                    performance_time_start=start.time(),
+                    performance_time_end=(start + timedelta(
+                        minutes=minutes)).time(),
+                    venue=venue, performer=performer,
+                    sound_engineer_id=engineer_id, event_notes=notes))
+            Event.objects.bulk_create(batch)
+            record_changes([event.pk for event in batch], EventChange.UPSERT)
+            created += size
+
+        ContactMessage.objects.bulk_create(
+            (ContactMessage(name=f"Visitor {index}",
+                            email=f"visitor{index}@example.com",
+                            message="Do you have any dates free next month?",
+                            is_read=rng.random() < 0.7,
+                            replied_to=rng.random() < 0.4)
+             for index in range(messages)),
+            batch_size=batch_size)
+
+        rebuild_stats()
+        rebuild_bitmaps()
+    bump_schedule_version()
+    # bulk_create sends no signals to drop the cached roster.
+    invalidate_engineer_choices()
+    return {'engineers': engineers, 'events': events, 'messages': messages}
+
+
+def peak_rss_mb() -> float | None:
+    """
+    Returns the peak resident set size of this process in MiB, or
+    ``None`` where the platform does not report it.
+
+    :rtype: float or None
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def percentile(values: list, fraction: float) -> float:
+    """
+    Returns the value below which ``fraction`` of ``values`` fall.
+
+    :rtype: float
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class _Driver:
+    """
+    Issues the benchmark requests and records their cost.
+    """
+
+    def __init__(self, rng: random.Random, tag: str):
+        self.rng = rng
+        # Keeps the events added at each size from clashing with those
+        # added at the previous ones.
+        self.tag = tag
+        self.client = Client(HTTP_HOST='localhost')
+        self.client.force_login(User.objects.get(
+            username=BENCHMARK_USERNAME))
+        self.anonymous = Client(HTTP_HOST='localhost')
+
+    def measure(self, requests: int, send) -> dict:
+        timings = []
+        queries = []
+        errors = 0
+        for number in range(requests):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                started = time.perf_counter()
+                ok = send(number)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(counter.count)
+            errors += not ok
+        return {'p50_ms': round(statistics.median(timings), 3),
+                'p99_ms': round(percentile(timings, 0.99), 3),
+                'queries': round(statistics.mean(queries), 2),
+                'max_queries': max(queries),
+                'errors': errors}
+
+    def index(self, number):
+        bump_schedule_version()
+        return self.client.get('/').status_code == 200
+
+    def index_cached(self, number):
+        return self.client.get('/').status_code == 200
+
+    def add_event(self, number):
+        day = date(2100, 1, 1) + timedelta(days=number)
+        response = self.client.post('/add/', {
+            'date': day.isoformat(), 'performance_time_start': '20:00',
+            'performance_time_end': '22:00',
+            'venue': f"Benchmark Hall {self.tag}",
+            'performer': f"Benchmark {number}", 'sound_engineer': ''})
+        return response.status_code == 302
+
+    def _event_ids(self, count):
+        ids = list(Event.objects.values_list('id', flat=True))
+        return self.rng.sample(ids, min(count, len(ids)))
+
+    def edit_event(self, number):
+        event = Event.objects.get(pk=self.edit_ids[number])
+        response = self.client.post(f'/edit/{event.pk}', {
+            'date': event.date.isoformat(),
+            'performance_time_start': f"{event.performance_time_start:%H:%M}",
+            'performance_time_end': f"{event.performance_time_end:%H:%M}",
+            'venue': f"Edited venue {number}",
+            'performer': event.performer, 'sound_engineer': ''})
+        return response.status_code == 302
+
+    def delete_view(self, number):
+        response = self.client.post(f'/delete/{self.delete_ids[number]}')
+        return response.status_code == 302
+
+    def contact_view(self, number):
+        response = self.anonymous.post('/contact/', {
+            'name': f"Visitor {number}",
+            'email': f"visitor{number}@example.com",
+            'message': "Benchmark enquiry."})
+        return response.status_code == 302
+
+    def login(self, number):
+        client = Client(HTTP_HOST='localhost')
+        if client.get('/accounts/login/').status_code != 200:
+            return False
+        response = client.post('/accounts/authenticate_user/', {
+            'username': BENCHMARK_USERNAME, 'password': BENCHMARK_PASSWORD})
+        return response.status_code == 302
+
+    def run(self, requests: int) -> dict:
+        # Rows are picked outside the measured requests, and separately so
+        # edits never touch an event deleted in the same run.
+        picked = self._event_ids(2 * requests)
+        self.edit_ids = picked[:requests]
+        self.delete_ids = picked[requests:]
+        results = {}
+        for scenario in SCENARIOS:
+            available = requests
+            if scenario == 'edit_event':
+                available = len(self.edit_ids)
+            elif scenario == 'delete_view':
+                available = len(self.delete_ids)
+            if available:
+                results[scenario] = self.measure(available,
+                                                 getattr(self, scenario))
+        return results
+
+
+def run_benchmark(scales=DEFAULT_SCALES, requests: int = DEFAULT_REQUESTS,
+                  seed: int = 1, progress=None) -> dict:
+    """
+    Benchmarks the hot request paths at each schedule size.
+
+    The schedule is grown to each size in turn and every scenario in
+    :data:`SCENARIOS` is run ``requests`` times against it. Everything
+    happens inside one transaction that is rolled back, so the database
+    is left as it was.
+
+    :param scales: Event counts to measure at, smallest first.
+    :param requests: Requests per scenario and size.
+    :type requests: int
+    :param seed: Random seed for the data and the rows picked.
+    :type seed: int
+    :param progress: Optional callable given a message per step.
+
+    :returns: ``{"meta": {...}, "results": {size: {scenario: metrics,
+              "peak_rss_mb": ...}}}``, ready to save as JSON.
+    :rtype: dict
+    """
+    report = {'meta': {'seed': seed, 'requests': requests,
+                       'vendor': connection.vendor,
+                       'python': sys.version.split()[0],
+                       'at': timezone.now().isoformat()},
+              'results': {}}
+    rng = random.Random(seed)
+    with transaction.atomic():
+        User.objects.create_superuser(BENCHMARK_USERNAME,
+                                      'benchmark@example.com',
+                                      BENCHMARK_PASSWORD)
+        events = engineers = messages = 0
+        for scale in sorted(scales):
+            want_engineers, want_messages = default_counts(scale)
+            if progress:
+                progress(f"Generating {scale} events...")
+            generate_schedule(max(0, scale - events),
+                              max(0, want_engineers - engineers),
+                              max(0, want_messages - messages),
+                              seed=seed + scale)
+            events = max(events, scale)
+            engineers = max(engineers, want_engineers)
+            messages = max(messages, want_messages)
+            if progress:
+                progress(f"Measuring at {scale} events...")
+            results = _Driver(rng, tag=str(scale)).run(requests)
+            results['peak_rss_mb'] = peak_rss_mb()
+            report['results'][str(scale)] = results
+        transaction.set_rollback(True)
+    # Drop anything cached from the rolled-back schedule and roster.
+    bump_schedule_version()
+    invalidate_engineer_choices()
+    return report
+
+
+def compare_results(baseline: dict, current: dict,
+                    tolerance: float = 0.2) -> list:
+    """
+    Lists the regressions of a run against a baseline.
+
+    Latency and peak RSS regress when they grow by more than
+    ``tolerance`` (and latency by at least :data:`LATENCY_NOISE_MS`);
+    queries per request regress on any real increase. Sizes and
+    scenarios missing from either run are skipped.
+
+    :param baseline: A saved :func:`run_benchmark` report.
+    :type baseline: dict
+    :param current: The report to check.
+    :type current: dict
+    :param tolerance: Allowed relative growth, e.g. ``0.2`` for 20%.
+    :type tolerance: float
+
+    :returns: One message per regression.
+    :rtype: list
+    """
+    regressions = []
+    for scale, scenarios in current.get('results', {}).items():
+        base_scenarios = baseline.get('results', {}).get(scale)
+        if not base_scenarios:
+            continue
+        for scenario, metrics in scenarios.items():
+            base = base_scenarios.get(scenario)
+            if base is None or metrics is None:
+                continue
+            if scenario == 'peak_rss_mb':
+                if metrics > base * (1 + tolerance):
+                    regressions.append(
+                        f"{scale} events: peak RSS {base:.1f} -> "
+                        f"{metrics:.1f} MiB")
+                continue
+            for key in ('p50_ms', 'p99_ms'):
+                if (metrics[key] > base[key] * (1 + tolerance)
+                        and metrics[key] - base[key] >= LATENCY_NOISE_MS):
+                    regressions.append(
+                        f"{scale} events: {scenario} {key} "
+                        f"{base[key]:.1f} -> {metrics[key]:.1f}")
+            if metrics['queries'] - base['queries'] >= QUERY_NOISE:
+                regressions.append(
+                    f"{scale} events: {scenario} queries per request "
+                    f"{base['queries']} -> {metrics['queries']}")
+            if metrics['errors'] > base['errors']:
+                regressions.append(
+                    f"{scale} events: {scenario} errors "
+                    f"{base['errors']} -> {metrics['errors']}")
+    return regressions
@@ -0,0 +1,211 @@
+"""
+Bulk editing and deletion of selected events.
+
+A batch is validated as a whole and written in one transaction: edits with
+a single ``bulk_update`` and deletions with a single filtered ``DELETE``.
+Neither sends per-event model signals, so the work the signal receivers do
+for one event (change log, feeds, stats, availability bitmaps and the
+schedule cache) is done here once for the whole batch. A 200-event change
+therefore costs about ten queries rather than several per event.
+"""
+from datetime import datetime, timedelta
+from itertools import chain
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .availability import (mask_clashes, refresh_bitmaps, slot_keys,
+                           unavailability_masks)
+from .cache import bump_schedule_version
+from .feeds import bump_feed_versions
+from .models import Event, EventChange
+from .recurrence import occurrence_bookings
+from .scheduling import find_clashes
+from .signals import bulk_deleting
+from .stats import STAT_FIELDS, add_deltas, apply_deltas, stat_row
+from .sync import record_changes
+
+# Clashing events listed when a batch is refused; the rest are counted.
+CLASH_REPORT_LIMIT = 20
+
+
+class BulkEditError(Exception):
+    """
+    Raised when a batch cannot be applied; nothing has been written.
+
+    :ivar messages: One message per problem found.
+    """
+
+    def __init__(self, messages):
+        super().__init__('; '.join(messages))
+        self.messages = messages
+
+
+def _shift(event: Event, delta: timedelta):
+    """
+    Moves an event by ``delta``, keeping its length. The date follows the
+    start time across midnight.
+
+    :raises BulkEditError: If the event would move outside the calendar.
+    """
+    try:
+        start = (datetime.combine(event.date, event.performance_time_start)
+                 + delta)
+        end = datetime.combine(event.date, event.performance_time_end) + delta
+    except OverflowError:
+        raise BulkEditError([f"{event.performer} on {event.date} cannot be "
+                             f"moved that far."])
+    event.date = start.date()
+    event.performance_time_start = start.time()
+    event.performance_time_end = end.time()
+
+
+def _check_clashes(events: list):
+    """
+    Refuses a batch that would double-book an engineer or a venue, against
+    other events, residency occurrences or within itself, or book an
+    engineer during their declared unavailability. Costs three queries,
+    and a fourth when residencies share an engineer or venue with the
+    batch.
+    """
+    dates = [event.date for event in events]
+    ids = [event.pk for event in events]
+    engineer_ids = {event.sound_engineer_id for event in events
+                    if event.sound_engineer_id}
+    venues = {event.venue for event in events}
+    window = (min(dates) - timedelta(days=1), max(dates) + timedelta(days=1))
+    others = (Event.objects
+              .filter(Q(sound_engineer_id__in=engineer_ids)
+                      | Q(venue__in=venues),
+                      date__range=window)
+              .exclude(pk__in=ids)
+              .order_by()
+              .values_list('id', 'date', 'performance_time_start',
+                           'performance_time_end', 'sound_engineer_id',
+                           'venue', 'performer'))
+    occurrences = occurrence_bookings(*window, engineer_ids=engineer_ids,
+                                      venues=venues)
+    rows = list(chain(others, occurrences)) + [
+        (event.pk, event.date, event.performance_time_start,
+         event.performance_time_end, event.sound_engineer_id, event.venue,
+         event.performer)
+        for event in events]
+
+    batch = set(ids)
+    clashes = {}
+    for label, key in (('Sound engineer', lambda row: row[4]),
+                       ('Venue', lambda row: row[5])):
+        for _, first, second in find_clashes(rows, key):
+            # Report each selected event once, against the first clash.
+            culprit = first if first[0] in batch else second
+            if culprit[0] in batch and culprit[0] not in clashes:
+                other = second if culprit is first else first
+                clashes[culprit[0]] = (
+                    f"{label} clash: {culprit[6]} on {culprit[1]} "
+                    f"{culprit[2]:%H:%M} would overlap {other[6]} on "
+                    f"{other[1]} {other[2]:%H:%M}.")
+    unavailable = unavailability_masks(min(dates), max(dates),
+                                       engineer_ids=engineer_ids)
+    for event in events:
+        if event.pk not in clashes and mask_clashes(
+                unavailable, event.sound_engineer_id, event.date,
+                event.performance_time_start, event.performance_time_end):
+            clashes[event.pk] = (
+                f"Sound engineer unavailable: {event.performer} on "
+                f"{event.date} {event.performance_time_start:%H:%M}.")
+    if clashes:
+        messages = list(clashes.values())[:CLASH_REPORT_LIMIT]
+        if len(clashes) > CLASH_REPORT_LIMIT:
+            messages.append(f"... and {len(clashes) - CLASH_REPORT_LIMIT} "
+                            f"more clashing events.")
+        raise BulkEditError(messages)
+
+
+def _after_write(ids, action: str, old_rows: list, new_rows: list):
+    """
+    Brings the derived data in step with a written batch, as the signal
+    receivers would for single events.
+    """
+    record_changes(ids, action)
+    bump_feed_versions({row[2] for row in old_rows + new_rows})
+    deltas = add_deltas({}, old_rows, sign=-1)
+    apply_deltas(add_deltas(deltas, new_rows))
+    keys = set()
+    for event_date, _, engineer_id, start, end in old_rows + new_rows:
+        keys |= slot_keys(engineer_id, event_date, start, end)
+    refresh_bitmaps(keys)
+    transaction.on_commit(bump_schedule_version)
+
+
+def bulk_update_events(ids, shift=timedelta(0), venue='', engineer=None,
+                       unassign=False) -> int:
+    """
+    Applies the same change to every selected event.
+
+    :param ids: Primary keys of the events to change.
+    :param shift: Moves every event by this much, keeping its length.
+    :type shift: timedelta
+    :param venue: New venue; blank leaves venues alone.
+    :type venue: str
+    :param engineer: Engineer to reassign the events to.
+    :type engineer: :class:`~planner.models.SoundEngineer`
+    :param unassign: Remove the engineer from every event instead.
+    :type unassign: bool
+
+    :raises BulkEditError: If the change would double-book an engineer or
+                           a venue, or book an engineer while unavailable.
+
+    :returns: The number of events changed.
+    :rtype: int
+    """
+    with transaction.atomic():
+        events = list(Event.objects.select_for_update()
+                      .filter(pk__in=ids).defer('event_notes'))
+        if not events:
+            return 0
+        old_rows = [stat_row(event) for event in events]
+        now = timezone.now()
+        for event in events:
+            if shift:
+                _shift(event, shift)
+            if venue:
+                event.venue = venue
+            if unassign:
+                event.sound_engineer = None
+            elif engineer is not None:
+                event.sound_engineer = engineer
+            event.updated_at = now
+        _check_clashes(events)
+        Event.objects.bulk_update(events, [
+            'date', 'performance_time_start', 'performance_time_end',
+            'venue', 'sound_engineer', 'updated_at'])
+        _after_write([event.pk for event in events], EventChange.UPSERT,
+                     old_rows, [stat_row(event) for event in events])
+    return len(events)
+
+
+def bulk_delete_events(ids) -> int:
+    """
+    Deletes every selected event, then brings the derived data in step for
+    the whole batch at once instead of event by event.
+
+    :param ids: Primary keys of the events to delete.
+
+    :returns: The number of events deleted.
+    :rtype: int
+    """
+    with transaction.atomic():
+        events = Event.objects.filter(pk__in=ids)
+        old_rows = list(events.select_for_update().order_by()
+                        .values_list('id', *STAT_FIELDS))
+        if not old_rows:
+            return 0
+        token = bulk_deleting.set(True)
+        try:
+            deleted, _ = events.delete()
+        finally:
+            bulk_deleting.reset(token)
+        _after_write([row[0] for row in old_rows], EventChange.DELETE,
+                     [row[1:] for row in old_rows], [])
+    return deleted
@@ -0,0 +1,89 @@
+"""
+Schedule version used to key cached fragments of the schedule.
+
+Every change to an :class:`~planner.models.Event` or
+:class:`~planner.models.SoundEngineer` replaces the version with a new
+value, so any fragment rendered against the old version simply stops being
+looked up. The version lives in Django's cache, which makes it shared by
+every gunicorn worker as long as the configured backend is shared
+(file-based, memcached, redis or database).
+
+The sound engineer roster offered by event forms is cached the same way
+and dropped whenever an engineer is saved or deleted.
+"""
+import time
+
+from django.core.cache import cache
+
+from .models import SoundEngineer
+
+SCHEDULE_VERSION_KEY = 'planner:schedule_version'
+ENGINEER_CHOICES_KEY = 'planner:engineer_choices'
+
+
+def get_schedule_version() -> int:
+    """
+    Returns the current schedule version, creating one if none is stored.
+
+    :returns: The current schedule version.
+    :rtype: int
+    """
+    version = cache.get(SCHEDULE_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        # add() keeps whichever worker got there first.
+        if not cache.add(SCHEDULE_VERSION_KEY, version, timeout=None):
+            version = cache.get(SCHEDULE_VERSION_KEY, version)
+    return version
+
+
+async def aget_schedule_version() -> int:
+    """
+    Asynchronous version of :func:`get_schedule_version`.
+
+    :rtype: int
+    """
+    version = await cache.aget(SCHEDULE_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(SCHEDULE_VERSION_KEY, version, timeout=None):
+            version = await cache.aget(SCHEDULE_VERSION_KEY, version)
+    return version
+
+
+def bump_schedule_version() -> int:
+    """
+    Replaces the schedule version, invalidating every cached fragment.
+
+    A fresh timestamp is written rather than incrementing the old value so
+    that concurrent bumps from several workers can never collide back onto
+    a version that is already in use.
+
+    :returns: The new schedule version.
+    :rtype: int
+    """
+    version = time.time_ns()
+    cache.set(SCHEDULE_VERSION_KEY, version, timeout=None)
+    return version
+
+
+def get_engineer_choices() -> list:
+    """
+    Returns the sound engineer roster as ``(pk, name)`` pairs in name
+    order, reading the database only when the cached copy is missing.
+
+    :rtype: list
+    """
+    choices = cache.get(ENGINEER_CHOICES_KEY)
+    if choices is None:
+        choices = list(SoundEngineer.objects.order_by('name')
+                       .values_list('pk', 'name'))
+        cache.set(ENGINEER_CHOICES_KEY, choices, timeout=None)
+    return choices
+
+
+def invalidate_engineer_choices():
+    """
+    Drops the cached roster so the next form rebuilds it.
+    """
+    cache.delete(ENGINEER_CHOICES_KEY)
@@ -0,0 +1,84 @@
+"""
+Month and week calendar layouts for the schedule.
+
+A calendar only ever queries the dates it shows: the visible window is
+fetched with one ``date__range`` query (served by the date-leading schedule
+index), merged with the occurrences of recurring events in the window, and
+the rows are dropped into day buckets in a single pass.
+"""
+import calendar
+import heapq
+from datetime import date, timedelta
+
+from .models import Event
+from .recurrence import occurrence_rows
+
+# Columns shown in a calendar cell; notes are left out.
+CALENDAR_FIELDS = ('id', 'date', 'performance_time_start',
+                   'performance_time_end', 'venue', 'performer',
+                   'sound_engineer__name')
+
+# Years the calendars can show. The grid spills into the neighbouring
+# months and the page links to the next and previous ones, all of which
+# must stay within the range of ``date``.
+CALENDAR_YEARS = range(date.min.year + 1, date.max.year)
+
+
+def _start_key(row: dict):
+    return row['date'], row['performance_time_start']
+
+
+def month_days(year: int, month: int) -> list:
+    """
+    Returns the weeks shown for a month, Monday first, including the
+    leading and trailing days of the neighbouring months.
+
+    :returns: A list of weeks, each a list of seven dates.
+    :rtype: list
+    """
+    return calendar.Calendar(firstweekday=0).monthdatescalendar(year, month)
+
+
+def week_days(year: int, week: int) -> list:
+    """
+    Returns the dates of an ISO week as a single calendar row.
+
+    :returns: A list holding one list of seven dates.
+    :rtype: list
+    """
+    monday = date.fromisocalendar(year, week, 1)
+    return [[monday + timedelta(days=offset) for offset in range(7)]]
+
+
+def build_calendar(weeks: list, venue: str | None = None) -> list:
+    """
+    Fills calendar weeks with the events on each day.
+
+    :param weeks: Weeks of dates, as returned by :func:`month_days` or
+                  :func:`week_days`.
+    :type weeks: list
+    :param venue: Only include events at this venue.
+    :type venue: str
+
+    :returns: The same weeks with each date replaced by a
+              ``(date, events)`` tuple, events in start order. Occurrences
+              of recurring events are flagged with ``recurring``.
+    :rtype: list
+    """
+    first, last = weeks[0][0], weeks[-1][-1]
+    events = (Event.objects
+              .filter(date__range=(first, last))
+              .order_by('date', 'performance_time_start', 'id'))
+    if venue:
+        events = events.filter(venue=venue)
+    occurrences = (
+        {'id': pk, 'date': day, 'performance_time_start': start,
+         'performance_time_end': end, 'venue': place, 'performer': performer,
+         'sound_engineer__name': engineer, 'recurring': True}
+        for (day, start, end, place, performer, engineer, _, pk, _)
+        in occurrence_rows(start_date=first, end_date=last, venue=venue))
+    buckets = {}
+    for row in heapq.merge(events.values(*CALENDAR_FIELDS), occurrences,
+                           key=_start_key):
+        buckets.setdefault(row['date'], []).append(row)
+    return [[(day, buckets.get(day, [])) for day in week] for week in weeks]
@@ -0,0 +1,216 @@
+"""
+Copying a stretch of the schedule into another period.
+
+The source events are read with one query and shifted in memory. Conflicts
+at the target are found without a query per event: venue clashes by
+sweeping the copies together with the events and residency occurrences
+already booked at those venues, and engineer clashes by ANDing each copy
+against the engineer's availability bitmaps, which cover all of those and
+declared unavailability alike. The copies that fit are written with a
+single ``bulk_create``.
+"""
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from .availability import (bitmap_masks, mask_clashes, refresh_bitmaps,
+                           slot_keys)
+from .cache import bump_schedule_version
+from .feeds import bump_feed_versions
+from .models import Event, EventChange
+from .recurrence import occurrence_bookings
+from .scheduling import find_clashes
+from .stats import add_deltas, apply_deltas, stat_row
+from .sync import record_changes
+
+
+class CloneResult:
+    """
+    Outcome of copying a date range.
+
+    :ivar offset: How far every event was moved.
+    :vartype offset: timedelta
+    :ivar copies: ``(source, copy)`` event pairs that were (or would be)
+                  created.
+    :vartype copies: list
+    :ivar conflicts: ``(source, copy, message)`` triples for the copies
+                     that were skipped because they clash at the target.
+    :vartype conflicts: list
+    """
+
+    def __init__(self, offset: timedelta):
+        self.offset = offset
+        self.copies = []
+        self.conflicts = []
+
+    @property
+    def created_count(self) -> int:
+        return len(self.copies)
+
+    @property
+    def conflict_count(self) -> int:
+        return len(self.conflicts)
+
+
+def clone_offset(start_date: date, target_start: date,
+                 align_weekdays: bool = True) -> timedelta:
+    """
+    Returns how far the source range moves to start at ``target_start``.
+
+    :param start_date: First date of the source range.
+    :type start_date: date
+    :param target_start: Where the copy should start.
+    :type target_start: date
+    :param align_weekdays: Move the target start forward to the source
+                           start's weekday, so Friday events stay on
+                           Fridays.
+    :type align_weekdays: bool
+
+    :rtype: timedelta
+    """
+    days = (target_start - start_date).days
+    if align_weekdays:
+        days += -days % 7
+    return timedelta(days=days)
+
+
+def _engineer_conflicts(copies: list) -> dict:
+    """
+    Finds copies whose engineer is already booked or unavailable, with
+    one query over the engineers' bitmaps at the target.
+
+    :returns: Mapping of copy index to message.
+    :rtype: dict
+    """
+    engineer_ids = {copy.sound_engineer_id for copy in copies
+                    if copy.sound_engineer_id}
+    if not engineer_ids:
+        return {}
+    dates = [copy.date for copy in copies]
+    bitmaps = bitmap_masks(engineer_ids, min(dates), max(dates))
+    conflicts = {}
+    for index, copy in enumerate(copies):
+        if copy.sound_engineer_id is not None and mask_clashes(
+                bitmaps, copy.sound_engineer_id, copy.date,
+                copy.performance_time_start, copy.performance_time_end):
+            conflicts[index] = (f"Sound engineer {copy.sound_engineer} is "
+                                f"already booked or unavailable.")
+    return conflicts
+
+
+def _venue_conflicts(copies: list) -> dict:
+    """
+    Finds copies that overlap an event or residency occurrence already
+    booked at their venue, reading each once over the target dates.
+
+    :returns: Mapping of copy index to message.
+    :rtype: dict
+    """
+    dates = [copy.date for copy in copies]
+    venues = {copy.venue for copy in copies}
+    window = (min(dates) - timedelta(days=1), max(dates) + timedelta(days=1))
+    existing = (Event.objects
+                .filter(venue__in=venues, date__range=window)
+                .order_by()
+                .values_list('id', 'date', 'performance_time_start',
+                             'performance_time_end', 'venue', 'performer'))
+    rows = [(('existing', pk), *values) for pk, *values in existing]
+    rows += [(('existing', pk), day, start, end, venue, performer)
+             for pk, day, start, end, _, venue, performer
+             in occurrence_bookings(*window, venues=venues)]
+    rows += [(('copy', index), copy.date, copy.performance_time_start,
+              copy.performance_time_end, copy.venue, copy.performer)
+             for index, copy in enumerate(copies)]
+    conflicts = {}
+    for venue, first, second in find_clashes(rows, lambda row: row[4]):
+        for row, other in ((first, second), (second, first)):
+            if row[0][0] == 'copy' and other[0][0] == 'existing':
+                conflicts.setdefault(
+                    row[0][1], f"{venue} already has {other[5]} at "
+                               f"{other[2]:%H:%M} on {other[1]}.")
+    return conflicts
+
+
+def _add_copies(copies: list):
+    """
+    Inserts the copies with one ``bulk_create`` and updates what the
+    ``post_save`` receivers would have.
+    """
+    created = Event.objects.bulk_create(copies)
+    # bulk_create() sends no signals, so log and invalidate by hand.
+    record_changes([event.pk for event in created], EventChange.UPSERT)
+    bump_feed_versions({event.sound_engineer_id for event in created})
+    apply_deltas(add_deltas({}, [stat_row(event) for event in created]))
+    refresh_bitmaps(set().union(*(
+        slot_keys(event.sound_engineer_id, event.date,
+                  event.performance_time_start, event.performance_time_end)
+        for event in created)))
+    transaction.on_commit(bump_schedule_version)
+
+
+def clone_schedule(start_date: date, end_date: date, target_start: date,
+                   keep_engineers: bool = True, keep_notes: bool = False,
+                   align_weekdays: bool = True,
+                   commit: bool = True) -> CloneResult:
+    """
+    Copies every event in a date range so the copy starts at
+    ``target_start``.
+
+    Copies that would clash with an event already at the target venue, or
+    whose engineer is booked or unavailable then, are skipped and
+    reported. Occurrences of recurring events are not copied; their rules
+    already produce them.
+
+    :param start_date: First date of the source range (inclusive).
+    :type start_date: date
+    :param end_date: Last date of the source range (inclusive).
+    :type end_date: date
+    :param target_start: Where the copy should start.
+    :type target_start: date
+    :param keep_engineers: Keep each event's sound engineer; the copies
+                           are left unassigned otherwise.
+    :type keep_engineers: bool
+    :param keep_notes: Copy the event notes.
+    :type keep_notes: bool
+    :param align_weekdays: See :func:`clone_offset`.
+    :type align_weekdays: bool
+    :param commit: Create the copies when ``True``; only plan them
+                   otherwise.
+    :type commit: bool
+
+    :returns: The copies that were (or would be) created and the
+              conflicts found.
+    :rtype: CloneResult
+    """
+    result = CloneResult(clone_offset(start_date, target_start,
+                                      align_weekdays))
+    sources = Event.objects.filter(date__range=(start_date, end_date))
+    if keep_engineers:
+        sources = sources.select_related('sound_engineer')
+    if not keep_notes:
+        sources = sources.defer('event_notes')
+    with transaction.atomic():
+        sources = list(sources)
+        if not sources:
+            return result
+        copies = [Event(date=source.date + result.offset,
+                        performance_time_start=source.performance_time_start,
+                        performance_time_end=source.performance_time_end,
+                        venue=source.venue,
+                        performer=source.performer,
+                        sound_engineer=(source.sound_engineer
+                                        if keep_engineers else None),
+                        event_notes=(source.event_notes
+                                     if keep_notes else None))
+                  for source in sources]
+        conflicts = _engineer_conflicts(copies)
+        for index, message in _venue_conflicts(copies).items():
+            conflicts.setdefault(index, message)
+        for index, (source, copy) in enumerate(zip(sources, copies)):
+            if index in conflicts:
+                result.conflicts.append((source, copy, conflicts[index]))
+            else:
+                result.copies.append((source, copy))
+        if commit and result.copies:
+            _add_copies([copy for _, copy in result.copies])
+    return result
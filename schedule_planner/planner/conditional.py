@@ -0,0 +1,313 @@
+"""
+Validators for conditional GET on the schedule, message and feed pages.
+
+The functions here are passed to :func:`django.views.decorators.http.condition`
+so that a client re-requesting an unchanged page gets a ``304 Not Modified``
+without any events being loaded or any template being rendered. Validators
+are built from a single aggregate query and are memoised on the request,
+because Django asks for the ETag and the Last-Modified date separately.
+
+Django's own decorator calls the validators synchronously, which async
+views cannot do with the ORM, so they use :func:`acondition` with the
+``a``-prefixed coroutine validators instead.
+"""
+import functools
+import hashlib
+from datetime import datetime, time, timezone as dt_timezone
+
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .cache import aget_schedule_version, get_schedule_version
+from .feeds import afeed_state, feed_etag_value, feed_state
+from .models import ContactMessage, Event
+
+
+def _user_role(user) -> str:
+    """
+    Returns the part of the user's identity that changes the rendered page.
+
+    :returns: The role and username of the requesting user.
+    :rtype: str
+    """
+    role = 'planner' if user.is_superuser else 'client'
+    return f"{role}:{user.get_username()}"
+
+
+def _schedule_state(request) -> dict:
+    """
+    Computes the schedule validators once per request.
+
+    The schedule version is folded into the Last-Modified date because it
+    also moves when an event is deleted or a sound engineer is renamed,
+    neither of which touches ``Event.updated_at``. So is the start of
+    today, since the default window of the schedule rolls over at midnight.
+
+    :returns: A dict holding the ``etag`` and ``last_modified`` values.
+    :rtype: dict
+    """
+    state = getattr(request, '_schedule_state', None)
+    if state is None:
+        state = _build_schedule_state(
+            request, request.user,
+            Event.objects.aggregate(latest=Max('updated_at'),
+                                    total=Count('id')),
+            get_schedule_version())
+    return state
+
+
+async def _aschedule_state(request) -> dict:
+    """
+    Asynchronous version of :func:`_schedule_state`.
+
+    :rtype: dict
+    """
+    state = getattr(request, '_schedule_state', None)
+    if state is None:
+        state = _build_schedule_state(
+            request, await request.auser(),
+            await Event.objects.aaggregate(latest=Max('updated_at'),
+                                           total=Count('id')),
+            await aget_schedule_version())
+    return state
+
+
+def _build_schedule_state(request, user, totals: dict, version: int) -> dict:
+    """
+    Derives the schedule validators from the event totals and the schedule
+    version, and memoises them on the request.
+
+    :rtype: dict
+    """
+    changed = datetime.fromtimestamp(version / 1e9, tz=dt_timezone.utc)
+    today = timezone.localdate()
+    midnight = timezone.make_aware(datetime.combine(today, time.min))
+    latest = totals['latest']
+    last_modified = max(filter(None, (latest, changed, midnight)))
+    fingerprint = '|'.join(str(part) for part in (
+        latest.isoformat() if latest else '',
+        totals['total'],
+        version,
+        _user_role(user),
+        today.isoformat(),
+        request.GET.urlencode(),
+    ))
+    state = {
+        'etag': hashlib.sha1(fingerprint.encode()).hexdigest(),
+        'last_modified': last_modified,
+    }
+    request._schedule_state = state
+    return state
+
+
+def schedule_etag(request, *args, **kwargs) -> str:
+    """
+    ETag for :func:`planner.views.index`.
+
+    :returns: The ETag value.
+    :rtype: str
+    """
+    return _schedule_state(request)['etag']
+
+
+def schedule_last_modified(request, *args, **kwargs) -> datetime:
+    """
+    Last-Modified date for :func:`planner.views.index`.
+
+    :returns: The time of the latest change to the schedule.
+    :rtype: datetime
+    """
+    return _schedule_state(request)['last_modified']
+
+
+async def aschedule_etag(request, *args, **kwargs) -> str:
+    """
+    ETag for :func:`planner.async_views.index`.
+
+    :rtype: str
+    """
+    return (await _aschedule_state(request))['etag']
+
+
+async def aschedule_last_modified(request, *args, **kwargs) -> datetime:
+    """
+    Last-Modified date for :func:`planner.async_views.index`.
+
+    :rtype: datetime
+    """
+    return (await _aschedule_state(request))['last_modified']
+
+
+def _message_updated_at(request, pk: int) -> datetime | None:
+    """
+    Looks up the last change of a contact message without loading it.
+
+    :returns: The message's ``updated_at`` or ``None`` if it does not exist.
+    :rtype: datetime or None
+    """
+    cache_attr = f'_message_updated_at_{pk}'
+    if not hasattr(request, cache_attr):
+        setattr(request, cache_attr,
+                ContactMessage.objects.filter(pk=pk)
+                .values_list('updated_at', flat=True).first())
+    return getattr(request, cache_attr)
+
+
+async def _amessage_updated_at(request, pk: int) -> datetime | None:
+    """
+    Asynchronous version of :func:`_message_updated_at`.
+
+    :rtype: datetime or None
+    """
+    cache_attr = f'_message_updated_at_{pk}'
+    if not hasattr(request, cache_attr):
+        setattr(request, cache_attr,
+                await ContactMessage.objects.filter(pk=pk)
+                .values_list('updated_at', flat=True).afirst())
+    return getattr(request, cache_attr)
+
+
+def _message_fingerprint(pk: int, updated_at: datetime, user) -> str:
+    fingerprint = f"{pk}|{updated_at.isoformat()}|{_user_role(user)}"
+    return hashlib.sha1(fingerprint.encode()).hexdigest()
+
+
+def message_etag(request, pk: int) -> str | None:
+    """
+    ETag for :func:`planner.views.display_message`.
+
+    :returns: The ETag value, or ``None`` for a missing message so the view
+              can answer with its usual 404.
+    :rtype: str or None
+    """
+    updated_at = _message_updated_at(request, pk)
+    if updated_at is None:
+        return None
+    return _message_fingerprint(pk, updated_at, request.user)
+
+
+def message_last_modified(request, pk: int) -> datetime | None:
+    """
+    Last-Modified date for :func:`planner.views.display_message`.
+
+    :returns: The message's last change, or ``None`` if it does not exist.
+    :rtype: datetime or None
+    """
+    return _message_updated_at(request, pk)
+
+
+async def amessage_etag(request, pk: int) -> str | None:
+    """
+    ETag for :func:`planner.async_views.display_message`.
+
+    :rtype: str or None
+    """
+    updated_at = await _amessage_updated_at(request, pk)
+    if updated_at is None:
+        return None
+    return _message_fingerprint(pk, updated_at, await request.auser())
+
+
+async def amessage_last_modified(request, pk: int) -> datetime | None:
+    """
+    Last-Modified date for :func:`planner.async_views.display_message`.
+
+    :rtype: datetime or None
+    """
+    return await _amessage_updated_at(request, pk)
+
+
+def engineer_feed_state(request, token: str):
+    """
+    Looks up an engineer feed once per request.
+
+    :returns: A ``(pk, name, feed_version)`` tuple, or ``None``.
+    :rtype: tuple or None
+    """
+    if not hasattr(request, '_feed_state'):
+        request._feed_state = feed_state(token)
+    return request._feed_state
+
+
+async def aengineer_feed_state(request, token: str):
+    """
+    Asynchronous version of :func:`engineer_feed_state`.
+
+    :rtype: tuple or None
+    """
+    if not hasattr(request, '_feed_state'):
+        request._feed_state = await afeed_state(token)
+    return request._feed_state
+
+
+def engineer_feed_etag(request, token: str) -> str | None:
+    """
+    ETag for :func:`planner.views.engineer_feed`, taken straight from the
+    engineer's precomputed feed version.
+
+    :returns: The ETag value, or ``None`` for an unknown token.
+    :rtype: str or None
+    """
+    state = engineer_feed_state(request, token)
+    if state is None:
+        return None
+    pk, _, version = state
+    return feed_etag_value(pk, version)
+
+
+async def aengineer_feed_etag(request, token: str) -> str | None:
+    """
+    ETag for :func:`planner.async_views.engineer_feed`.
+
+    :rtype: str or None
+    """
+    state = await aengineer_feed_state(request, token)
+    if state is None:
+        return None
+    pk, _, version = state
+    return feed_etag_value(pk, version)
+
+
+def acondition(etag_func=None, last_modified_func=None):
+    """
+    Conditional GET for async views, like
+    :func:`django.views.decorators.http.condition` but awaiting coroutine
+    validators.
+
+    :param etag_func: Coroutine function returning the ETag, or ``None``
+                      if the resource does not exist.
+    :param last_modified_func: Coroutine function returning the
+                               Last-Modified date, or ``None``.
+
+    :returns: The view decorator.
+    :rtype: callable
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        async def _wrapped_view(request, *args, **kwargs):
+            last_modified = None
+            if last_modified_func:
+                changed = await last_modified_func(request, *args, **kwargs)
+                if changed:
+                    if not timezone.is_aware(changed):
+                        changed = timezone.make_aware(changed, dt_timezone.utc)
+                    last_modified = int(changed.timestamp())
+            etag = None
+            if etag_func:
+                etag = await etag_func(request, *args, **kwargs)
+                etag = quote_etag(etag) if etag is not None else None
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(
+                        last_modified)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            return response
+        return _wrapped_view
+    return decorator
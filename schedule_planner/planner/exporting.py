@@ -0,0 +1,254 @@
+"""
+Streaming CSV and iCalendar export of the schedule.
+
+Events are read with ``QuerySet.iterator()`` over a ``values_list``
+projection, so no model instances are built and only one chunk of rows is
+held in memory at a time. Each row is formatted as soon as it is read and
+handed to a :class:`~django.http.StreamingHttpResponse`, which keeps memory
+use flat however many events are exported.
+
+The ``a``-prefixed functions are their asynchronous counterparts for the
+async views, reading through ``QuerySet.aiterator()`` and producing async
+generators that ASGI servers stream without holding a thread.
+"""
+import csv
+from datetime import timezone as dt_timezone
+
+from .models import Event
+from .recurrence import (amerge_schedule, aoccurrence_rows, merge_schedule,
+                         occurrence_rows)
+from .scheduling import event_interval
+
+# Columns of the CSV format, shared with the importer. Names follow the
+# Event fields.
+CSV_COLUMNS = ('date', 'performance_time_start', 'performance_time_end',
+               'venue', 'performer', 'sound_engineer', 'event_notes')
+
+# Rows fetched from the database per round trip while streaming.
+EXPORT_CHUNK_SIZE = 2000
+
+# Projection shared by both formats, in CSV column order, followed by the
+# extra values iCalendar needs.
+EXPORT_FIELDS = ('date', 'performance_time_start', 'performance_time_end',
+                 'venue', 'performer', 'sound_engineer__name',
+                 'event_notes', 'id', 'updated_at')
+
+ICS_PRODID = '-//Schedule Planner//Entertainment Schedule//EN'
+ICS_FOOTER = 'END:VCALENDAR\r\n'
+
+
+class Echo:
+    """
+    Pseudo-buffer whose ``write`` hands the value straight back, letting
+    :func:`csv.writer` format one row at a time for streaming.
+    """
+
+    def write(self, value):
+        return value
+
+
+def filter_events(events, start_date=None, end_date=None, venue=None,
+                  engineer=None):
+    """
+    Applies the optional schedule filters shared by exports and the API.
+
+    :param events: The queryset of events to narrow.
+    :type events: QuerySet
+    :param start_date: Only include events on or after this date.
+    :type start_date: date
+    :param end_date: Only include events on or before this date.
+    :type end_date: date
+    :param venue: Only include events at this venue.
+    :type venue: str
+    :param engineer: Only include events worked by this engineer.
+    :type engineer: :class:`~planner.models.SoundEngineer`
+
+    :returns: The filtered queryset.
+    :rtype: QuerySet
+    """
+    if start_date:
+        events = events.filter(date__gte=start_date)
+    if end_date:
+        events = events.filter(date__lte=end_date)
+    if venue:
+        events = events.filter(venue=venue)
+    if engineer:
+        events = events.filter(sound_engineer=engineer)
+    return events
+
+
+def _export_query(named: bool = False, **filters):
+    return filter_events(
+        Event.objects.order_by('date', 'performance_time_start', 'id'),
+        **filters).values_list(*EXPORT_FIELDS, named=named)
+
+
+def export_rows(**filters):
+    """
+    Returns the filtered export projection as a streaming iterator.
+
+    Occurrences of recurring events are expanded for the same filters and
+    merged in schedule order; their ids are strings such as
+    ``"r3-20250606"``.
+
+    :param filters: Keyword filters accepted by :func:`filter_events`.
+
+    :returns: An iterator of tuples in :data:`EXPORT_FIELDS` order.
+    :rtype: iterator
+    """
+    return merge_schedule(
+        _export_query(**filters).iterator(chunk_size=EXPORT_CHUNK_SIZE),
+        occurrence_rows(**filters))
+
+
+def aexport_rows(**filters):
+    """
+    Asynchronous version of :func:`export_rows`.
+
+    The rows are named tuples: the plain ``values_list()`` iterable runs
+    its query as soon as it is created, which ``aiterator()`` does on the
+    event loop, whereas the named one waits for the first chunk to be
+    fetched on a worker thread.
+
+    :param filters: Keyword filters accepted by :func:`filter_events`.
+
+    :returns: An async iterator of tuples in :data:`EXPORT_FIELDS` order.
+    :rtype: async iterator
+    """
+    return amerge_schedule(
+        _export_query(named=True, **filters).aiterator(
+            chunk_size=EXPORT_CHUNK_SIZE),
+        aoccurrence_rows(**filters))
+
+
+def _csv_values(row) -> list:
+    (event_date, start, end, venue, performer, engineer, notes,
+     _, _) = row
+    return [event_date.isoformat(), start.strftime('%H:%M'),
+            end.strftime('%H:%M'), venue, performer, engineer or '',
+            notes or '']
+
+
+def csv_lines(rows):
+    """
+    Formats export rows as CSV, header first, one line per row.
+
+    The header uses the same column names the importer reads, so an export
+    can be imported again unchanged.
+
+    :param rows: Tuples in :data:`EXPORT_FIELDS` order.
+
+    :returns: A generator of CSV lines.
+    :rtype: generator
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for row in rows:
+        yield writer.writerow(_csv_values(row))
+
+
+async def acsv_lines(rows):
+    """
+    Asynchronous version of :func:`csv_lines`.
+
+    :param rows: An async iterator of tuples in :data:`EXPORT_FIELDS`
+                 order.
+
+    :returns: An async generator of CSV lines.
+    :rtype: async generator
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    async for row in rows:
+        yield writer.writerow(_csv_values(row))
+
+
+def _escape_ics(value: str) -> str:
+    return (value.replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def _fold_ics(line: str) -> str:
+    """
+    Folds a content line at 75 octets as required by RFC 5545.
+    """
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Never split a multi-byte UTF-8 character.
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+        limit = 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _ics_header(calendar_name: str) -> str:
+    return ('BEGIN:VCALENDAR\r\nVERSION:2.0\r\n'
+            f'PRODID:{ICS_PRODID}\r\nCALSCALE:GREGORIAN\r\n'
+            + _fold_ics(f'X-WR-CALNAME:{_escape_ics(calendar_name)}'))
+
+
+def _ics_event(row) -> str:
+    (event_date, start, end, venue, performer, engineer, notes,
+     pk, updated_at) = row
+    start_dt, end_dt = event_interval(event_date, start, end)
+    stamp = updated_at.astimezone(dt_timezone.utc)
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:event-{pk}@schedule-planner',
+        f'DTSTAMP:{stamp:%Y%m%dT%H%M%SZ}',
+        f'DTSTART:{start_dt:%Y%m%dT%H%M%S}',
+        f'DTEND:{end_dt:%Y%m%dT%H%M%S}',
+        f'SUMMARY:{_escape_ics(performer)}',
+        f'LOCATION:{_escape_ics(venue)}',
+    ]
+    if engineer:
+        lines.append(f'X-SOUND-ENGINEER:{_escape_ics(engineer)}')
+    if notes:
+        lines.append(f'DESCRIPTION:{_escape_ics(notes)}')
+    lines.append('END:VEVENT')
+    return ''.join(_fold_ics(line) for line in lines)
+
+
+def ics_lines(rows, calendar_name: str = 'Entertainment Schedule'):
+    """
+    Formats export rows as an iCalendar document, one event at a time.
+
+    Times are written as floating local times, matching how they are
+    stored. Sets running past midnight end on the following day.
+
+    :param rows: Tuples in :data:`EXPORT_FIELDS` order.
+    :param calendar_name: Display name of the calendar.
+    :type calendar_name: str
+
+    :returns: A generator of folded iCalendar text chunks.
+    :rtype: generator
+    """
+    yield _ics_header(calendar_name)
+    for row in rows:
+        yield _ics_event(row)
+    yield ICS_FOOTER
+
+
+async def aics_lines(rows, calendar_name: str = 'Entertainment Schedule'):
+    """
+    Asynchronous version of :func:`ics_lines`.
+
+    :param rows: An async iterator of tuples in :data:`EXPORT_FIELDS`
+                 order.
+    :param calendar_name: Display name of the calendar.
+    :type calendar_name: str
+
+    :returns: An async generator of folded iCalendar text chunks.
+    :rtype: async generator
+    """
+    yield _ics_header(calendar_name)
+    async for row in rows:
+        yield _ics_event(row)
+    yield ICS_FOOTER
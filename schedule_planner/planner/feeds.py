@@ -0,0 +1,124 @@
+"""
+Per-engineer iCalendar subscription feeds.
+
+Each :class:`~planner.models.SoundEngineer` has a secret ``feed_token`` and a
+``feed_version`` that is bumped whenever one of their events changes. The
+version doubles as the feed's ETag, so a calendar app polling an unchanged
+feed costs one indexed lookup on the token and a 304 response. Generated
+bodies are cached under the version, so they are rebuilt only after that
+engineer's events change.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from .exporting import aexport_rows, aics_lines, export_rows, ics_lines
+from .models import SoundEngineer
+
+# How far back feeds reach; older events are of no use on a phone.
+FEED_HISTORY_DAYS = 30
+
+
+def feed_window_start():
+    """
+    Returns the earliest date included in the feeds today.
+
+    :rtype: date
+    """
+    return timezone.localdate() - timedelta(days=FEED_HISTORY_DAYS)
+
+
+def bump_feed_versions(engineer_ids):
+    """
+    Marks the feeds of the given engineers as changed.
+
+    Uses a single ``UPDATE`` so no model signals are sent.
+
+    :param engineer_ids: Iterable of engineer primary keys; ``None`` values
+                         are ignored.
+    """
+    engineer_ids = {pk for pk in engineer_ids if pk is not None}
+    if engineer_ids:
+        SoundEngineer.objects.filter(pk__in=engineer_ids).update(
+            feed_version=F('feed_version') + 1)
+
+
+def feed_state(token: str):
+    """
+    Looks up the feed identity for a token with one indexed query.
+
+    :param token: The feed token from the URL.
+    :type token: str
+
+    :returns: A ``(pk, name, feed_version)`` tuple, or ``None`` for an
+              unknown token.
+    :rtype: tuple or None
+    """
+    return (SoundEngineer.objects.filter(feed_token=token)
+            .values_list('pk', 'name', 'feed_version').first())
+
+
+async def afeed_state(token: str):
+    """
+    Asynchronous version of :func:`feed_state`.
+
+    :rtype: tuple or None
+    """
+    return await (SoundEngineer.objects.filter(feed_token=token)
+                  .values_list('pk', 'name', 'feed_version').afirst())
+
+
+def feed_etag_value(pk: int, version: int) -> str:
+    """
+    Builds the ETag of a feed from its engineer and version.
+
+    The window start is included because the feed drops old events daily.
+
+    :rtype: str
+    """
+    return f"{pk}.{version}.{feed_window_start():%Y%m%d}"
+
+
+def _feed_cache_key(pk: int, version: int) -> str:
+    return f'planner:feed:{feed_etag_value(pk, version)}'
+
+
+def feed_body(pk: int, name: str, version: int) -> str:
+    """
+    Returns the iCalendar body of an engineer's feed, cached per version.
+
+    :param pk: The engineer's primary key.
+    :type pk: int
+    :param name: The engineer's name, used as the calendar name.
+    :type name: str
+    :param version: The engineer's current feed version.
+    :type version: int
+
+    :returns: The iCalendar document.
+    :rtype: str
+    """
+    key = _feed_cache_key(pk, version)
+    body = cache.get(key)
+    if body is None:
+        rows = export_rows(start_date=feed_window_start(), engineer=pk)
+        body = ''.join(ics_lines(rows, calendar_name=f"{name} - bookings"))
+        cache.set(key, body, timeout=60 * 60 * 24)
+    return body
+
+
+async def afeed_body(pk: int, name: str, version: int) -> str:
+    """
+    Asynchronous version of :func:`feed_body`, sharing its cache entries.
+
+    :rtype: str
+    """
+    key = _feed_cache_key(pk, version)
+    body = await cache.aget(key)
+    if body is None:
+        rows = aexport_rows(start_date=feed_window_start(), engineer=pk)
+        body = ''.join([chunk async for chunk in aics_lines(
+            rows, calendar_name=f"{name} - bookings")])
+        await cache.aset(key, body, timeout=60 * 60 * 24)
+    return body
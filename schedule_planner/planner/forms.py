@@ -1,7 +1,87 @@
 # Import models/sql tables from models.py and the forms modules from Django.
 
+from datetime import timedelta
+from itertools import chain
+
 from django import forms
-from .models import Event, ContactMessage
+from django.db.models import Q
+from django.forms.models import ModelChoiceIterator, ModelChoiceIteratorValue
+from .availability import (busy_engineer_ids, mask_clashes,
+                           unavailability_masks)
+from .cache import get_engineer_choices
+from .models import Event, ContactMessage, SoundEngineer
+from .recurrence import occurrence_bookings
+from .scheduling import event_interval, intervals_overlap
+
+# Rosters larger than this are not rendered in full; the event form's
+# typeahead loads matching engineers instead.
+ENGINEER_CHOICES_LIMIT = 200
+
+# Most events a single bulk edit may change.
+BULK_EDIT_LIMIT = 500
+
+# Deepest search results page served.
+MAX_SEARCH_PAGE = 1000
+
+# Furthest a bulk edit may move events: ten years, or a day of minutes.
+MAX_SHIFT_DAYS = 3650
+MAX_SHIFT_MINUTES = 24 * 60
+
+
+class CachedEngineerIterator(ModelChoiceIterator):
+    """
+    Yields engineer choices from the cached roster instead of querying.
+    """
+
+    def _choices(self):
+        hidden = self.field.hidden_ids
+        choices = [(pk, name) for pk, name in get_engineer_choices()
+                   if pk not in hidden]
+        if len(choices) > ENGINEER_CHOICES_LIMIT:
+            selected = str(self.field.selected_id)
+            choices = [(pk, name) for pk, name in choices
+                       if str(pk) == selected]
+        return choices
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for pk, name in self._choices():
+            yield (ModelChoiceIteratorValue(pk, None), name)
+
+    def __len__(self):
+        return len(self._choices()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self._choices())
+
+
+class EngineerChoiceField(forms.ModelChoiceField):
+    """
+    Sound engineer field whose options come from the cached roster, so
+    rendering a form costs no query.
+
+    :ivar hidden_ids: Engineers left out of the options and refused when
+                      submitted.
+    :ivar selected_id: The current value, which stays among the options
+                       even when the roster is too large to list in full.
+    """
+    iterator = CachedEngineerIterator
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hidden_ids = set()
+        self.selected_id = None
+
+    def hide(self, engineer_ids):
+        """
+        Leaves the given engineers out of the options.
+
+        :param engineer_ids: Primary keys to hide.
+        """
+        self.hidden_ids = set(engineer_ids)
+        self.queryset = self.queryset.exclude(pk__in=self.hidden_ids)
+
 
 # Create a new form sub class that we can build form objects with while tapping
 # into Django's powerful pre-built bass or superclasses
@@ -12,8 +92,15 @@ class EventForm(forms.ModelForm):
     Form for creating and updating event info
     This form based on the :class:`~planner.models.Event` model and
     inherits from `~django.forms.ModelForm` to generate and create forms.
+    Saving is refused when the event would double-book its sound engineer
+    or its venue.
     :cvar Meta: Inner class to build and host metadata for the form.
+    :cvar check_conflicts: Look up double bookings in the database while
+                           cleaning. Bulk importers switch this off and check
+                           whole batches at once instead.
     """
+    check_conflicts = True
+
     class Meta:
         """
         Metadata for the event form
@@ -36,6 +123,9 @@ class EventForm(forms.ModelForm):
             'performer',
             'sound_engineer',
         ]
+        field_classes = {
+            'sound_engineer': EngineerChoiceField,
+        }
         # Widgets Dict for UI to pick dates and times
         widgets = {
             'date': forms.DateInput(attrs={'type': 'date'}),
@@ -43,6 +133,106 @@ class EventForm(forms.ModelForm):
             'performance_time_end': forms.TimeInput(attrs={'type': 'time'}),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        field = self.fields.get('sound_engineer')
+        if isinstance(field, EngineerChoiceField):
+            field.selected_id = (self.data.get(self.add_prefix(
+                'sound_engineer')) if self.is_bound else
+                self.initial.get('sound_engineer'))
+
+    def clean(self):
+        """
+        Rejects events that overlap another booking of the same sound
+        engineer or the same venue, including residency occurrences, or
+        that fall in the engineer's declared unavailability.
+
+        Candidates are fetched in a single query over the event's date and
+        its neighbouring days (for sets running past midnight), served by
+        the ``(sound_engineer, date)`` and ``(venue, date)`` indexes, and
+        the occurrences in those days are expanded from the matching
+        residencies. Unavailability is read for the engineer alone and
+        checked slot by slot like the availability bitmaps. The cost
+        therefore depends on one engineer's and one venue's bookings over
+        three days, not on the size of the schedule.
+
+        :returns: The cleaned form data.
+        :rtype: dict
+        """
+        cleaned_data = super().clean()
+        event_date = cleaned_data.get('date')
+        start = cleaned_data.get('performance_time_start')
+        end = cleaned_data.get('performance_time_end')
+        venue = cleaned_data.get('venue')
+        engineer = cleaned_data.get('sound_engineer')
+        if not self.check_conflicts:
+            return cleaned_data
+        if event_date is None or start is None or end is None:
+            return cleaned_data
+
+        clash_filter = Q()
+        if engineer is not None:
+            clash_filter |= Q(sound_engineer=engineer)
+        if venue:
+            clash_filter |= Q(venue=venue)
+        if not clash_filter:
+            return cleaned_data
+
+        interval = event_interval(event_date, start, end)
+        window = (event_date - timedelta(days=1),
+                  event_date + timedelta(days=1))
+        candidates = (
+            Event.objects
+            .filter(clash_filter, date__range=window)
+            .exclude(pk=self.instance.pk)
+            .order_by()
+            .values_list('date', 'performance_time_start',
+                         'performance_time_end', 'sound_engineer_id',
+                         'venue', 'performer')
+        )
+        occurrences = occurrence_bookings(
+            *window, engineer_ids=[engineer.pk] if engineer else [],
+            venues=[venue] if venue else [])
+        bookings = chain(candidates, (row[1:] for row in occurrences))
+        for (other_date, other_start, other_end, other_engineer,
+             other_venue, performer) in bookings:
+            if not intervals_overlap(
+                    interval, event_interval(other_date, other_start,
+                                             other_end)):
+                continue
+            clash = (f"{performer} on {other_date} "
+                     f"{other_start:%H:%M}-{other_end:%H:%M}")
+            if engineer is not None and other_engineer == engineer.pk:
+                self.add_error('sound_engineer',
+                               f"{engineer} is already booked for {clash}.")
+            if venue and other_venue == venue:
+                self.add_error('venue',
+                               f"{venue} is already booked for {clash}.")
+        if engineer is not None and mask_clashes(
+                unavailability_masks(event_date, event_date,
+                                     engineer_ids=[engineer.pk]),
+                engineer.pk, event_date, start, end):
+            self.add_error('sound_engineer',
+                           f"{engineer} is unavailable at that time.")
+        return cleaned_data
+
+    def limit_to_free_engineers(self, event_date, start, end):
+        """
+        Restricts the engineer choices to those free for a slot, according
+        to the availability bitmaps. The engineer already assigned to the
+        event stays selectable.
+
+        :param event_date: The date of the slot.
+        :type event_date: date
+        :param start: Start time of the slot.
+        :type start: time
+        :param end: End time of the slot.
+        :type end: time
+        """
+        busy = busy_engineer_ids(event_date, start, end)
+        busy.discard(self.instance.sound_engineer_id)
+        self.fields['sound_engineer'].hide(busy)
+
 
 class ContactForm(forms.ModelForm):
     """
@@ -70,3 +260,289 @@ class ContactForm(forms.ModelForm):
             # 'is_read',
             # 'replied_to'
         ]
+
+
+class AutoAssignForm(forms.Form):
+    """
+    Form for choosing the date range handed to the automatic engineer
+    assignment.
+
+    :ivar start_date: First date of the range.
+    :ivar end_date: Last date of the range.
+    :ivar dry_run: Preview the assignment without saving it.
+    """
+    start_date = forms.DateField(
+        widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(
+        widget=forms.DateInput(attrs={'type': 'date'}))
+    dry_run = forms.BooleanField(required=False,
+                                 label="Preview only (do not save)")
+
+    def clean(self):
+        """
+        Ensures the range does not end before it starts.
+        """
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        if start_date and end_date and start_date > end_date:
+            raise forms.ValidationError(
+                "The end date must not be before the start date.")
+        return cleaned_data
+
+
+class CloneScheduleForm(forms.Form):
+    """
+    Form for copying a date range of the schedule to another period.
+
+    :ivar start_date: First date to copy.
+    :ivar end_date: Last date to copy.
+    :ivar target_start: Where the copy starts.
+    :ivar align_weekdays: Keep events on the same weekday.
+    :ivar keep_engineers: Copy the sound engineer assignments.
+    :ivar keep_notes: Copy the event notes.
+    :ivar dry_run: Preview the copy without saving it.
+    """
+    start_date = forms.DateField(
+        widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(
+        widget=forms.DateInput(attrs={'type': 'date'}))
+    target_start = forms.DateField(
+        label="Copy to",
+        widget=forms.DateInput(attrs={'type': 'date'}))
+    align_weekdays = forms.BooleanField(
+        required=False, initial=True,
+        label="Keep weekdays (start on the next matching weekday)")
+    keep_engineers = forms.BooleanField(required=False, initial=True,
+                                        label="Keep sound engineers")
+    keep_notes = forms.BooleanField(required=False,
+                                    label="Keep event notes")
+    dry_run = forms.BooleanField(required=False, initial=True,
+                                 label="Preview only (do not save)")
+
+    def clean(self):
+        """
+        Ensures the source range does not end before it starts and the
+        copy does not land on top of it.
+        """
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        target_start = cleaned_data.get('target_start')
+        if start_date and end_date and start_date > end_date:
+            raise forms.ValidationError(
+                "The end date must not be before the start date.")
+        if (start_date and end_date and target_start
+                and start_date <= target_start <= end_date):
+            raise forms.ValidationError(
+                "The copy must start outside the range being copied.")
+        return cleaned_data
+
+
+class EventImportForm(EventForm):
+    """
+    Validates one imported row with the same field rules as
+    :class:`EventForm`.
+
+    The sound engineer is given by name and resolved through a dict built
+    once per import, so validating a row never queries the database.
+    Double bookings are checked per batch by :mod:`planner.importing`.
+
+    :param engineers: Mapping of case-folded engineer names to
+                      :class:`~planner.models.SoundEngineer` instances.
+    :type engineers: dict
+    """
+    check_conflicts = False
+    sound_engineer = forms.CharField(required=False)
+
+    class Meta(EventForm.Meta):
+        fields = [
+            'date',
+            'performance_time_start',
+            'performance_time_end',
+            'venue',
+            'performer',
+            'event_notes',
+        ]
+
+    def __init__(self, *args, engineers=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.engineers = engineers or {}
+
+    def clean_sound_engineer(self):
+        """
+        Resolves the engineer name against the prefetched roster.
+
+        :returns: The matching engineer, or ``None`` when left blank.
+        :rtype: :class:`~planner.models.SoundEngineer`
+        """
+        name = (self.cleaned_data.get('sound_engineer') or '').strip()
+        if not name:
+            return None
+        try:
+            return self.engineers[name.casefold()]
+        except KeyError:
+            raise forms.ValidationError(
+                f"Unknown sound engineer \"{name}\".")
+
+
+class ImportEventsForm(forms.Form):
+    """
+    Form for uploading a CSV or iCalendar file of events.
+
+    :ivar file: The uploaded ``.csv`` or ``.ics`` file.
+    """
+    file = forms.FileField(
+        help_text="CSV with a header row, or an iCalendar (.ics) file.")
+
+
+class ExportFilterForm(forms.Form):
+    """
+    Optional filters accepted by the schedule export endpoints.
+
+    :ivar start_date: Only export events on or after this date.
+    :ivar end_date: Only export events on or before this date.
+    :ivar venue: Only export events at this venue.
+    :ivar engineer: Only export events worked by this sound engineer.
+    """
+    start_date = forms.DateField(required=False)
+    end_date = forms.DateField(required=False)
+    venue = forms.CharField(required=False, max_length=100)
+    engineer = forms.ModelChoiceField(queryset=SoundEngineer.objects.all(),
+                                      required=False)
+
+
+class SearchForm(forms.Form):
+    """
+    Query and page number for the event search page.
+
+    :ivar q: The words to search for.
+    :ivar page: The 1-based results page.
+    """
+    q = forms.CharField(required=False, max_length=200, label="Search")
+    page = forms.IntegerField(required=False, min_value=1)
+
+    def clean_page(self):
+        """
+        Caps the page number at :data:`MAX_SEARCH_PAGE`, so its offset
+        always fits the database; pages past the results are just empty.
+        """
+        page = self.cleaned_data['page']
+        return min(page, MAX_SEARCH_PAGE) if page else page
+
+
+class DashboardForm(forms.Form):
+    """
+    Optional date range of the statistics dashboard.
+
+    :ivar start_date: First date included.
+    :ivar end_date: Last date included.
+    """
+    start_date = forms.DateField(
+        required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(
+        required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+
+    def clean(self):
+        """
+        Ensures the range does not end before it starts.
+        """
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        if start_date and end_date and start_date > end_date:
+            raise forms.ValidationError(
+                "The end date must not be before the start date.")
+        return cleaned_data
+
+
+class FreeSlotForm(forms.Form):
+    """
+    A slot to look up free sound engineers for.
+
+    :ivar date: The date the slot starts on.
+    :ivar start: Start time of the slot.
+    :ivar end: End time of the slot; at or before the start means the next
+               day.
+    :ivar keep: An engineer to include even if busy.
+    """
+    date = forms.DateField()
+    start = forms.TimeField()
+    end = forms.TimeField()
+    keep = forms.IntegerField(required=False)
+
+
+class EventIdsField(forms.Field):
+    """
+    A list of event primary keys, submitted as repeated ``ids`` values.
+    """
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        if not value:
+            return []
+        if isinstance(value, str):
+            value = [value]
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in value))
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Invalid event selection.")
+        if len(ids) > BULK_EDIT_LIMIT:
+            raise forms.ValidationError(
+                f"Select at most {BULK_EDIT_LIMIT} events at a time.")
+        return ids
+
+
+class BulkEditForm(forms.Form):
+    """
+    A change applied to every selected event at once.
+
+    :ivar ids: Primary keys of the selected events.
+    :ivar action: Update the events or delete them.
+    :ivar shift_days: Days to move the events by; negative moves earlier.
+    :ivar shift_minutes: Minutes to move the start and end times by.
+    :ivar venue: New venue for every event; blank keeps the current ones.
+    :ivar sound_engineer: Engineer to reassign every event to.
+    :ivar unassign: Remove the engineer from every event instead.
+    """
+    UPDATE = 'update'
+    DELETE = 'delete'
+    ACTION_CHOICES = [(UPDATE, "Update selected"), (DELETE, "Delete selected")]
+
+    ids = EventIdsField(
+        error_messages={'required': "Select at least one event."})
+    action = forms.ChoiceField(choices=ACTION_CHOICES, initial=UPDATE)
+    shift_days = forms.IntegerField(initial=0, required=False,
+                                    min_value=-MAX_SHIFT_DAYS,
+                                    max_value=MAX_SHIFT_DAYS,
+                                    label="Move by days")
+    shift_minutes = forms.IntegerField(initial=0, required=False,
+                                       min_value=-MAX_SHIFT_MINUTES,
+                                       max_value=MAX_SHIFT_MINUTES,
+                                       label="Move by minutes")
+    venue = forms.CharField(required=False, max_length=100,
+                            label="New venue")
+    sound_engineer = EngineerChoiceField(queryset=SoundEngineer.objects.all(),
+                                         required=False,
+                                         label="Reassign engineer")
+    unassign = forms.BooleanField(required=False,
+                                  label="Remove the engineer")
+
+    def clean(self):
+        """
+        Ensures an update changes something.
+        """
+        cleaned_data = super().clean()
+        if cleaned_data.get('action') != self.UPDATE:
+            return cleaned_data
+        if cleaned_data.get('sound_engineer') and cleaned_data.get('unassign'):
+            raise forms.ValidationError(
+                "Choose an engineer or remove the engineer, not both.")
+        cleaned_data['shift'] = timedelta(
+            days=cleaned_data.get('shift_days') or 0,
+            minutes=cleaned_data.get('shift_minutes') or 0)
+        if not (cleaned_data['shift'] or cleaned_data.get('venue')
+                or cleaned_data.get('sound_engineer')
+                or cleaned_data.get('unassign')):
+            raise forms.ValidationError("There is nothing to change.")
+        return cleaned_data
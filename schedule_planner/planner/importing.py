@@ -0,0 +1,346 @@
+"""
+Streaming bulk import of events from CSV and iCalendar files.
+
+Files are parsed one row at a time and validated with
+:class:`~planner.forms.EventImportForm`, which applies the same field rules
+as the regular event form. Valid rows are collected into fixed-size batches;
+each batch is checked for double bookings and engineer unavailability with
+a few queries and written with a single ``bulk_create`` in its own
+transaction. Only one batch is ever held
+in memory, so files of any size can be imported.
+"""
+import csv
+import time
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .availability import (mask_clashes, refresh_bitmaps, slot_keys,
+                           unavailability_masks)
+from .cache import bump_schedule_version
+from .exporting import CSV_COLUMNS
+from .feeds import bump_feed_versions
+from .forms import EventImportForm
+from .models import Event, EventChange, SoundEngineer
+from .recurrence import occurrence_bookings
+from .scheduling import find_clashes
+from .stats import add_deltas, apply_deltas, stat_row
+from .sync import record_changes
+
+DEFAULT_BATCH_SIZE = 500
+
+# Only the first errors are kept in full; the rest are just counted.
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportResult:
+    """
+    Summary of an import run.
+
+    :ivar created: Number of events inserted.
+    :vartype created: int
+    :ivar error_count: Number of rejected lines.
+    :vartype error_count: int
+    :ivar errors: ``(line number, message)`` pairs for rejected lines,
+                  capped at :data:`MAX_REPORTED_ERRORS`.
+    :vartype errors: list
+    :ivar elapsed: Wall clock seconds spent importing.
+    :vartype elapsed: float
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    def add_error(self, line: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    @property
+    def rows_per_second(self) -> float:
+        processed = self.created + self.error_count
+        return processed / self.elapsed if self.elapsed else 0.0
+
+
+def iter_csv_rows(stream):
+    """
+    Yields ``(line number, row dict)`` pairs from a CSV text stream.
+
+    :param stream: A text file object opened with ``newline=''``.
+
+    :returns: A generator of ``(int, dict)`` tuples.
+    :rtype: generator
+    """
+    reader = csv.DictReader(stream)
+    if reader.fieldnames:
+        reader.fieldnames = [name.strip().lower()
+                             for name in reader.fieldnames]
+    for row in reader:
+        yield reader.line_num, {column: (row.get(column) or '').strip()
+                                for column in CSV_COLUMNS}
+
+
+def _unfold_ics_lines(stream):
+    """
+    Joins folded iCalendar content lines (RFC 5545, section 3.1).
+    """
+    pending = None
+    pending_line = 0
+    for line_number, raw in enumerate(stream, start=1):
+        line = raw.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and pending is not None:
+            pending += line[1:]
+            continue
+        if pending is not None:
+            yield pending_line, pending
+        pending, pending_line = line, line_number
+    if pending:
+        yield pending_line, pending
+
+
+def _unescape_ics(value: str) -> str:
+    return (value.replace('\\n', '\n').replace('\\N', '\n')
+            .replace('\\,', ',').replace('\\;', ';').replace('\\\\', '\\'))
+
+
+def _parse_ics_datetime(value: str, params: dict) -> datetime | date:
+    """
+    Parses a DTSTART/DTEND value into local wall-clock time.
+
+    UTC values and values with a ``TZID`` are converted to the current time
+    zone; floating values are taken as they are.
+    """
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return datetime.strptime(value, '%Y%m%d').date()
+    if value.endswith('Z'):
+        parsed = datetime.strptime(value, '%Y%m%dT%H%M%SZ').replace(
+            tzinfo=ZoneInfo('UTC'))
+        return timezone.localtime(parsed).replace(tzinfo=None)
+    parsed = datetime.strptime(value, '%Y%m%dT%H%M%S')
+    if 'TZID' in params:
+        try:
+            zone = ZoneInfo(params['TZID'])
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"unknown time zone {params['TZID']}")
+        return timezone.localtime(parsed.replace(tzinfo=zone)).replace(
+            tzinfo=None)
+    return parsed
+
+
+def iter_ics_rows(stream):
+    """
+    Yields ``(line number, row dict)`` pairs from an iCalendar text stream.
+
+    Each ``VEVENT`` becomes one row: ``SUMMARY`` is the performer,
+    ``LOCATION`` the venue, ``DESCRIPTION`` the notes and the custom
+    ``X-SOUND-ENGINEER`` property the engineer's name. Rows that cannot be
+    parsed are yielded with an ``error`` key.
+
+    :param stream: A text file object.
+
+    :returns: A generator of ``(int, dict)`` tuples.
+    :rtype: generator
+    """
+    event = None
+    start_line = 0
+    for line_number, line in _unfold_ics_lines(stream):
+        name_part, _, value = line.partition(':')
+        name, *param_parts = name_part.split(';')
+        name = name.upper()
+        params = dict(part.split('=', 1) for part in param_parts
+                      if '=' in part)
+        if name == 'BEGIN' and value.upper() == 'VEVENT':
+            event, start_line = {}, line_number
+        elif event is None:
+            continue
+        elif name == 'END' and value.upper() == 'VEVENT':
+            yield start_line, _ics_event_to_row(event)
+            event = None
+        elif name in ('DTSTART', 'DTEND'):
+            try:
+                event[name] = _parse_ics_datetime(value, params)
+            except ValueError as error:
+                event['error'] = f"{name}: {error}"
+        elif name in ('SUMMARY', 'LOCATION', 'DESCRIPTION',
+                      'X-SOUND-ENGINEER'):
+            event[name] = _unescape_ics(value)
+
+
+def _ics_event_to_row(event: dict) -> dict:
+    row = {
+        'venue': event.get('LOCATION', ''),
+        'performer': event.get('SUMMARY', ''),
+        'sound_engineer': event.get('X-SOUND-ENGINEER', ''),
+        'event_notes': event.get('DESCRIPTION', ''),
+    }
+    if 'error' in event:
+        row['error'] = event['error']
+        return row
+    start, end = event.get('DTSTART'), event.get('DTEND')
+    if not isinstance(start, datetime) or not isinstance(end, datetime):
+        row['error'] = "DTSTART and DTEND must both be date-times."
+        return row
+    if end - start >= timedelta(days=1):
+        row['error'] = "Events may not last a day or longer."
+        return row
+    row.update({
+        'date': start.date(),
+        'performance_time_start': start.time(),
+        'performance_time_end': end.time(),
+    })
+    return row
+
+
+def _reject_clashes(batch: list, result: ImportResult) -> list:
+    """
+    Drops batch rows that double-book an engineer or a venue, or book an
+    engineer during their declared unavailability.
+
+    Existing events sharing an engineer or venue with the batch are read in
+    one query over the batch's date span, together with the occurrences of
+    matching residencies, then merged with the new rows and swept. A new
+    row clashing with an existing booking or an earlier new row is
+    rejected. The engineers' unavailability is read in one more query.
+
+    :param batch: ``(line number, unsaved Event)`` pairs.
+    :type batch: list
+
+    :returns: The pairs that can be inserted.
+    :rtype: list
+    """
+    dates = [event.date for _, event in batch]
+    engineer_ids = {event.sound_engineer_id for _, event in batch
+                    if event.sound_engineer_id}
+    venues = {event.venue for _, event in batch}
+    window = (min(dates) - timedelta(days=1), max(dates) + timedelta(days=1))
+    existing = (Event.objects
+                .filter(Q(sound_engineer_id__in=engineer_ids)
+                        | Q(venue__in=venues),
+                        date__range=window)
+                .order_by()
+                .values_list('id', 'date', 'performance_time_start',
+                             'performance_time_end', 'sound_engineer_id',
+                             'venue'))
+    rows = [(('existing', pk), event_date, start, end, engineer_id, venue)
+            for pk, event_date, start, end, engineer_id, venue in existing]
+    rows += [(('occurrence', pk), day, start, end, engineer_id, venue)
+             for pk, day, start, end, engineer_id, venue, _
+             in occurrence_bookings(*window, engineer_ids=engineer_ids,
+                                    venues=venues)]
+    rows += [(('new', index), event.date, event.performance_time_start,
+              event.performance_time_end, event.sound_engineer_id,
+              event.venue)
+             for index, (_, event) in enumerate(batch)]
+
+    names = {event.sound_engineer_id: event.sound_engineer.name
+             for _, event in batch if event.sound_engineer_id}
+    rejected = {}
+    for label, key in (('Sound engineer', lambda row: row[4]),
+                       ('Venue', lambda row: row[5])):
+        for group, first, second in find_clashes(rows, key):
+            # Blame the newer of the two rows.
+            newcomer = second if second[0][0] == 'new' else first
+            other = first if newcomer is second else second
+            if newcomer[0][0] != 'new' or newcomer[0][1] in rejected:
+                continue
+            if other[0][0] == 'new':
+                if other[0][1] in rejected:
+                    continue
+                clash_with = f"line {batch[other[0][1]][0]}"
+            elif other[0][0] == 'occurrence':
+                clash_with = f"residency occurrence {other[0][1]}"
+            else:
+                clash_with = f"event #{other[0][1]}"
+            rejected[newcomer[0][1]] = (
+                f"{label} {names.get(group, group)} is already booked "
+                f"({clash_with}).")
+    unavailable = unavailability_masks(min(dates), max(dates),
+                                       engineer_ids=engineer_ids)
+    for index, (_, event) in enumerate(batch):
+        if index not in rejected and mask_clashes(
+                unavailable, event.sound_engineer_id, event.date,
+                event.performance_time_start, event.performance_time_end):
+            rejected[index] = (f"Sound engineer "
+                               f"{names[event.sound_engineer_id]} is "
+                               f"unavailable at that time.")
+    for index, message in sorted(rejected.items()):
+        result.add_error(batch[index][0], message)
+    return [pair for index, pair in enumerate(batch)
+            if index not in rejected]
+
+
+def _flush(batch: list, result: ImportResult):
+    if not batch:
+        return
+    with transaction.atomic():
+        accepted = _reject_clashes(batch, result)
+        created = Event.objects.bulk_create([event for _, event in accepted])
+        # bulk_create() sends no signals, so log and invalidate by hand.
+        record_changes([event.pk for event in created], EventChange.UPSERT)
+        bump_feed_versions({event.sound_engineer_id
+                            for _, event in accepted})
+        apply_deltas(add_deltas({}, [stat_row(event) for event in created]))
+        refresh_bitmaps(set().union(*(
+            slot_keys(event.sound_engineer_id, event.date,
+                      event.performance_time_start,
+                      event.performance_time_end)
+            for event in created)))
+    result.created += len(accepted)
+
+
+def import_events(rows, batch_size: int = DEFAULT_BATCH_SIZE,
+                  result: ImportResult | None = None) -> ImportResult:
+    """
+    Validates and inserts events from an iterable of parsed rows.
+
+    Each batch is committed on its own, so an error part way through, such
+    as an undecodable line, keeps the batches written before it. The
+    schedule version is bumped for those too.
+
+    :param rows: ``(line number, row dict)`` pairs, as produced by
+                 :func:`iter_csv_rows` or :func:`iter_ics_rows`.
+    :param batch_size: Number of valid rows inserted per ``bulk_create``.
+    :type batch_size: int
+    :param result: Summary to fill in; pass one to read what was committed
+                   when the import raises.
+    :type result: ImportResult
+
+    :returns: The import summary.
+    :rtype: ImportResult
+    """
+    started = time.perf_counter()
+    if result is None:
+        result = ImportResult()
+    engineers = {engineer.name.casefold(): engineer
+                 for engineer in SoundEngineer.objects.all()}
+    batch = []
+    try:
+        for line, row in rows:
+            if 'error' in row:
+                result.add_error(line, row['error'])
+                continue
+            form = EventImportForm(row, engineers=engineers)
+            if not form.is_valid():
+                result.add_error(line, '; '.join(
+                    f"{field}: {' '.join(messages)}" if field != '__all__'
+                    else ' '.join(messages)
+                    for field, messages in form.errors.items()))
+                continue
+            event = form.save(commit=False)
+            event.sound_engineer = form.cleaned_data['sound_engineer']
+            batch.append((line, event))
+            if len(batch) >= batch_size:
+                _flush(batch, result)
+                batch = []
+        _flush(batch, result)
+    finally:
+        if result.created:
+            bump_schedule_version()
+        result.elapsed = time.perf_counter() - started
+    return result
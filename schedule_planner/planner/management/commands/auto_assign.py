@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.assignment import auto_assign
+
+
+class Command(BaseCommand):
+    """
+    Assigns sound engineers to the unassigned events in a date range.
+    """
+    help = "Automatically assign sound engineers to unassigned events."
+
+    def add_arguments(self, parser):
+        parser.add_argument('start', type=date.fromisoformat,
+                            help="First date of the range (YYYY-MM-DD).")
+        parser.add_argument('end', type=date.fromisoformat,
+                            help="Last date of the range (YYYY-MM-DD).")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Show the assignment without saving it.")
+
+    def handle(self, *args, **options):
+        if options['start'] > options['end']:
+            raise CommandError("start must not be after end.")
+        result = auto_assign(options['start'], options['end'],
+                             commit=not options['dry_run'])
+        for event, engineer in result.assigned:
+            self.stdout.write(f"{event} -> {engineer}")
+        for event in result.unassigned:
+            self.stdout.write(self.style.WARNING(f"{event} -> uncovered"))
+        verb = "Would assign" if options['dry_run'] else "Assigned"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result.assigned_count} event(s); "
+            f"{result.unassigned_count} slot(s) could not be covered."))
@@ -0,0 +1,91 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.benchmarking import (DEFAULT_REQUESTS, DEFAULT_SCALES,
+                                  compare_results, run_benchmark)
+
+
+def _scales(value: str) -> list:
+    try:
+        scales = [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise CommandError("--rows takes comma-separated event counts.")
+    if not scales or min(scales) < 1:
+        raise CommandError("--rows needs at least one positive count.")
+    return scales
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks the schedule, event editing, contact and login pages at
+    growing schedule sizes, optionally against a saved baseline.
+
+    The synthetic data lives in a transaction that is rolled back, so the
+    database is left untouched. Fails when ``--compare`` finds
+    regressions, so it can gate CI.
+    """
+    help = "Measure latency, queries and memory of the hot request paths."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default=','.join(
+                                map(str, DEFAULT_SCALES)),
+                            help="Comma-separated event counts to measure "
+                                 "at, e.g. 1000,10000,100000,1000000.")
+        parser.add_argument('--requests', type=int, default=DEFAULT_REQUESTS,
+                            help="Requests per scenario and size.")
+        parser.add_argument('--seed', type=int, default=1,
+                            help="Random seed (default 1).")
+        parser.add_argument('--output',
+                            help="Save the results as JSON, e.g. as a new "
+                                 "baseline.")
+        parser.add_argument('--compare',
+                            help="Baseline JSON to check the results "
+                                 "against.")
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help="Allowed relative slowdown before a "
+                                 "regression is reported (default 0.2).")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError("--requests must be at least 1.")
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as stream:
+                    baseline = json.load(stream)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"Cannot read the baseline: {error}")
+
+        report = run_benchmark(_scales(options['rows']),
+                               requests=options['requests'],
+                               seed=options['seed'],
+                               progress=self.stderr.write)
+        for scale, results in report['results'].items():
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{scale} events (peak RSS {results['peak_rss_mb'] or 0:.0f}"
+                f" MiB)"))
+            for scenario, metrics in results.items():
+                if scenario == 'peak_rss_mb':
+                    continue
+                self.stdout.write(
+                    f"  {scenario:14} p50 {metrics['p50_ms']:8.2f} ms  "
+                    f"p99 {metrics['p99_ms']:8.2f} ms  "
+                    f"queries {metrics['queries']:6.2f}  "
+                    f"errors {metrics['errors']}")
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                json.dump(report, stream, indent=2)
+            self.stdout.write(f"Saved results to {options['output']}.")
+
+        if baseline is not None:
+            regressions = compare_results(baseline, report,
+                                          options['tolerance'])
+            for message in regressions:
+                self.stdout.write(self.style.ERROR(message))
+            if regressions:
+                raise CommandError(
+                    f"{len(regressions)} regression(s) against "
+                    f"{options['compare']}.")
+            self.stdout.write(self.style.SUCCESS(
+                "No regressions against the baseline."))
@@ -0,0 +1,80 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.utils import timezone
+
+from planner.cache import bump_schedule_version
+from planner.models import Event
+from planner.views import index
+
+
+class Command(BaseCommand):
+    """
+    Measures schedule page latency with a cold and a warm fragment cache.
+
+    Each miss is forced by bumping the schedule version before the request;
+    hits repeat the same request against an unchanged version. Optional
+    seed events are created inside a transaction that is rolled back once
+    the benchmark finishes, leaving the database untouched.
+    """
+    help = "Benchmark schedule page latency for fragment cache hits/misses."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50,
+                            help="Number of requests per scenario.")
+        parser.add_argument('--seed', type=int, default=0,
+                            help="Temporary events to create first.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                self._seed(options['seed'])
+            for label, user in (
+                ('planner', User(username='benchmark', is_superuser=True)),
+                ('client', User(username='benchmark')),
+            ):
+                miss = self._measure(user, options['requests'], bump=True)
+                hit = self._measure(user, options['requests'], bump=False)
+                self.stdout.write(
+                    f"{label:8} miss p50={self._ms(miss)} "
+                    f"hit p50={self._ms(hit)} "
+                    f"speed-up x{statistics.median(miss) / statistics.median(hit):.1f}")
+            transaction.set_rollback(True)
+        bump_schedule_version()
+
+    def _seed(self, count):
+        today = timezone.localdate()
+        Event.objects.bulk_create(
+            Event(date=today + timedelta(days=i // 10),
+                  performance_time_start=f"{18 + i % 4}:00",
+                  performance_time_end="23:00",
+                  venue=f"Venue {i % 7}",
+                  performer=f"Performer {i}")
+            for i in range(count))
+
+    def _measure(self, user, count, bump):
+        factory = RequestFactory()
+        timings = []
+        # Warm up so the first hit is not measured as a miss.
+        self._get(factory, user)
+        for _ in range(count):
+            if bump:
+                bump_schedule_version()
+            start = time.perf_counter()
+            self._get(factory, user)
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    def _get(self, factory, user):
+        request = factory.get('/')
+        request.user = user
+        return index(request)
+
+    @staticmethod
+    def _ms(timings):
+        return f"{statistics.median(timings) * 1000:.2f}ms"
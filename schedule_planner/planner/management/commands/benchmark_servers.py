@@ -0,0 +1,88 @@
+import json
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.serverbench import SERVER_PROFILES, run_server_benchmark
+
+
+class Command(BaseCommand):
+    """
+    Compares the throughput of the WSGI (sync workers) and ASGI (uvicorn
+    workers) deployments while slow clients hold connections open.
+
+    Starts each server against the configured database, so point it at a
+    scratch database filled by ``generate_schedule_data``.
+    """
+    help = ("Compare WSGI and ASGI throughput of the schedule page while "
+            "slow clients download the export.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default=','.join(SERVER_PROFILES),
+                            help="Comma-separated server profiles to "
+                                 "measure (default wsgi,asgi).")
+        parser.add_argument('--workers', type=int, default=2,
+                            help="Gunicorn workers per server (default 2).")
+        parser.add_argument('--duration', type=float, default=20,
+                            help="Seconds to measure each server "
+                                 "(default 20).")
+        parser.add_argument('--fast-clients', type=int, default=20,
+                            help="Clients requesting the schedule back to "
+                                 "back (default 20).")
+        parser.add_argument('--slow-clients', type=int, default=16,
+                            help="Clients downloading the export slowly "
+                                 "(default 16).")
+        parser.add_argument('--slow-send', type=float, default=5,
+                            help="Seconds a slow client takes to send its "
+                                 "request (default 5).")
+        parser.add_argument('--read-rate', type=float, default=64,
+                            help="KiB per second a slow client reads, 0 for "
+                                 "no limit (default 64).")
+        parser.add_argument('--output',
+                            help="Save the results as JSON.")
+
+    def handle(self, *args, **options):
+        profiles = [name.strip() for name in options['profiles'].split(',')
+                    if name.strip()]
+        unknown = set(profiles) - set(SERVER_PROFILES)
+        if not profiles or unknown:
+            raise CommandError(
+                f"--profiles takes some of {', '.join(SERVER_PROFILES)}.")
+        if options['workers'] < 1 or options['fast_clients'] < 1:
+            raise CommandError(
+                "--workers and --fast-clients must be at least 1.")
+        if (options['duration'] <= 0 or options['slow_clients'] < 0
+                or options['slow_send'] < 0 or options['read_rate'] < 0):
+            raise CommandError("--duration must be positive and the slow "
+                               "client options not negative.")
+
+        try:
+            report = run_server_benchmark(
+                profiles, workers=options['workers'],
+                duration=options['duration'],
+                fast_clients=options['fast_clients'],
+                slow_clients=options['slow_clients'],
+                slow_send=options['slow_send'],
+                read_rate=options['read_rate'],
+                progress=self.stderr.write)
+        except (ImproperlyConfigured, RuntimeError) as error:
+            raise CommandError(str(error))
+
+        for profile, metrics in report['results'].items():
+            self.stdout.write(
+                f"{profile:5} {metrics['requests_per_second']:8.1f} req/s  "
+                f"p50 {metrics['p50_ms'] or 0:8.1f} ms  "
+                f"p95 {metrics['p95_ms'] or 0:8.1f} ms  "
+                f"errors {metrics['errors']}  "
+                f"slow downloads {metrics['slow_completed']}")
+        results = report['results']
+        if {'wsgi', 'asgi'} <= set(results) and results['wsgi'][
+                'requests_per_second']:
+            ratio = (results['asgi']['requests_per_second']
+                     / results['wsgi']['requests_per_second'])
+            self.stdout.write(self.style.SUCCESS(
+                f"ASGI served {ratio:.1f}x the WSGI throughput."))
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                json.dump(report, stream, indent=2)
+            self.stdout.write(f"Saved results to {options['output']}.")
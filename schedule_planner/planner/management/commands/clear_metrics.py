@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from planner.metrics import clear_metrics, metrics_dir
+
+
+class Command(BaseCommand):
+    """
+    Empties the request metrics directory.
+
+    Run it before starting the server, so files of workers from a previous
+    run do not pile up or count towards the new totals.
+    """
+    help = "Remove the request metrics files of every worker."
+
+    def handle(self, *args, **options):
+        removed = clear_metrics()
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {removed} metrics files from {metrics_dir()}."))
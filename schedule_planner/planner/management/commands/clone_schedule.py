@@ -0,0 +1,51 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.cloning import clone_schedule
+
+
+class Command(BaseCommand):
+    """
+    Copies the events in a date range so the copy starts at a target date.
+    """
+    help = "Copy a date range of the schedule to another period."
+
+    def add_arguments(self, parser):
+        parser.add_argument('start', type=date.fromisoformat,
+                            help="First date to copy (YYYY-MM-DD).")
+        parser.add_argument('end', type=date.fromisoformat,
+                            help="Last date to copy (YYYY-MM-DD).")
+        parser.add_argument('target', type=date.fromisoformat,
+                            help="Where the copy starts (YYYY-MM-DD).")
+        parser.add_argument('--exact', action='store_true',
+                            help="Start exactly on the target date instead "
+                                 "of the next date with the same weekday.")
+        parser.add_argument('--without-engineers', action='store_true',
+                            help="Leave the copies unassigned.")
+        parser.add_argument('--with-notes', action='store_true',
+                            help="Copy the event notes.")
+        parser.add_argument('--dry-run', action='store_true',
+                            help="Show the copy without saving it.")
+
+    def handle(self, *args, **options):
+        if options['start'] > options['end']:
+            raise CommandError("start must not be after end.")
+        if options['start'] <= options['target'] <= options['end']:
+            raise CommandError("target must be outside the copied range.")
+        result = clone_schedule(
+            options['start'], options['end'], options['target'],
+            keep_engineers=not options['without_engineers'],
+            keep_notes=options['with_notes'],
+            align_weekdays=not options['exact'],
+            commit=not options['dry_run'])
+        for source, copy in result.copies:
+            self.stdout.write(f"{source} -> {copy.date}")
+        for source, copy, message in result.conflicts:
+            self.stdout.write(self.style.WARNING(
+                f"{source} -> {copy.date}: {message}"))
+        verb = "Would copy" if options['dry_run'] else "Copied"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result.created_count} event(s), moved by "
+            f"{result.offset.days} day(s); "
+            f"{result.conflict_count} skipped for conflicts."))
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.sync import compact_changes
+
+
+class Command(BaseCommand):
+    """
+    Collapses the event change log to the newest entry per event.
+
+    Intended to run periodically (e.g. daily from a scheduler).
+    """
+    help = "Remove superseded entries from the event change log."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=7,
+                            help="Only compact entries older than this "
+                                 "many days (default 7).")
+
+    def handle(self, *args, **options):
+        if options['older_than'] < 0:
+            raise CommandError("--older-than must not be negative.")
+        removed = compact_changes(timedelta(days=options['older_than']))
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {removed} superseded change log entries."))
@@ -0,0 +1,63 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.models import Event, SoundEngineer
+from planner.recurrence import occurrence_bookings
+from planner.scheduling import find_clashes
+
+
+class Command(BaseCommand):
+    """
+    Reports every existing double booking of a sound engineer or a venue.
+
+    Events and residency occurrences are read once as plain tuples, grouped
+    by engineer and by venue, and each group is swept in start order, so
+    the whole report costs O(n log n) instead of comparing every pair of
+    events.
+    """
+    help = "List overlapping events for the same engineer or venue."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat,
+                            help="Only check events from this date "
+                                 "(YYYY-MM-DD).")
+        parser.add_argument('--end', type=date.fromisoformat,
+                            help="Only check events up to this date "
+                                 "(YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        if options['start'] and options['end'] and \
+                options['start'] > options['end']:
+            raise CommandError("--start must not be after --end.")
+        events = Event.objects.all()
+        if options['start']:
+            events = events.filter(date__gte=options['start'])
+        if options['end']:
+            events = events.filter(date__lte=options['end'])
+        rows = list(events.values_list(
+            'id', 'date', 'performance_time_start', 'performance_time_end',
+            'sound_engineer_id', 'venue', 'performer'))
+        rows += occurrence_bookings(options['start'] or date.min,
+                                    options['end'] or date.max)
+        names = dict(SoundEngineer.objects.values_list('id', 'name'))
+
+        total = 0
+        for label, key, title in (
+                ('Engineer', lambda row: row[4], names.get),
+                ('Venue', lambda row: row[5], str)):
+            for group, first, second in find_clashes(rows, key):
+                total += 1
+                self.stdout.write(
+                    f"{label} {title(group)}: {self._describe(first)} "
+                    f"overlaps {self._describe(second)}")
+        if total:
+            self.stdout.write(self.style.WARNING(f"{total} conflict(s) found."))
+        else:
+            self.stdout.write(self.style.SUCCESS("No conflicts found."))
+
+    @staticmethod
+    def _describe(row):
+        pk, event_date, start, end, _, _, performer = row
+        return (f"#{pk} {performer} {event_date} "
+                f"{start:%H:%M}-{end:%H:%M}")
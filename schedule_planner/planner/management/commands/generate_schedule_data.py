@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.benchmarking import default_counts, generate_schedule
+
+
+class Command(BaseCommand):
+    """
+    Fills the database with synthetic engineers, events and contact
+    messages for benchmarking and load testing.
+
+    The data is added to whatever is already there, so use an empty or
+    throwaway database.
+    """
+    help = "Bulk-create synthetic schedule data."
+
+    def add_arguments(self, parser):
+        parser.add_argument('events', type=int,
+                            help="Number of events to create.")
+        parser.add_argument('--engineers', type=int,
+                            help="Number of sound engineers to create "
+                                 "(default: one per 50 events, at least 5).")
+        parser.add_argument('--messages', type=int,
+                            help="Number of contact messages to create "
+                                 "(default: one per 20 events).")
+        parser.add_argument('--seed', type=int, default=1,
+                            help="Random seed (default 1).")
+
+    def handle(self, *args, **options):
+        default_engineers, default_messages = default_counts(
+            options['events'])
+        engineers = options['engineers']
+        messages = options['messages']
+        counts = [options['events'], engineers, messages]
+        if any(count is not None and count < 0 for count in counts):
+            raise CommandError("Counts must not be negative.")
+        created = generate_schedule(
+            options['events'],
+            default_engineers if engineers is None else engineers,
+            default_messages if messages is None else messages,
+            seed=options['seed'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created['engineers']} engineer(s), "
+            f"{created['events']} event(s) and {created['messages']} "
+            f"contact message(s)."))
@@ -0,0 +1,51 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.importing import (DEFAULT_BATCH_SIZE, import_events,
+                               iter_csv_rows, iter_ics_rows)
+
+
+class Command(BaseCommand):
+    """
+    Imports events from a CSV or iCalendar file.
+
+    The file is streamed row by row and inserted in batches, so memory use
+    does not grow with the size of the file. Rejected lines are reported
+    with their line number and the reason.
+    """
+    help = "Bulk import events from a .csv or .ics file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path, help="File to import.")
+        parser.add_argument('--format', choices=('csv', 'ics'),
+                            help="File format (defaults to the extension).")
+        parser.add_argument('--batch-size', type=int,
+                            default=DEFAULT_BATCH_SIZE,
+                            help="Rows inserted per bulk_create.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in ('csv', 'ics'):
+            raise CommandError("Use --format to choose csv or ics.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        try:
+            stream = path.open(encoding='utf-8-sig', newline='')
+        except OSError as error:
+            raise CommandError(f"Cannot open {path}: {error}")
+        with stream:
+            rows = (iter_csv_rows(stream) if file_format == 'csv'
+                    else iter_ics_rows(stream))
+            result = import_events(rows, batch_size=options['batch_size'])
+
+        for line, message in result.errors:
+            self.stderr.write(f"Line {line}: {message}")
+        if result.error_count > len(result.errors):
+            self.stderr.write(f"... {result.error_count - len(result.errors)}"
+                              " more error(s) not shown.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} event(s), rejected "
+            f"{result.error_count} line(s) in {result.elapsed:.2f}s "
+            f"({result.rows_per_second:.0f} rows/sec)."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.availability import REBUILD_BATCH_SIZE, rebuild_bitmaps
+
+
+class Command(BaseCommand):
+    """
+    Recomputes every sound engineer availability bitmap from the events,
+    residency occurrences and declared unavailability.
+
+    Use it to backfill the bitmaps after upgrading, or to repair them
+    after bookings were changed outside the application.
+    """
+    help = "Rebuild the engineer availability bitmaps."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=REBUILD_BATCH_SIZE,
+                            help="Rows read and written per batch "
+                                 f"(default {REBUILD_BATCH_SIZE}).")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        written = rebuild_bitmaps(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} availability bitmaps."))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.stats import REBUILD_BATCH_SIZE, rebuild_stats
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the daily booking statistics from the events table.
+
+    Use it to backfill the statistics after upgrading, or to repair them
+    after events were changed outside the application.
+    """
+    help = "Rebuild the daily booking statistics from all events."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=REBUILD_BATCH_SIZE,
+                            help="Rows read and written per batch "
+                                 f"(default {REBUILD_BATCH_SIZE}).")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        written = rebuild_stats(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {written} daily statistics rows."))
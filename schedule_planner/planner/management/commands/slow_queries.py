@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.slowqueries import read_log, summarise_log
+
+
+class Command(BaseCommand):
+    """
+    Summarises the slow-query log by statement fingerprint, worst total
+    time first, with the views that ran each statement and its latest
+    query plan.
+    """
+    help = "Show the slowest statements in the slow-query log."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10,
+                            help="Number of fingerprints to show "
+                                 "(default 10).")
+        parser.add_argument('--log', default=settings.SLOW_QUERY_LOG,
+                            help="Log file to read; its rotated backups "
+                                 "are read too.")
+        parser.add_argument('--no-plans', action='store_true',
+                            help="Leave out the query plans.")
+
+    def handle(self, *args, **options):
+        if options['top'] < 1:
+            raise CommandError("--top must be at least 1.")
+        log = options['log']
+        paths = [log] + [f"{log}.{index}" for index in
+                         range(1, settings.SLOW_QUERY_LOG_BACKUPS + 1)]
+        groups = summarise_log(read_log(paths))
+        if not groups:
+            self.stdout.write("No slow queries logged.")
+            return
+        for group in groups[:options['top']]:
+            self.stdout.write(self.style.WARNING(
+                f"{group['fingerprint']}  {group['count']}x  "
+                f"total {group['total_ms']:.1f} ms  "
+                f"mean {group['mean_ms']:.1f} ms  "
+                f"max {group['max_ms']:.1f} ms"))
+            self.stdout.write(f"  {group['sql']}")
+            if group['views']:
+                self.stdout.write(f"  views: {', '.join(group['views'])}")
+            if not options['no_plans']:
+                for line in group['plan']:
+                    self.stdout.write(f"    {line}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(groups)} fingerprint(s) in the log."))
@@ -0,0 +1,32 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.utilisation import (default_range, report_csv_lines,
+                                 utilisation_report)
+
+
+class Command(BaseCommand):
+    """
+    Writes the sound engineer utilisation report as CSV.
+
+    Covers hours per week, the longest run of consecutive working days,
+    finishes after midnight, tight changeovers between venues and
+    overlapping bookings. Defaults to the last twelve weeks.
+    """
+    help = "Write per-engineer workload metrics as CSV."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat,
+                            help="First date to report on (YYYY-MM-DD).")
+        parser.add_argument('--end', type=date.fromisoformat,
+                            help="Last date to report on (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        default_start, default_end = default_range()
+        start = options['start'] or default_start
+        end = options['end'] or default_end
+        if start > end:
+            raise CommandError("--start must not be after --end.")
+        for line in report_csv_lines(utilisation_report(start, end)):
+            self.stdout.write(line, ending='')
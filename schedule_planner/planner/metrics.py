@@ -0,0 +1,226 @@
+"""
+In-process request metrics, shared between workers through files.
+
+Every process keeps per-route counters and a latency histogram in memory
+and writes them to its own file in the ``METRICS_DIR`` directory at most
+every :data:`FLUSH_INTERVAL` seconds. The ``/metrics`` endpoint adds up the
+files of all workers, so whichever gunicorn worker answers the scrape
+reports the totals of the whole host. Counters only ever grow; files left
+behind by workers that have exited keep counting towards the totals, as
+Prometheus expects of counters, until :func:`clear_metrics` empties the
+directory when the server starts.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+# Upper bounds, in seconds, of the request latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+# Seconds between writes of a worker's metrics file.
+FLUSH_INTERVAL = 5
+
+# Label used for requests that did not match a URL pattern.
+UNRESOLVED_ROUTE = '<unresolved>'
+
+# Per-route values kept besides the histogram buckets.
+_TOTALS = ('count', 'duration', 'sql_count', 'sql_duration',
+           'template_duration')
+
+
+def metrics_dir() -> str:
+    """
+    Returns the directory the workers' metrics files are written to.
+
+    :rtype: str
+    """
+    return getattr(settings, 'METRICS_DIR', None) or os.path.join(
+        tempfile.gettempdir(), 'schedule_planner_metrics')
+
+
+def clear_metrics() -> int:
+    """
+    Removes every worker's metrics file, so the totals start again from
+    zero. Run it as the server starts, before any worker is forked.
+
+    :returns: The number of files removed.
+    :rtype: int
+    """
+    directory = metrics_dir()
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for name in names:
+        if name.startswith('worker-') or name.endswith('.tmp'):
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                continue
+            removed += 1
+    return removed
+
+
+def _empty_route() -> dict:
+    route = dict.fromkeys(_TOTALS, 0)
+    route['buckets'] = [0] * len(LATENCY_BUCKETS)
+    return route
+
+
+class MetricsRegistry:
+    """
+    The metrics of this process.
+
+    :ivar routes: Mapping of route name to its totals and bucket counts.
+    :vartype routes: dict
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.routes = {}
+        self._pid = os.getpid()
+        self._flushed_at = 0.0
+
+    def observe(self, route: str, duration: float, sql_count: int,
+                sql_duration: float, template_duration: float):
+        """
+        Records one request.
+
+        :param route: The URL name, such as ``planner:index``.
+        :type route: str
+        :param duration: Seconds spent handling the request.
+        :type duration: float
+        :param sql_count: Number of SQL statements run.
+        :type sql_count: int
+        :param sql_duration: Seconds spent in the database.
+        :type sql_duration: float
+        :param template_duration: Seconds spent rendering templates.
+        :type template_duration: float
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker starts from zero rather than reporting
+                # its parent's requests a second time.
+                self._reset()
+            totals = self.routes.setdefault(route, _empty_route())
+            totals['count'] += 1
+            totals['duration'] += duration
+            totals['sql_count'] += sql_count
+            totals['sql_duration'] += sql_duration
+            totals['template_duration'] += template_duration
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if duration <= bound:
+                    totals['buckets'][index] += 1
+                    break
+            due = time.monotonic() - self._flushed_at >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes this process's metrics to its file, replacing the file
+        atomically so readers never see a partial write.
+        """
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            payload = json.dumps(self.routes)
+            self._flushed_at = time.monotonic()
+        directory = metrics_dir()
+        os.makedirs(directory, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(handle, 'w') as stream:
+            stream.write(payload)
+        os.replace(temporary,
+                   os.path.join(directory, f'worker-{os.getpid()}.json'))
+
+
+registry = MetricsRegistry()
+
+
+def collect() -> dict:
+    """
+    Adds up the metrics files of every worker, after bringing this
+    process's file up to date.
+
+    :returns: Mapping of route name to its summed totals and buckets.
+    :rtype: dict
+    """
+    registry.flush()
+    directory = metrics_dir()
+    merged = {}
+    for name in os.listdir(directory):
+        if not (name.startswith('worker-') and name.endswith('.json')):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as stream:
+                routes = json.load(stream)
+        except (OSError, ValueError):
+            continue
+        for route, values in routes.items():
+            totals = merged.setdefault(route, _empty_route())
+            for key in _TOTALS:
+                totals[key] += values.get(key, 0)
+            for index, count in enumerate(values.get('buckets', [])
+                                          [:len(LATENCY_BUCKETS)]):
+                totals['buckets'][index] += count
+    return merged
+
+
+def _label(route: str) -> str:
+    escaped = (route.replace('\\', '\\\\').replace('"', '\\"')
+               .replace('\n', '\\n'))
+    return f'route="{escaped}"'
+
+
+def render_prometheus(routes: dict) -> str:
+    """
+    Formats merged metrics in the Prometheus text exposition format.
+
+    :param routes: Metrics as returned by :func:`collect`.
+    :type routes: dict
+
+    :rtype: str
+    """
+    ordered = sorted(routes.items())
+    lines = [
+        '# HELP planner_request_duration_seconds Time spent handling '
+        'requests, by route.',
+        '# TYPE planner_request_duration_seconds histogram',
+    ]
+    for route, totals in ordered:
+        label = _label(route)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, totals['buckets']):
+            cumulative += count
+            lines.append(f'planner_request_duration_seconds_bucket'
+                         f'{{{label},le="{bound}"}} {cumulative}')
+        lines.append(f'planner_request_duration_seconds_bucket'
+                     f'{{{label},le="+Inf"}} {totals["count"]}')
+        lines.append(f'planner_request_duration_seconds_sum{{{label}}} '
+                     f'{totals["duration"]:.6f}')
+        lines.append(f'planner_request_duration_seconds_count{{{label}}} '
+                     f'{totals["count"]}')
+    for name, key, description in (
+            ('planner_sql_queries_total', 'sql_count',
+             'SQL statements run, by route.'),
+            ('planner_sql_duration_seconds_total', 'sql_duration',
+             'Time spent in the database, by route.'),
+            ('planner_template_duration_seconds_total', 'template_duration',
+             'Time spent rendering templates, by route.')):
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} counter')
+        for route, totals in ordered:
+            value = totals[key]
+            value = f'{value:.6f}' if isinstance(value, float) else value
+            lines.append(f'{name}{{{_label(route)}}} {value}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,159 @@
+"""
+Per-request performance instrumentation.
+
+:class:`ServerTimingMiddleware` times every request, the SQL statements it
+runs (through a connection execute wrapper) and the templates it renders
+(through :class:`~planner.templating.TimedDjangoTemplates`). The timings
+are sent back in a ``Server-Timing`` header, which browser developer tools
+show next to the request, and recorded per URL name in
+:data:`planner.metrics.registry` for the ``/metrics`` endpoint.
+
+The execute wrapper is added to every connection and finds the request's
+timer through a context variable, so the queries of async views, which
+run on a worker thread's connection, are timed too.
+"""
+import contextvars
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .metrics import UNRESOLVED_ROUTE, registry
+
+# The timer of the request being handled, if any.
+current_timer = contextvars.ContextVar('planner_request_timer', default=None)
+
+
+class RequestTimer:
+    """
+    Timings collected while handling one request.
+
+    :ivar request: The request being timed.
+    :vartype request: HttpRequest
+    :ivar sql_count: Number of SQL statements run.
+    :vartype sql_count: int
+    :ivar sql_duration: Seconds spent in the database.
+    :vartype sql_duration: float
+    :ivar template_duration: Seconds spent rendering templates.
+    :vartype template_duration: float
+    """
+
+    def __init__(self, request=None):
+        self.request = request
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_duration = 0.0
+        self.template_duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_count += 1
+            self.sql_duration += time.perf_counter() - started
+
+    def elapsed(self) -> float:
+        """
+        Returns the seconds since the request started.
+
+        :rtype: float
+        """
+        return time.perf_counter() - self.started
+
+    def view_path(self) -> str | None:
+        """
+        Returns the dotted path of the view handling the request, once the
+        URL has been resolved.
+
+        :rtype: str or None
+        """
+        match = getattr(self.request, 'resolver_match', None)
+        if match is None:
+            return None
+        return f"{match.func.__module__}.{match.func.__qualname__}"
+
+
+def timed_execute(execute, sql, params, many, context):
+    """
+    Execute wrapper adding each statement to the current request's timer.
+    """
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_request_timer(sender, connection, **kwargs):
+    """
+    Adds :func:`timed_execute` to each new database connection, once.
+    """
+    if timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(timed_execute)
+
+
+def server_timing(timer: RequestTimer, total: float) -> str:
+    """
+    Formats the value of a ``Server-Timing`` header, in milliseconds.
+
+    :rtype: str
+    """
+    return (f'db;dur={timer.sql_duration * 1000:.1f};'
+            f'desc="{timer.sql_count} queries", '
+            f'tpl;dur={timer.template_duration * 1000:.1f};desc="templates", '
+            f'total;dur={total * 1000:.1f}')
+
+
+class ServerTimingMiddleware:
+    """
+    Measures each request and reports it in a ``Server-Timing`` header and
+    the per-route metrics.
+
+    The header can be turned off with ``SERVER_TIMING_HEADER = False``;
+    the metrics are always recorded. Streaming responses are measured up
+    to the point their body starts. Works under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = RequestTimer(request)
+        token = current_timer.set(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        return self.finish(request, response, timer)
+
+    async def __acall__(self, request):
+        timer = RequestTimer(request)
+        token = current_timer.set(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        return self.finish(request, response, timer)
+
+    def finish(self, request, response, timer: RequestTimer):
+        """
+        Records the request's timings and adds the ``Server-Timing``
+        header.
+        """
+        total = timer.elapsed()
+        match = request.resolver_match
+        registry.observe(match.view_name if match else UNRESOLVED_ROUTE,
+                         total, timer.sql_count, timer.sql_duration,
+                         timer.template_duration)
+        if getattr(settings, 'SERVER_TIMING_HEADER', True):
+            response['Server-Timing'] = server_timing(timer, total)
+        return response
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0002_alter_event_options_event_event_notes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["date", "performance_time_start", "id"],
+                name="event_schedule_key_idx",
+            ),
+        ),
+    ]
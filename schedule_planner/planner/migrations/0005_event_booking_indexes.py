@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0004_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                fields=["sound_engineer", "date"], name="event_engineer_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(fields=["venue", "date"], name="event_venue_date_idx"),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+import planner.models
+
+
+def populate_feed_tokens(apps, schema_editor):
+    SoundEngineer = apps.get_model("planner", "SoundEngineer")
+    for engineer in SoundEngineer.objects.filter(feed_token__isnull=True):
+        engineer.feed_token = planner.models.generate_feed_token()
+        engineer.save(update_fields=["feed_token"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0005_event_booking_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="soundengineer",
+            name="feed_token",
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(populate_feed_tokens, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="soundengineer",
+            name="feed_token",
+            field=models.CharField(
+                default=planner.models.generate_feed_token,
+                editable=False,
+                max_length=64,
+                unique=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="soundengineer",
+            name="feed_version",
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,76 @@
+from django.db import migrations
+
+# Kept in step with planner.search; migrations must not import app code.
+FTS_TABLE = "planner_event_fts"
+PG_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(performer, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(venue, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(event_notes, '')), 'C')"
+)
+
+SQLITE_FORWARD = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    "performer, venue, event_notes, "
+    "content='planner_event', content_rowid='id', prefix='2 3')",
+    f"""CREATE TRIGGER planner_event_fts_insert AFTER INSERT ON planner_event
+    BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, performer, venue, event_notes)
+        VALUES (new.id, new.performer, new.venue, new.event_notes);
+    END""",
+    f"""CREATE TRIGGER planner_event_fts_delete AFTER DELETE ON planner_event
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, performer, venue,
+                                event_notes)
+        VALUES ('delete', old.id, old.performer, old.venue, old.event_notes);
+    END""",
+    f"""CREATE TRIGGER planner_event_fts_update
+    AFTER UPDATE OF performer, venue, event_notes ON planner_event
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, performer, venue,
+                                event_notes)
+        VALUES ('delete', old.id, old.performer, old.venue, old.event_notes);
+        INSERT INTO {FTS_TABLE}(rowid, performer, venue, event_notes)
+        VALUES (new.id, new.performer, new.venue, new.event_notes);
+    END""",
+    # Index the events that already exist.
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS planner_event_fts_update",
+    "DROP TRIGGER IF EXISTS planner_event_fts_delete",
+    "DROP TRIGGER IF EXISTS planner_event_fts_insert",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+POSTGRES_FORWARD = [
+    f"CREATE INDEX event_search_idx ON planner_event "
+    f"USING GIN (({PG_DOCUMENT}))",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS event_search_idx",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        vendor = schema_editor.connection.vendor
+        for statement in statements.get(vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0007_eventchange"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({"sqlite": SQLITE_FORWARD, "postgresql": POSTGRES_FORWARD}),
+            _run({"sqlite": SQLITE_BACKWARD,
+                  "postgresql": POSTGRES_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,124 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0008_event_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecurringEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("venue", models.CharField(max_length=100)),
+                ("performer", models.CharField(max_length=100)),
+                ("performance_time_start", models.TimeField(verbose_name="Start Time")),
+                ("performance_time_end", models.TimeField(verbose_name="End Time")),
+                (
+                    "event_notes",
+                    models.TextField(blank=True, null=True, verbose_name="Event notes"),
+                ),
+                ("start_date", models.DateField()),
+                ("until", models.DateField(verbose_name="Last date")),
+                (
+                    "frequency",
+                    models.CharField(
+                        choices=[
+                            ("DAILY", "Daily"),
+                            ("WEEKLY", "Weekly"),
+                            ("MONTHLY", "Monthly"),
+                        ],
+                        default="WEEKLY",
+                        max_length=7,
+                    ),
+                ),
+                ("interval", models.PositiveSmallIntegerField(default=1)),
+                (
+                    "weekdays",
+                    models.CharField(
+                        blank=True,
+                        help_text="Weekly rules only, e.g. MO,FR",
+                        max_length=20,
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "sound_engineer",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="recurring_events",
+                        to="planner.soundengineer",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["start_date", "performance_time_start"],
+            },
+        ),
+        migrations.CreateModel(
+            name="RecurrenceException",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("cancelled", models.BooleanField(default=True)),
+                (
+                    "performance_time_start",
+                    models.TimeField(blank=True, null=True, verbose_name="Start Time"),
+                ),
+                (
+                    "performance_time_end",
+                    models.TimeField(blank=True, null=True, verbose_name="End Time"),
+                ),
+                (
+                    "event_notes",
+                    models.TextField(blank=True, null=True, verbose_name="Event notes"),
+                ),
+                (
+                    "recurring_event",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="exceptions",
+                        to="planner.recurringevent",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["date"],
+            },
+        ),
+        migrations.AddIndex(
+            model_name="recurringevent",
+            index=models.Index(
+                fields=["start_date", "until"], name="recurring_window_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="recurrenceexception",
+            constraint=models.UniqueConstraint(
+                fields=("recurring_event", "date"), name="recurrence_exception_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0009_recurring_events"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("venue", models.CharField(max_length=100)),
+                ("event_count", models.IntegerField(default=0)),
+                ("booked_minutes", models.IntegerField(default=0)),
+                (
+                    "sound_engineer",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_stats",
+                        to="planner.soundengineer",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["date", "venue"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("date", "venue", "sound_engineer"),
+                        name="dailystat_key_unique",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("sound_engineer__isnull", True)),
+                        fields=("date", "venue"),
+                        name="dailystat_unassigned_unique",
+                    ),
+                ],
+            },
+        ),
+    ]
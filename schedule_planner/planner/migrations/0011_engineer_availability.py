@@ -0,0 +1,82 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:38
+
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0010_dailystat"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EngineerDayBitmap",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("slots", models.BinaryField(max_length=12)),
+                (
+                    "sound_engineer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="day_bitmaps",
+                        to="planner.soundengineer",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("date", "sound_engineer"), name="daybitmap_key_unique"
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="EngineerUnavailability",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("date", models.DateField()),
+                ("start_time", models.TimeField(default=datetime.time(0, 0))),
+                ("end_time", models.TimeField(default=datetime.time(0, 0))),
+                ("reason", models.CharField(blank=True, max_length=200)),
+                (
+                    "sound_engineer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="unavailability",
+                        to="planner.soundengineer",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "engineer unavailability",
+                "ordering": ["date", "start_time"],
+                "indexes": [
+                    models.Index(
+                        fields=["sound_engineer", "date"],
+                        name="unavailability_engineer_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-18 00:42
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0011_engineer_availability"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="soundengineer",
+            index=models.Index(
+                django.db.models.functions.text.Lower("name"),
+                name="engineer_name_lower_idx",
+            ),
+        ),
+    ]
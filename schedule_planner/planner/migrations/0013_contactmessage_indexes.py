@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0012_engineer_name_lower_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="contactmessage",
+            index=models.Index(fields=["-created_at"], name="message_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="contactmessage",
+            index=models.Index(
+                fields=["is_read", "-created_at"], name="message_unread_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.1 on 2026-10-18 01:53
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def number_existing_changes(apps, schema_editor):
+    # Entries already in the log have committed, so their ids are in
+    # commit order as far as any client could have seen.
+    EventChange = apps.get_model("planner", "EventChange")
+    ChangeSequence = apps.get_model("planner", "ChangeSequence")
+    EventChange.objects.update(sequence=F("id"))
+    last = EventChange.objects.aggregate(last=Max("id"))["last"] or 0
+    ChangeSequence.objects.create(pk=1, last=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("planner", "0013_contactmessage_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChangeSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="eventchange",
+            name="sequence",
+            field=models.PositiveBigIntegerField(
+                blank=True, editable=False, null=True, unique=True
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="eventchange",
+            index=models.Index(
+                condition=models.Q(("sequence__isnull", True)),
+                fields=["id"],
+                name="eventchange_unnumbered_idx",
+            ),
+        ),
+        migrations.RunPython(number_existing_changes,
+                             migrations.RunPython.noop),
+    ]
@@ -1,4 +1,9 @@
-from django.db import models
+import secrets
+from datetime import time
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models.functions import Lower
 
 # Create your models here.
 
@@ -6,6 +11,16 @@ from django.db import models
 # key.
 
 
+def generate_feed_token() -> str:
+    """
+    Generates a secret token for a sound engineer's calendar feed URL.
+
+    :returns: A URL-safe random token.
+    :rtype: str
+    """
+    return secrets.token_urlsafe(24)
+
+
 class SoundEngineer(models.Model):
     """
     Represents a sound engineer who can be assigned to various events.
@@ -16,10 +31,20 @@ class SoundEngineer(models.Model):
     :vartype contact_email: str (EmailField)
     :ivar contact_number: The unique contact number of the sound engineer.
     :vartype contact_number: str
+    :ivar feed_token: Secret token authenticating the engineer's calendar
+                      feed.
+    :vartype feed_token: str
+    :ivar feed_version: Counter bumped whenever the engineer's events
+                        change; used as the feed's ETag.
+    :vartype feed_version: int
     """
     name = models.CharField(max_length=100, unique=True)
     contact_email = models.EmailField(blank=True, null=True)
     contact_number = models.CharField(max_length=100, unique=True)
+    feed_token = models.CharField(max_length=64, unique=True,
+                                  default=generate_feed_token,
+                                  editable=False)
+    feed_version = models.PositiveBigIntegerField(default=0, editable=False)
 
     def __str__(self):
         """
@@ -35,6 +60,10 @@ class SoundEngineer(models.Model):
         Meta options for the SoundEngineer model.
         """
         ordering = ['name']
+        indexes = [
+            # Case-insensitive prefix search for the engineer typeahead.
+            models.Index(Lower('name'), name='engineer_name_lower_idx'),
+        ]
 
 
 class Event(models.Model):
@@ -57,6 +86,9 @@ class Event(models.Model):
     :vartype sound_engineer: :class:`~.SoundEngineer`
     :ivar event_notes: Additional notes or details for the event. (Optional)
     :vartype event_notes: str (TextField)
+    :ivar updated_at: The date and time of the last change to the event.
+                      Automatically set on every save.
+    :vartype updated_at: datetime.datetime
     """
     # Table Col data
     date = models.DateField()
@@ -71,6 +103,8 @@ class Event(models.Model):
                                        related_name='events_as_engineer')
     event_notes = models.TextField(verbose_name="Event notes",
                                    blank=True, null=True)
+    # Indexed so the newest change can be read without scanning the table.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         """
@@ -82,13 +116,402 @@ class Event(models.Model):
         """
         return f"{self.performer} on {self.date} in {self.venue}"
 
+    def save(self, *args, **kwargs):
+        """
+        Saves the event in a transaction that also covers the ``post_save``
+        receivers, so the change log entry is written atomically with it.
+        """
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
     class Meta:
         ordering = ['date', 'performance_time_start']
+        # Composite index backing the keyset pagination of the schedule.
+        indexes = [
+            models.Index(fields=['date', 'performance_time_start', 'id'],
+                         name='event_schedule_key_idx'),
+            # Double-booking checks look up one engineer or venue by date.
+            models.Index(fields=['sound_engineer', 'date'],
+                         name='event_engineer_date_idx'),
+            models.Index(fields=['venue', 'date'],
+                         name='event_venue_date_idx'),
+        ]
         permissions = [
             ("can_manage_event_engineer", "can_assign_engineers")
         ]
 
 
+class EventChange(models.Model):
+    """
+    Append-only log of changes to events, used for delta synchronisation.
+
+    Entries are numbered by :func:`planner.sync.sequence_changes` once they
+    have committed, so the numbers follow commit order even when a long
+    transaction inserted its entries before others that committed first.
+    The number doubles as the sync token: a client that has seen every
+    change up to some number only needs the entries after it. Deleted
+    events are recorded as tombstones.
+
+    :ivar event_id: The primary key of the changed event. Not a foreign key,
+                    so tombstones outlive the event.
+    :vartype event_id: int
+    :ivar action: Whether the event was created/updated or deleted.
+    :vartype action: str
+    :ivar changed_at: When the change was recorded.
+    :vartype changed_at: datetime.datetime
+    :ivar sequence: Position in commit order; ``None`` until numbered.
+    :vartype sequence: int
+    """
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (UPSERT, "Created or updated"),
+        (DELETE, "Deleted"),
+    ]
+
+    event_id = models.BigIntegerField()
+    action = models.CharField(max_length=6, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True)
+    sequence = models.PositiveBigIntegerField(unique=True, blank=True,
+                                              null=True, editable=False)
+
+    def __str__(self):
+        """
+        Returns a human-readable string representation of the change.
+
+        :rtype: str
+        """
+        return f"#{self.pk} {self.action} event {self.event_id}"
+
+    class Meta:
+        """
+        Meta options for the EventChange model.
+        """
+        ordering = ['id']
+        indexes = [
+            # Compaction keeps the newest entry of each event.
+            models.Index(fields=['event_id', 'id'],
+                         name='eventchange_event_idx'),
+            # Numbering looks for the few entries still without a number.
+            models.Index(fields=['id'], name='eventchange_unnumbered_idx',
+                         condition=models.Q(sequence__isnull=True)),
+        ]
+
+
+class ChangeSequence(models.Model):
+    """
+    The last number handed out to the change log, in a single row.
+
+    Numbering locks this row, so numbers are handed out by one transaction
+    at a time and become visible in increasing order.
+
+    :ivar last: The highest :attr:`EventChange.sequence` handed out.
+    :vartype last: int
+    """
+    last = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        """
+        Returns a human-readable string representation of the counter.
+
+        :rtype: str
+        """
+        return f"Change log numbered up to {self.last}"
+
+
+class RecurringEvent(models.Model):
+    """
+    A residency: one booking that repeats on a rule, stored as a single row.
+
+    Occurrences are not stored; :mod:`planner.recurrence` expands them on
+    demand for the dates being shown. The rule follows RFC 5545 ``RRULE``
+    semantics for ``FREQ``, ``INTERVAL``, ``BYDAY`` and ``UNTIL``.
+
+    :ivar venue: The venue of every occurrence.
+    :vartype venue: str
+    :ivar performer: The performer of every occurrence.
+    :vartype performer: str
+    :ivar sound_engineer: The engineer booked for every occurrence.
+    :vartype sound_engineer: :class:`SoundEngineer`
+    :ivar performance_time_start: The start time of each performance.
+    :vartype performance_time_start: time
+    :ivar performance_time_end: The end time of each performance.
+    :vartype performance_time_end: time
+    :ivar event_notes: Notes shown on every occurrence. (Optional)
+    :vartype event_notes: str (TextField)
+    :ivar start_date: The date of the first occurrence.
+    :vartype start_date: date
+    :ivar until: The last date an occurrence may fall on.
+    :vartype until: date
+    :ivar frequency: How often the rule repeats.
+    :vartype frequency: str
+    :ivar interval: Repeat every this many days, weeks or months.
+    :vartype interval: int
+    :ivar weekdays: For weekly rules, comma-separated ``BYDAY`` codes such
+                    as ``"MO,FR"``; blank means the weekday of
+                    ``start_date``.
+    :vartype weekdays: str
+    """
+    DAILY = 'DAILY'
+    WEEKLY = 'WEEKLY'
+    MONTHLY = 'MONTHLY'
+    FREQUENCY_CHOICES = [
+        (DAILY, "Daily"),
+        (WEEKLY, "Weekly"),
+        (MONTHLY, "Monthly"),
+    ]
+    WEEKDAY_CODES = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+    venue = models.CharField(max_length=100)
+    performer = models.CharField(max_length=100)
+    sound_engineer = models.ForeignKey(SoundEngineer,
+                                       on_delete=models.SET_NULL,
+                                       blank=True,
+                                       null=True,
+                                       related_name='recurring_events')
+    performance_time_start = models.TimeField(verbose_name="Start Time")
+    performance_time_end = models.TimeField(verbose_name="End Time")
+    event_notes = models.TextField(verbose_name="Event notes",
+                                   blank=True, null=True)
+    start_date = models.DateField()
+    until = models.DateField(verbose_name="Last date")
+    frequency = models.CharField(max_length=7, choices=FREQUENCY_CHOICES,
+                                 default=WEEKLY)
+    interval = models.PositiveSmallIntegerField(default=1)
+    weekdays = models.CharField(max_length=20, blank=True,
+                                help_text="Weekly rules only, e.g. MO,FR")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        """
+        Returns a human-readable string representation of the residency.
+
+        :rtype: str
+        """
+        return (f"{self.performer} in {self.venue}, "
+                f"{self.start_date} to {self.until}")
+
+    def clean(self):
+        """
+        Validates the date range, interval and weekday codes.
+        """
+        errors = {}
+        if self.start_date and self.until and self.until < self.start_date:
+            errors['until'] = "The last date must not be before the start."
+        if self.interval is not None and self.interval < 1:
+            errors['interval'] = "The interval must be at least 1."
+        codes = [code.strip().upper() for code in self.weekdays.split(',')
+                 if code.strip()]
+        if any(code not in self.WEEKDAY_CODES for code in codes):
+            errors['weekdays'] = ("Use two-letter codes: "
+                                  f"{', '.join(self.WEEKDAY_CODES)}.")
+        if errors:
+            raise ValidationError(errors)
+        self.weekdays = ','.join(codes)
+
+    class Meta:
+        """
+        Meta options for the RecurringEvent model.
+        """
+        ordering = ['start_date', 'performance_time_start']
+        indexes = [
+            # Expansion looks up the rules overlapping a date window.
+            models.Index(fields=['start_date', 'until'],
+                         name='recurring_window_idx'),
+        ]
+
+
+class RecurrenceException(models.Model):
+    """
+    Changes a single occurrence of a :class:`RecurringEvent`: either
+    cancels it or replaces its times and notes.
+
+    :ivar recurring_event: The residency the occurrence belongs to.
+    :vartype recurring_event: :class:`RecurringEvent`
+    :ivar date: The date of the occurrence being changed.
+    :vartype date: date
+    :ivar cancelled: Whether the occurrence is skipped altogether.
+    :vartype cancelled: bool
+    :ivar performance_time_start: Replacement start time. (Optional)
+    :vartype performance_time_start: time
+    :ivar performance_time_end: Replacement end time. (Optional)
+    :vartype performance_time_end: time
+    :ivar event_notes: Replacement notes. (Optional)
+    :vartype event_notes: str (TextField)
+    """
+    recurring_event = models.ForeignKey(RecurringEvent,
+                                        on_delete=models.CASCADE,
+                                        related_name='exceptions')
+    date = models.DateField()
+    cancelled = models.BooleanField(default=True)
+    performance_time_start = models.TimeField(verbose_name="Start Time",
+                                              blank=True, null=True)
+    performance_time_end = models.TimeField(verbose_name="End Time",
+                                            blank=True, null=True)
+    event_notes = models.TextField(verbose_name="Event notes",
+                                   blank=True, null=True)
+
+    def __str__(self):
+        """
+        Returns a human-readable string representation of the exception.
+
+        :rtype: str
+        """
+        change = "cancelled" if self.cancelled else "changed"
+        return f"{self.recurring_event.performer} {change} on {self.date}"
+
+    class Meta:
+        """
+        Meta options for the RecurrenceException model.
+        """
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['recurring_event', 'date'],
+                                    name='recurrence_exception_unique'),
+        ]
+
+
+class DailyStat(models.Model):
+    """
+    Daily booking totals per venue and engineer, kept up to date as events
+    change so the dashboard never has to scan the events table.
+
+    :ivar date: The day the totals cover.
+    :vartype date: date
+    :ivar venue: The venue the totals cover.
+    :vartype venue: str
+    :ivar sound_engineer: The engineer the totals cover; ``None`` for
+                          unassigned events.
+    :vartype sound_engineer: :class:`SoundEngineer`
+    :ivar event_count: Number of events.
+    :vartype event_count: int
+    :ivar booked_minutes: Total length of those events in minutes.
+    :vartype booked_minutes: int
+    """
+    date = models.DateField()
+    venue = models.CharField(max_length=100)
+    sound_engineer = models.ForeignKey(SoundEngineer,
+                                       on_delete=models.CASCADE,
+                                       blank=True,
+                                       null=True,
+                                       related_name='daily_stats')
+    event_count = models.IntegerField(default=0)
+    booked_minutes = models.IntegerField(default=0)
+
+    def __str__(self):
+        """
+        Returns a human-readable string representation of the totals.
+
+        :rtype: str
+        """
+        return (f"{self.date} {self.venue}: {self.event_count} events, "
+                f"{self.booked_minutes} minutes")
+
+    class Meta:
+        """
+        Meta options for the DailyStat model.
+        """
+        ordering = ['date', 'venue']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'venue',
+                                            'sound_engineer'],
+                                    name='dailystat_key_unique'),
+            # NULLs never clash in a unique index, so the unassigned row
+            # of each day and venue needs its own.
+            models.UniqueConstraint(fields=['date', 'venue'],
+                                    condition=models.Q(
+                                        sound_engineer__isnull=True),
+                                    name='dailystat_unassigned_unique'),
+        ]
+
+
+class EngineerUnavailability(models.Model):
+    """
+    A period a sound engineer has declared they cannot work.
+
+    Like events, a period whose end is at or before its start runs past
+    midnight; 00:00 to 00:00 covers the whole day.
+
+    :ivar sound_engineer: The engineer who is unavailable.
+    :vartype sound_engineer: :class:`SoundEngineer`
+    :ivar date: The day the period starts on.
+    :vartype date: date
+    :ivar start_time: Start of the period.
+    :vartype start_time: time
+    :ivar end_time: End of the period.
+    :vartype end_time: time
+    :ivar reason: Why the engineer is unavailable. (Optional)
+    :vartype reason: str
+    """
+    sound_engineer = models.ForeignKey(SoundEngineer,
+                                       on_delete=models.CASCADE,
+                                       related_name='unavailability')
+    date = models.DateField()
+    start_time = models.TimeField(default=time(0))
+    end_time = models.TimeField(default=time(0))
+    reason = models.CharField(max_length=200, blank=True)
+
+    def __str__(self):
+        """
+        Returns a human-readable string representation of the period.
+
+        :rtype: str
+        """
+        return (f"{self.sound_engineer} unavailable on {self.date} "
+                f"{self.start_time:%H:%M}-{self.end_time:%H:%M}")
+
+    class Meta:
+        """
+        Meta options for the EngineerUnavailability model.
+        """
+        ordering = ['date', 'start_time']
+        indexes = [
+            models.Index(fields=['sound_engineer', 'date'],
+                         name='unavailability_engineer_idx'),
+        ]
+        verbose_name_plural = "engineer unavailability"
+
+
+class EngineerDayBitmap(models.Model):
+    """
+    Which 15-minute slots of a day a sound engineer is busy in.
+
+    Derived from the engineer's events and declared unavailability by
+    :mod:`planner.availability`; bit ``n`` of ``slots`` (big-endian) covers
+    minutes ``15 * n`` to ``15 * n + 15`` of the day.
+
+    :ivar sound_engineer: The engineer the bitmap belongs to.
+    :vartype sound_engineer: :class:`SoundEngineer`
+    :ivar date: The day covered.
+    :vartype date: date
+    :ivar slots: The 96-bit busy mask, as 12 bytes.
+    :vartype slots: bytes
+    """
+    sound_engineer = models.ForeignKey(SoundEngineer,
+                                       on_delete=models.CASCADE,
+                                       related_name='day_bitmaps')
+    date = models.DateField()
+    slots = models.BinaryField(max_length=12)
+
+    def __str__(self):
+        """
+        Returns a human-readable string representation of the bitmap.
+
+        :rtype: str
+        """
+        return f"{self.sound_engineer_id} on {self.date}"
+
+    class Meta:
+        """
+        Meta options for the EngineerDayBitmap model.
+        """
+        constraints = [
+            # Date first, so "who is free on this day" reads one range.
+            models.UniqueConstraint(fields=['date', 'sound_engineer'],
+                                    name='daybitmap_key_unique'),
+        ]
+
+
 class ContactMessage(models.Model):
     """
     Represents a contact message submitted by a user through a form.
@@ -109,6 +532,9 @@ class ContactMessage(models.Model):
     :vartype is_read: bool
     :ivar replied_to: A boolean flag indicating if a reply has been sent.
     :vartype replied_to: bool
+    :ivar updated_at: The date and time of the last change to the message.
+                      Automatically set on every save.
+    :vartype updated_at: datetime.datetime
     """
     # Content of table
     name = models.CharField(max_length=100)
@@ -117,6 +543,7 @@ class ContactMessage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
     replied_to = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
     # format for admin
 
     def __str__(self):
@@ -129,3 +556,15 @@ class ContactMessage(models.Model):
         """
         formatted_time = self.created_at.strftime('%B %d, %Y at %I:%M %p')
         return f"from {self.name} on {formatted_time}"
+
+    class Meta:
+        """
+        Meta options for the ContactMessage model.
+        """
+        indexes = [
+            # Newest first, as listed in the admin.
+            models.Index(fields=['-created_at'], name='message_created_idx'),
+            # Unread messages, newest first.
+            models.Index(fields=['is_read', '-created_at'],
+                         name='message_unread_idx'),
+        ]
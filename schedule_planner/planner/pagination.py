@@ -0,0 +1,405 @@
+"""
+Keyset (seek) pagination helpers for the event schedule.
+
+Rather than counting and skipping rows with ``OFFSET``, each page is fetched
+by seeking past the last row the client has seen on the ordering key
+``(date, performance_time_start, id)``. Combined with the matching composite
+index on :class:`~planner.models.Event`, the cost of fetching any page stays
+flat no matter how many events the table holds.
+
+Pages can also hold the occurrences of residencies. These are expanded only
+for the dates the page of events spans and merged in; an occurrence sorts
+after the events starting at the same time, and its cursor carries
+``r<residency id>`` in place of the event id.
+"""
+import base64
+import binascii
+import heapq
+from collections import deque
+from datetime import date, time
+from itertools import islice
+
+from django.db.models import Q, QuerySet
+
+from .recurrence import aoccurrence_rows, occurrence_rows
+
+# Ordering key shared by the schedule page and its cursors.
+KEYSET_ORDERING = ('date', 'performance_time_start', 'id')
+
+
+def encode_cursor(event_date: date, start: time, pk: int) -> str:
+    """
+    Encodes a position on the schedule ordering key into an opaque cursor.
+
+    :param event_date: The date of the event at the cursor position.
+    :type event_date: date
+    :param start: The start time of the event at the cursor position.
+    :type start: time
+    :param pk: The primary key of the event at the cursor position, or
+               ``"r<residency id>"`` for an occurrence.
+    :type pk: int or str
+
+    :returns: A URL-safe cursor string.
+    :rtype: str
+    """
+    raw = f"{event_date.isoformat()}|{start.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> tuple | None:
+    """
+    Decodes a cursor produced by :func:`encode_cursor`.
+
+    :param cursor: The opaque cursor string taken from the query string.
+    :type cursor: str
+
+    :returns: A ``(date, time, pk)`` tuple, where ``pk`` is an event id or
+              an ``"r<residency id>"`` string, or ``None`` if the cursor is
+              malformed.
+    :rtype: tuple or None
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        event_date, start, pk = raw.split('|')
+        pk = f'r{int(pk[1:])}' if pk.startswith('r') else int(pk)
+        return (date.fromisoformat(event_date), time.fromisoformat(start),
+                pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def sort_key(key: tuple) -> tuple:
+    """
+    Returns a comparable form of a ``(date, time, pk)`` position, placing
+    occurrences after the events that start at the same time, as
+    :func:`planner.recurrence.merge_schedule` does.
+
+    :rtype: tuple
+    """
+    event_date, start, pk = key
+    if isinstance(pk, str):
+        return event_date, start, 1, int(pk[1:])
+    return event_date, start, 0, pk
+
+
+def keyset_after(event_date: date, start: time, pk: int) -> Q:
+    """
+    Builds a filter matching every row strictly after a key position.
+
+    The filter is written as an expanded row comparison so it can be served
+    by a range scan on the ``(date, performance_time_start, id)`` index.
+
+    :returns: A :class:`~django.db.models.Q` object.
+    :rtype: Q
+    """
+    if isinstance(pk, str):
+        # After an occurrence: every event starting later.
+        return (Q(date__gt=event_date)
+                | Q(date=event_date, performance_time_start__gt=start))
+    return (Q(date__gt=event_date)
+            | Q(date=event_date, performance_time_start__gt=start)
+            | Q(date=event_date, performance_time_start=start, id__gt=pk))
+
+
+def keyset_before(event_date: date, start: time, pk: int) -> Q:
+    """
+    Builds a filter matching every row strictly before a key position.
+
+    :returns: A :class:`~django.db.models.Q` object.
+    :rtype: Q
+    """
+    if isinstance(pk, str):
+        # Before an occurrence: the events starting at the same time too.
+        return (Q(date__lt=event_date)
+                | Q(date=event_date, performance_time_start__lte=start))
+    return (Q(date__lt=event_date)
+            | Q(date=event_date, performance_time_start__lt=start)
+            | Q(date=event_date, performance_time_start=start, id__lt=pk))
+
+
+def row_key(row) -> tuple:
+    """
+    Returns the ordering key of an event instance.
+
+    :param row: An :class:`~planner.models.Event` instance or an
+                :class:`OccurrenceRow`.
+
+    :returns: A ``(date, performance_time_start, id)`` tuple.
+    :rtype: tuple
+    """
+    return (row.date, row.performance_time_start, row.pk)
+
+
+class OccurrenceRow:
+    """
+    One occurrence of a residency on a schedule page, with the attributes
+    the page reads from an event.
+
+    :ivar pk: ``"r<residency id>"``, its position on the ordering key.
+    :vartype pk: str
+    :ivar id: The occurrence id, such as ``"r3-20250606"``.
+    :vartype id: str
+    :ivar sound_engineer: The engineer's name.
+    :vartype sound_engineer: str
+    """
+    recurring = True
+
+    def __init__(self, row: tuple):
+        (self.date, self.performance_time_start, self.performance_time_end,
+         self.venue, self.performer, self.sound_engineer, self.event_notes,
+         self.id, self.updated_at) = row
+        self.pk = self.id.partition('-')[0]
+
+
+class KeysetPage:
+    """
+    A single window of events together with the cursors around it.
+
+    :ivar object_list: The events on this page, in schedule order.
+    :vartype object_list: list
+    :ivar next_cursor: Cursor for the following page, or ``None``.
+    :vartype next_cursor: str
+    :ivar previous_cursor: Cursor for the preceding page, or ``None``.
+    :vartype previous_cursor: str
+    """
+
+    def __init__(self, object_list: list, next_cursor: str | None,
+                 previous_cursor: str | None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+
+def _page_query(queryset: QuerySet, page_size: int, after_key: tuple | None,
+                before_key: tuple | None,
+                start_date: date | None) -> QuerySet:
+    # One page plus a look-ahead row. Walking backwards from a cursor, the
+    # page is put back in schedule order by _backward_page().
+    if before_key is not None:
+        return (queryset.filter(keyset_before(*before_key))
+                .order_by(*[f'-{f}' for f in KEYSET_ORDERING])
+                [:page_size + 1])
+    forward = queryset.order_by(*KEYSET_ORDERING)
+    if after_key is not None:
+        forward = forward.filter(keyset_after(*after_key))
+    elif start_date is not None:
+        forward = forward.filter(date__gte=start_date)
+    return forward[:page_size + 1]
+
+
+def _occurrence_window(rows: list, page_size: int, after_key: tuple | None,
+                       before_key: tuple | None,
+                       start_date: date | None) -> tuple:
+    """
+    Works out the dates whose occurrences can reach a page, given the
+    events read for it. A full read of events bounds the window, since
+    the page cannot reach past its look-ahead row.
+
+    :returns: ``(first date, last date)``, either ``None`` if open.
+    :rtype: tuple
+    """
+    bound = rows[-1].date if len(rows) > page_size else None
+    if before_key is not None:
+        return bound, before_key[0]
+    return (after_key[0] if after_key is not None else start_date), bound
+
+
+def _occurrences(rows, page_size: int, after_key: tuple | None,
+                 before_key: tuple | None) -> list:
+    """
+    Picks the occurrences nearest the cursor from rows in schedule order,
+    as many as a page of events reads, nearest first.
+    """
+    rows = (OccurrenceRow(row) for row in rows)
+    if before_key is not None:
+        limit = sort_key(before_key)
+        nearest = deque((row for row in rows
+                         if sort_key(row_key(row)) < limit),
+                        maxlen=page_size + 1)
+        return list(reversed(nearest))
+    if after_key is not None:
+        limit = sort_key(after_key)
+        rows = (row for row in rows if sort_key(row_key(row)) > limit)
+    return list(islice(rows, page_size + 1))
+
+
+async def _aoccurrences(rows, page_size: int, after_key: tuple | None,
+                        before_key: tuple | None) -> list:
+    if before_key is not None:
+        return _occurrences([row async for row in rows], page_size,
+                            after_key, before_key)
+    limit = sort_key(after_key) if after_key is not None else None
+    picked = []
+    async for row in rows:
+        row = OccurrenceRow(row)
+        if limit is None or sort_key(row_key(row)) > limit:
+            picked.append(row)
+            if len(picked) > page_size:
+                break
+    await rows.aclose()
+    return picked
+
+
+def _merge(rows: list, occurrences: list, page_size: int,
+           backward: bool) -> list:
+    # Both lists run away from the cursor; so does the result.
+    return list(islice(heapq.merge(rows, occurrences,
+                                   key=lambda row: sort_key(row_key(row)),
+                                   reverse=backward),
+                       page_size + 1))
+
+
+def _backward_page(rows: list, page_size: int) -> KeysetPage:
+    has_more_before = len(rows) > page_size
+    rows = rows[:page_size][::-1]
+    previous_cursor = (encode_cursor(*row_key(rows[0]))
+                       if has_more_before else None)
+    # Seek from the last row shown, so the row the page stopped before is
+    # the first of the next page.
+    next_cursor = encode_cursor(*row_key(rows[-1])) if rows else None
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def _forward_window(rows: list, page_size: int) -> tuple:
+    next_cursor = (encode_cursor(*row_key(rows[page_size - 1]))
+                   if len(rows) > page_size else None)
+    return rows[:page_size], next_cursor
+
+
+def _previous_cursor(rows: list, after_key: tuple | None, after: str | None,
+                     start_date: date | None) -> tuple:
+    """
+    Works out the previous-page cursor of a forward page.
+
+    :returns: ``(cursor, position)``, where ``position`` is a key that
+              some row must come before for the cursor to apply, or
+              ``None`` if the cursor applies as it is.
+    :rtype: tuple
+    """
+    if rows:
+        first = row_key(rows[0])
+        if after_key is not None:
+            return encode_cursor(*first), None
+        return encode_cursor(*first), first
+    if start_date is not None and after_key is None:
+        # Nothing scheduled from the window start: still allow going back.
+        position = (start_date, time.min, 0)
+        return encode_cursor(*position), position
+    return after, None
+
+
+def _is_before(row: tuple | None, position: tuple) -> bool:
+    return row is not None and (sort_key(row_key(OccurrenceRow(row)))
+                                < sort_key(position))
+
+
+async def _afirst_is_before(rows, position: tuple) -> bool:
+    row = await anext(rows, None)
+    await rows.aclose()
+    return _is_before(row, position)
+
+
+def paginate_keyset(queryset: QuerySet, page_size: int,
+                    after: str | None = None, before: str | None = None,
+                    start_date: date | None = None,
+                    occurrences: bool = False) -> KeysetPage:
+    """
+    Fetches one page of ``queryset`` using keyset pagination.
+
+    Only ``page_size + 1`` rows are read: the extra row tells us whether a
+    further page exists without a ``COUNT(*)`` over the table.
+
+    :param queryset: The base queryset of events to paginate.
+    :type queryset: QuerySet
+    :param page_size: The maximum number of rows on the page.
+    :type page_size: int
+    :param after: Cursor of the last row on the previous page.
+    :type after: str
+    :param before: Cursor of the first row on the following page.
+    :type before: str
+    :param start_date: Default window start used when no cursor is supplied.
+    :type start_date: date
+    :param occurrences: Merge in the occurrences of every residency, as
+                        :class:`OccurrenceRow` objects. Costs one query for
+                        the residencies and, if there are any, one for
+                        their exceptions.
+    :type occurrences: bool
+
+    :returns: The requested page.
+    :rtype: KeysetPage
+    """
+    after_key = decode_cursor(after) if after else None
+    before_key = decode_cursor(before) if before else None
+    rows = list(_page_query(queryset, page_size, after_key, before_key,
+                            start_date))
+    if occurrences:
+        first, last = _occurrence_window(rows, page_size, after_key,
+                                         before_key, start_date)
+        rows = _merge(rows, _occurrences(
+            occurrence_rows(start_date=first, end_date=last), page_size,
+            after_key, before_key), page_size, before_key is not None)
+    if before_key is not None:
+        return _backward_page(rows, page_size)
+
+    rows, next_cursor = _forward_window(rows, page_size)
+    previous_cursor, position = _previous_cursor(rows, after_key, after,
+                                                 start_date)
+    if position is not None and not (
+            queryset.filter(keyset_before(*position)).exists()
+            or occurrences and _is_before(
+                next(iter(occurrence_rows(end_date=position[0])), None),
+                position)):
+        previous_cursor = None
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+async def apaginate_keyset(queryset: QuerySet, page_size: int,
+                           after: str | None = None,
+                           before: str | None = None,
+                           start_date: date | None = None,
+                           occurrences: bool = False) -> KeysetPage:
+    """
+    Asynchronous version of :func:`paginate_keyset`, reading the page
+    through the async ORM. Takes the same arguments and runs the same
+    queries.
+
+    :returns: The requested page.
+    :rtype: KeysetPage
+    """
+    after_key = decode_cursor(after) if after else None
+    before_key = decode_cursor(before) if before else None
+    rows = [row async for row in _page_query(
+        queryset, page_size, after_key, before_key, start_date)]
+    if occurrences:
+        first, last = _occurrence_window(rows, page_size, after_key,
+                                         before_key, start_date)
+        rows = _merge(rows, await _aoccurrences(
+            aoccurrence_rows(start_date=first, end_date=last), page_size,
+            after_key, before_key), page_size, before_key is not None)
+    if before_key is not None:
+        return _backward_page(rows, page_size)
+
+    rows, next_cursor = _forward_window(rows, page_size)
+    previous_cursor, position = _previous_cursor(rows, after_key, after,
+                                                 start_date)
+    if position is not None and not (
+            await queryset.filter(keyset_before(*position)).aexists()
+            or occurrences and await _afirst_is_before(
+                aoccurrence_rows(end_date=position[0]), position)):
+        previous_cursor = None
+    return KeysetPage(rows, next_cursor, previous_cursor)
@@ -0,0 +1,144 @@
+"""
+Query-budget guard for views.
+
+Views declare the maximum number of SQL queries they are expected to run
+with :func:`query_budget`. Going over the budget is logged as a warning, or
+raises :class:`QueryBudgetExceeded` when ``QUERY_BUDGET_RAISE`` is enabled
+(as it should be in tests), so N+1 regressions are caught early.
+
+Queries are counted by an execute wrapper added to every database
+connection, which reports to the counter of the view running in the
+current context. Async views run their ORM calls on a worker thread with
+its own connection, and the context follows them there, so synchronous
+and asynchronous views are measured alike.
+"""
+import contextvars
+import functools
+import logging
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# The counter of the view being measured, if any.
+current_counter = contextvars.ContextVar('planner_query_counter',
+                                         default=None)
+
+# Transaction control statements are bookkeeping, not data access.
+_TRANSACTION_PREFIXES = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT',
+                         'RELEASE SAVEPOINT')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised when a view runs more SQL queries than its declared budget.
+    """
+
+
+class QueryCounter:
+    """
+    Database execute wrapper that counts the statements it sees.
+
+    Unlike ``connection.queries`` this works with ``DEBUG = False``.
+    Transaction control statements are executed but not counted.
+
+    :ivar count: Number of statements executed so far.
+    :vartype count: int
+    :ivar statements: The SQL of every executed statement.
+    :vartype statements: list
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(_TRANSACTION_PREFIXES):
+            self.count += 1
+            self.statements.append(sql)
+        return execute(sql, params, many, context)
+
+
+def count_queries(execute, sql, params, many, context):
+    """
+    Execute wrapper passing each statement to the current view's counter.
+    """
+    counter = current_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    """
+    Adds :func:`count_queries` to each new database connection, once.
+    """
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+def _check_budget(view_func, counter: QueryCounter, max_queries: int):
+    """
+    Logs, or raises when ``QUERY_BUDGET_RAISE`` is set, a view that ran
+    more queries than its budget.
+    """
+    if counter.count <= max_queries:
+        return
+    detail = (f"{view_func.__qualname__} ran {counter.count} "
+              f"queries, budget is {max_queries}")
+    if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+        raise QueryBudgetExceeded(
+            detail + ":\n" + "\n".join(counter.statements))
+    logger.warning(detail)
+
+
+def query_budget(max_queries: int):
+    """
+    Decorates a view so that it may run at most ``max_queries`` queries.
+
+    Only the queries issued inside the view itself are counted; session and
+    authentication lookups made by outer decorators and middleware are not.
+
+    :param max_queries: The number of SQL queries the view may run.
+    :type max_queries: int
+
+    :returns: The view decorator.
+    :rtype: callable
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @functools.wraps(view_func)
+            async def _wrapped_view(request, *args, **kwargs):
+                counter = QueryCounter()
+                token = current_counter.set(counter)
+                try:
+                    response = await view_func(request, *args, **kwargs)
+                    if (hasattr(response, 'render')
+                            and callable(response.render)):
+                        await sync_to_async(response.render)()
+                finally:
+                    current_counter.reset(token)
+                _check_budget(view_func, counter, max_queries)
+                return response
+        else:
+            @functools.wraps(view_func)
+            def _wrapped_view(request, *args, **kwargs):
+                counter = QueryCounter()
+                token = current_counter.set(counter)
+                try:
+                    response = view_func(request, *args, **kwargs)
+                    # Render lazily evaluated templates inside the budget.
+                    if (hasattr(response, 'render')
+                            and callable(response.render)):
+                        response.render()
+                finally:
+                    current_counter.reset(token)
+                _check_budget(view_func, counter, max_queries)
+                return response
+        _wrapped_view.query_budget = max_queries
+        return _wrapped_view
+    return decorator
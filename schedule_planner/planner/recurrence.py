@@ -0,0 +1,332 @@
+"""
+Lazy expansion of recurring events into occurrences.
+
+A :class:`~planner.models.RecurringEvent` is stored once however many
+times it repeats. Occurrences are produced by generators only for the date
+window being read, jumping straight to the first occurrence in the window
+instead of walking the rule from its start. Each rule yields its
+occurrences in date order, so they can be merged with the one-off
+:class:`~planner.models.Event` rows using :func:`heapq.merge`, which keeps
+only one pending row per source in memory.
+"""
+import calendar
+import heapq
+from datetime import date, timedelta
+
+from django.db.models import Q
+
+from .models import RecurrenceException, RecurringEvent
+
+WEEKDAY_NUMBERS = {code: number for number, code
+                   in enumerate(RecurringEvent.WEEKDAY_CODES)}
+
+# Rule columns read for expansion; the leading values follow the shape of
+# the export rows (see planner.exporting.EXPORT_FIELDS).
+RULE_FIELDS = ('performance_time_start', 'performance_time_end', 'venue',
+               'performer', 'sound_engineer__name', 'event_notes', 'id',
+               'updated_at', 'start_date', 'until', 'frequency', 'interval',
+               'weekdays')
+
+# Rule columns read for conflict and availability checks: the booking
+# itself, then the arguments of occurrence_dates().
+BOOKING_FIELDS = ('id', 'performance_time_start', 'performance_time_end',
+                  'sound_engineer_id', 'venue', 'performer', 'start_date',
+                  'until', 'frequency', 'interval', 'weekdays')
+
+
+def schedule_key(row):
+    """
+    Sort key of a schedule row: its date and start time.
+    """
+    return row[0], row[1]
+
+
+def occurrence_id(rule_id: int, day: date) -> str:
+    """
+    Builds the stable identifier of one occurrence of a rule.
+
+    :rtype: str
+    """
+    return f"r{rule_id}-{day:%Y%m%d}"
+
+
+def _add_months(day: date, months: int):
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    if day.day > calendar.monthrange(year, month)[1]:
+        # Like RRULE, months without this day are skipped.
+        return None
+    return date(year, month, day.day)
+
+
+def occurrence_dates(start_date: date, until: date, frequency: str,
+                     interval: int, weekdays: str, window_start: date,
+                     window_end: date):
+    """
+    Generates the dates a rule falls on within a window, in order.
+
+    Work is proportional to the occurrences in the window, not to the
+    length of the rule before it.
+
+    :param start_date: First date of the rule.
+    :type start_date: date
+    :param until: Last date of the rule.
+    :type until: date
+    :param frequency: One of the :class:`~planner.models.RecurringEvent`
+                      frequencies.
+    :type frequency: str
+    :param interval: Repeat every this many periods.
+    :type interval: int
+    :param weekdays: Comma-separated ``BYDAY`` codes for weekly rules.
+    :type weekdays: str
+    :param window_start: First date wanted.
+    :type window_start: date
+    :param window_end: Last date wanted.
+    :type window_end: date
+
+    :returns: A generator of dates.
+    :rtype: generator
+    """
+    low = max(start_date, window_start)
+    high = min(until, window_end)
+    if low > high:
+        return
+    interval = max(interval, 1)
+
+    if frequency == RecurringEvent.DAILY:
+        skipped = -(-(low - start_date).days // interval)
+        day = start_date + timedelta(days=skipped * interval)
+        while day <= high:
+            yield day
+            day += timedelta(days=interval)
+
+    elif frequency == RecurringEvent.WEEKLY:
+        offsets = sorted({WEEKDAY_NUMBERS[code] for code in weekdays.split(',')
+                          if code in WEEKDAY_NUMBERS}
+                         or {start_date.weekday()})
+        anchor = start_date - timedelta(days=start_date.weekday())
+        week = (low - anchor).days // 7
+        week -= week % interval
+        monday = anchor + timedelta(weeks=week)
+        while monday <= high:
+            for offset in offsets:
+                day = monday + timedelta(days=offset)
+                if low <= day <= high:
+                    yield day
+            monday += timedelta(weeks=interval)
+
+    elif frequency == RecurringEvent.MONTHLY:
+        months = ((low.year - start_date.year) * 12
+                  + low.month - start_date.month)
+        months -= months % interval
+        while True:
+            day = _add_months(start_date, months)
+            if day is not None:
+                if day > high:
+                    break
+                if day >= low:
+                    yield day
+            elif (start_date.year * 12 + start_date.month + months
+                  > high.year * 12 + high.month):
+                break
+            months += interval
+
+
+def expand_rule(rule: tuple, exceptions: dict, window_start: date,
+                window_end: date):
+    """
+    Generates the schedule rows of one rule within a window.
+
+    :param rule: A tuple in :data:`RULE_FIELDS` order.
+    :type rule: tuple
+    :param exceptions: Exceptions of this rule keyed by date, as
+                       ``(cancelled, start, end, notes)`` tuples.
+    :type exceptions: dict
+    :param window_start: First date wanted.
+    :type window_start: date
+    :param window_end: Last date wanted.
+    :type window_end: date
+
+    :returns: A generator of rows shaped like the export rows, in schedule
+              order.
+    :rtype: generator
+    """
+    (start, end, venue, performer, engineer, notes, pk, updated_at,
+     start_date, until, frequency, interval, weekdays) = rule
+    for day in occurrence_dates(start_date, until, frequency, interval,
+                                weekdays, window_start, window_end):
+        exception = exceptions.get(day)
+        if exception is None:
+            yield (day, start, end, venue, performer, engineer, notes,
+                   occurrence_id(pk, day), updated_at)
+            continue
+        cancelled, new_start, new_end, new_notes = exception
+        if not cancelled:
+            yield (day, new_start or start, new_end or end, venue, performer,
+                   engineer, new_notes or notes, occurrence_id(pk, day),
+                   updated_at)
+
+
+def _rule_query(start_date=None, end_date=None, venue=None,
+                engineer=None, named: bool = False):
+    rules = RecurringEvent.objects.order_by()
+    if start_date:
+        rules = rules.filter(until__gte=start_date)
+    if end_date:
+        rules = rules.filter(start_date__lte=end_date)
+    if venue:
+        rules = rules.filter(venue=venue)
+    if engineer:
+        rules = rules.filter(sound_engineer=engineer)
+    return rules.values_list(*RULE_FIELDS, named=named)
+
+
+def _exception_query(rule_ids, window_start: date, window_end: date,
+                     named: bool = False):
+    return (RecurrenceException.objects
+            .filter(recurring_event__in=rule_ids,
+                    date__range=(window_start, window_end))
+            .values_list('recurring_event_id', 'date', 'cancelled',
+                         'performance_time_start', 'performance_time_end',
+                         'event_notes', named=named))
+
+
+def occurrence_bookings(window_start: date, window_end: date,
+                        engineer_ids=None, venues=None):
+    """
+    Generates the occurrences within a window as bookings, for checks
+    that must treat them like one-off events.
+
+    Without filters every rule is expanded; otherwise only the rules
+    booking one of ``engineer_ids`` or one of ``venues``. Costs one query
+    for the rules and, if there are any, one for their exceptions.
+
+    :param window_start: First date wanted.
+    :type window_start: date
+    :param window_end: Last date wanted.
+    :type window_end: date
+    :param engineer_ids: Engineer primary keys to look for.
+    :param venues: Venues to look for.
+
+    :returns: A generator of ``(occurrence id, date, start, end, engineer
+              id, venue, performer)`` tuples, in no particular order.
+    :rtype: generator
+    """
+    rules = RecurringEvent.objects.filter(until__gte=window_start,
+                                          start_date__lte=window_end)
+    if engineer_ids is not None or venues is not None:
+        rules = rules.filter(Q(sound_engineer_id__in=engineer_ids or ())
+                             | Q(venue__in=venues or ()))
+    rules = list(rules.order_by().values_list(*BOOKING_FIELDS))
+    if not rules:
+        return
+
+    by_rule = {rule[0]: {} for rule in rules}
+    for rule_id, day, cancelled, start, end, _ in _exception_query(
+            by_rule, window_start, window_end):
+        by_rule[rule_id][day] = (cancelled, start, end)
+
+    for pk, start, end, engineer_id, venue, performer, *pattern in rules:
+        for day in occurrence_dates(*pattern, window_start, window_end):
+            cancelled, new_start, new_end = by_rule[pk].get(
+                day, (False, None, None))
+            if not cancelled:
+                yield (occurrence_id(pk, day), day, new_start or start,
+                       new_end or end, engineer_id, venue, performer)
+
+
+def _merge_rules(rules: list, by_rule: dict, window_start: date,
+                 window_end: date):
+    return heapq.merge(*(expand_rule(rule, by_rule[rule[6]],
+                                     window_start, window_end)
+                         for rule in rules),
+                       key=schedule_key)
+
+
+def occurrence_rows(start_date=None, end_date=None, venue=None,
+                    engineer=None):
+    """
+    Generates the occurrences of every rule in a window, in schedule order.
+
+    Takes the same filters as :func:`planner.exporting.filter_events`.
+    Costs one query for the rules overlapping the window and, if there are
+    any, one for their exceptions; both run when iteration starts.
+
+    :returns: A generator of rows shaped like the export rows.
+    :rtype: generator
+    """
+    rules = list(_rule_query(start_date, end_date, venue, engineer))
+    if not rules:
+        return
+
+    window_start = start_date or date.min
+    window_end = end_date or date.max
+    by_rule = {rule[6]: {} for rule in rules}
+    for rule_id, day, *change in _exception_query(by_rule, window_start,
+                                                  window_end):
+        by_rule[rule_id][day] = tuple(change)
+
+    yield from _merge_rules(rules, by_rule, window_start, window_end)
+
+
+async def aoccurrence_rows(start_date=None, end_date=None, venue=None,
+                           engineer=None):
+    """
+    Asynchronous version of :func:`occurrence_rows`, running its two
+    queries through the async ORM. They read named tuples for the reason
+    given in :func:`planner.exporting.aexport_rows`.
+
+    :returns: An async generator of rows shaped like the export rows.
+    :rtype: async generator
+    """
+    rules = [rule async for rule in
+             _rule_query(start_date, end_date, venue, engineer, named=True)]
+    if not rules:
+        return
+
+    window_start = start_date or date.min
+    window_end = end_date or date.max
+    by_rule = {rule[6]: {} for rule in rules}
+    async for rule_id, day, *change in _exception_query(
+            by_rule, window_start, window_end, named=True):
+        by_rule[rule_id][day] = tuple(change)
+
+    for row in _merge_rules(rules, by_rule, window_start, window_end):
+        yield row
+
+
+def merge_schedule(event_rows, occurrences):
+    """
+    Merges one-off event rows and occurrences, both already in schedule
+    order, into a single ordered stream.
+
+    :returns: An iterator of rows.
+    :rtype: iterator
+    """
+    return heapq.merge(event_rows, occurrences, key=schedule_key)
+
+
+async def amerge_schedule(event_rows, occurrences):
+    """
+    Asynchronous version of :func:`merge_schedule` for two async
+    iterators. On equal keys the event row comes first, as with
+    :func:`heapq.merge`.
+
+    :returns: An async generator of rows.
+    :rtype: async generator
+    """
+    event = await anext(event_rows, None)
+    occurrence = await anext(occurrences, None)
+    while event is not None and occurrence is not None:
+        if schedule_key(occurrence) < schedule_key(event):
+            yield occurrence
+            occurrence = await anext(occurrences, None)
+        else:
+            yield event
+            event = await anext(event_rows, None)
+    rest, pending = ((event_rows, event) if event is not None
+                     else (occurrences, occurrence))
+    if pending is not None:
+        yield pending
+        async for row in rest:
+            yield row
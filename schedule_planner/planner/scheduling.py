@@ -0,0 +1,87 @@
+"""
+Interval helpers shared by conflict detection and scheduling features.
+
+An event is turned into a half-open ``[start, end)`` interval of datetimes.
+Sets that finish at or before their start time are treated as running past
+midnight, so their interval ends on the following day.
+"""
+import heapq
+from datetime import date, datetime, time, timedelta
+from itertools import groupby
+
+
+def event_interval(event_date: date, start: time, end: time) -> tuple:
+    """
+    Converts an event's date and times into a datetime interval.
+
+    :param event_date: The date the event starts on.
+    :type event_date: date
+    :param start: The performance start time.
+    :type start: time
+    :param end: The performance end time. A value at or before ``start``
+                means the set finishes on the next day.
+    :type end: time
+
+    :returns: A ``(start, end)`` tuple of naive datetimes.
+    :rtype: tuple
+    """
+    start_dt = datetime.combine(event_date, start)
+    end_dt = datetime.combine(event_date, end)
+    if end_dt <= start_dt:
+        end_dt += timedelta(days=1)
+    return start_dt, end_dt
+
+
+def intervals_overlap(first: tuple, second: tuple) -> bool:
+    """
+    Checks whether two half-open intervals overlap.
+
+    :returns: ``True`` if the intervals share any instant.
+    :rtype: bool
+    """
+    return first[0] < second[1] and second[0] < first[1]
+
+
+def sweep_overlaps(items):
+    """
+    Yields every overlapping pair in a collection of intervals.
+
+    The items are sorted by start once and swept from left to right while a
+    heap holds the intervals that are still running, so the cost is
+    O(n log n) plus the number of clashes reported rather than O(n²).
+
+    :param items: Iterable of ``(start, end, payload)`` tuples.
+
+    :returns: A generator of ``(payload, payload)`` pairs, earlier first.
+    :rtype: generator
+    """
+    active = []
+    for index, (start, end, payload) in enumerate(
+            sorted(items, key=lambda item: (item[0], item[1]))):
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        for _, _, other in active:
+            yield other, payload
+        heapq.heappush(active, (end, index, payload))
+
+
+def find_clashes(rows, key):
+    """
+    Groups event rows by ``key`` and reports overlapping rows in each group.
+
+    :param rows: Iterable of ``(id, date, start, end, ...)`` tuples.
+    :param key: Callable returning the grouping value of a row, e.g. the
+                engineer id or the venue. Rows for which it returns ``None``
+                are skipped.
+    :type key: callable
+
+    :returns: A generator of ``(group, row, row)`` tuples.
+    :rtype: generator
+    """
+    keyed = sorted(((k, row) for row in rows if (k := key(row)) is not None),
+                   key=lambda pair: pair[0])
+    for group, members in groupby(keyed, key=lambda pair: pair[0]):
+        intervals = [(*event_interval(row[1], row[2], row[3]), row)
+                     for _, row in members]
+        for first, second in sweep_overlaps(intervals):
+            yield group, first, second
@@ -0,0 +1,139 @@
+"""
+Ranked full-text search over performers, venues and event notes.
+
+Searches are answered from an inverted index instead of ``icontains``
+scans. On SQLite the index is an external-content FTS5 table,
+``planner_event_fts``, which triggers on ``planner_event`` keep in step with
+every write, bulk operations included. On PostgreSQL it is a GIN index over
+the weighted ``tsvector`` expression in :data:`PG_DOCUMENT`. Both are
+created by migration ``0008_event_search``. Other databases fall back to a
+plain substring match.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Event
+
+FTS_TABLE = 'planner_event_fts'
+
+# Weighted document the PostgreSQL GIN index is built on. Queries must use
+# this exact expression for the planner to pick the index.
+PG_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(performer, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(venue, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(event_notes, '')), 'C')"
+)
+
+# Column weights for FTS5's bm25(), in table order: performer, venue, notes.
+FTS_WEIGHTS = (10.0, 5.0, 1.0)
+
+# Fields shown for each search hit.
+SEARCH_FIELDS = ('id', 'date', 'performance_time_start',
+                 'performance_time_end', 'venue', 'performer',
+                 'sound_engineer__name', 'event_notes')
+
+
+def search_terms(query: str) -> list:
+    """
+    Splits a user query into plain word terms.
+
+    Anything but letters and digits is dropped, so user input can never
+    inject index query syntax.
+
+    :rtype: list
+    """
+    return re.findall(r'\w+', query.lower())
+
+
+def _sqlite_ids(terms: list, limit: int, offset: int) -> list:
+    # Every term must match, each as a prefix so partial words still hit.
+    match = ' '.join(f'"{term}"*' for term in terms)
+    weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}), rowid LIMIT %s OFFSET %s",
+            [match, limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _postgres_ids(terms: list, limit: int, offset: int) -> list:
+    tsquery = ' & '.join(f"{term}:*" for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT id FROM planner_event "
+            f"WHERE ({PG_DOCUMENT}) @@ to_tsquery('english', %s) "
+            f"ORDER BY ts_rank({PG_DOCUMENT}, to_tsquery('english', %s)) "
+            f"DESC, id LIMIT %s OFFSET %s",
+            [tsquery, tsquery, limit, offset])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _fallback_ids(terms: list, limit: int, offset: int) -> list:
+    condition = Q()
+    for term in terms:
+        condition &= (Q(performer__icontains=term)
+                      | Q(venue__icontains=term)
+                      | Q(event_notes__icontains=term))
+    return list(Event.objects.filter(condition).order_by('-date', 'id')
+                .values_list('id', flat=True)[offset:offset + limit])
+
+
+def search_event_ids(query: str, limit: int, offset: int = 0) -> list:
+    """
+    Returns the ids of the events matching every word of ``query``, best
+    match first.
+
+    Performer matches rank above venue matches, which rank above matches
+    in the notes.
+
+    :param query: The user's search text.
+    :type query: str
+    :param limit: Maximum number of ids to return.
+    :type limit: int
+    :param offset: Number of ranked ids to skip.
+    :type offset: int
+
+    :returns: Event primary keys in rank order.
+    :rtype: list
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if connection.vendor == 'sqlite':
+        return _sqlite_ids(terms, limit, offset)
+    if connection.vendor == 'postgresql':
+        return _postgres_ids(terms, limit, offset)
+    return _fallback_ids(terms, limit, offset)
+
+
+def search_events(query: str, page: int, page_size: int):
+    """
+    Runs a ranked search and loads one page of matching events.
+
+    Costs two queries: one against the search index for the ranked ids and
+    one to load those rows.
+
+    :param query: The user's search text.
+    :type query: str
+    :param page: The 1-based page number.
+    :type page: int
+    :param page_size: Number of results per page.
+    :type page_size: int
+
+    :returns: A tuple ``(results, has_next)`` where results are dicts of
+              :data:`SEARCH_FIELDS` in rank order.
+    :rtype: tuple
+    """
+    ids = search_event_ids(query, page_size + 1, (page - 1) * page_size)
+    has_next = len(ids) > page_size
+    ids = ids[:page_size]
+    if not ids:
+        return [], False
+    rows = {row['id']: row for row in
+            Event.objects.filter(pk__in=ids).order_by()
+            .values(*SEARCH_FIELDS)}
+    # Rows deleted since the index was read are simply skipped.
+    return [rows[pk] for pk in ids if pk in rows], has_next
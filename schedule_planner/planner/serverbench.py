@@ -0,0 +1,279 @@
+"""
+Throughput of the WSGI and ASGI deployments under slow clients.
+
+:func:`run_server_benchmark` starts the project under gunicorn once per
+profile in :data:`SERVER_PROFILES`: sync workers serving the WSGI
+application, and the uvicorn workers of ``gunicorn_asgi.conf.py`` serving
+the ASGI application with the async views. Both get the same number of
+workers. Against each server it runs, for a fixed time:
+
+* slow clients, which trickle their request in and then read the CSV
+  export at a limited rate, like visitors on a poor mobile connection;
+* fast clients, which request the schedule page back to back.
+
+A sync worker is held by a slow connection from its first byte to its
+last, so once every worker has one the fast clients queue behind them. An
+event loop keeps serving other connections while it waits on a slow one.
+The fast clients' throughput and latency are reported for each profile.
+
+The servers use the configured database, so run the benchmark against a
+scratch database filled by ``generate_schedule_data``.
+"""
+import asyncio
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.test import Client
+
+from .benchmarking import percentile
+
+# Profile name: (application, extra gunicorn arguments, module the worker
+# class needs, value of DJANGO_ASYNC_VIEWS).
+SERVER_PROFILES = {
+    'wsgi': ('schedule_planner.wsgi:application',
+             ['--worker-class', 'sync'], 'gunicorn', 'False'),
+    'asgi': ('schedule_planner.asgi:application',
+             ['--config', 'gunicorn_asgi.conf.py'], 'uvicorn_worker', 'True'),
+}
+
+BENCHMARK_SERVER_USERNAME = 'benchmark-servers'
+
+# Pages requested by the two kinds of client.
+FAST_PATH = '/'
+SLOW_PATH = '/export.csv'
+
+# Seconds to wait for a server to answer after starting it.
+STARTUP_TIMEOUT = 30
+# Seconds a single request may take before it counts as an error.
+REQUEST_TIMEOUT = 60
+# Bytes sent per write while trickling a request in.
+TRICKLE_BYTES = 16
+# Bytes read per read while downloading slowly.
+READ_BYTES = 16 * 1024
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+class _Server:
+    """
+    A gunicorn process serving one profile on a local port.
+    """
+
+    def __init__(self, profile: str, workers: int):
+        application, arguments, _, async_views = SERVER_PROFILES[profile]
+        self.port = _free_port()
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', *arguments,
+             '--bind', f'127.0.0.1:{self.port}',
+             '--workers', str(workers), application],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, 'DJANGO_ASYNC_VIEWS': async_views},
+            stdout=self.log, stderr=subprocess.STDOUT)
+
+    def wait_until_ready(self):
+        """
+        Waits for the server to answer a request.
+
+        :raises RuntimeError: If it exits or does not answer in time.
+        """
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        url = f'http://127.0.0.1:{self.port}/conditions/'
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                with urllib.request.urlopen(url, timeout=5):
+                    return
+            except (urllib.error.URLError, OSError):
+                time.sleep(0.2)
+        self.log.seek(0)
+        output = self.log.read().decode(errors='replace')[-2000:]
+        raise RuntimeError(f"The server did not start:\n{output}")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.log.close()
+
+
+async def _fetch(port: int, path: str, cookie: str, send_seconds: float = 0,
+                 read_delay: float = 0) -> int:
+    """
+    Sends one GET request over a fresh connection and reads the whole
+    response.
+
+    :param send_seconds: Spread the request over this many seconds.
+    :param read_delay: Seconds to pause after each read of the body.
+
+    :returns: The response status code.
+    :rtype: int
+    """
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        request = (f'GET {path} HTTP/1.1\r\nHost: localhost\r\n'
+                   f'Cookie: {cookie}\r\nConnection: close\r\n\r\n').encode()
+        if send_seconds:
+            pieces = [request[start:start + TRICKLE_BYTES]
+                      for start in range(0, len(request), TRICKLE_BYTES)]
+            for piece in pieces:
+                writer.write(piece)
+                await writer.drain()
+                await asyncio.sleep(send_seconds / len(pieces))
+        else:
+            writer.write(request)
+            await writer.drain()
+        status_line = await reader.readline()
+        while await reader.read(READ_BYTES):
+            if read_delay:
+                await asyncio.sleep(read_delay)
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def _drive(port: int, cookie: str, duration: float, fast_clients: int,
+                 slow_clients: int, slow_send: float,
+                 read_rate: float) -> dict:
+    """
+    Runs the fast and slow clients against a server for ``duration``
+    seconds.
+
+    :returns: The fast clients' throughput and latency and the number of
+              slow downloads completed.
+    :rtype: dict
+    """
+    started = time.perf_counter()
+    deadline = started + duration
+    latencies = []
+    counts = {'fast_errors': 0, 'slow_completed': 0, 'slow_errors': 0}
+    read_delay = READ_BYTES / (read_rate * 1024) if read_rate else 0
+
+    async def fast_client():
+        while time.perf_counter() < deadline:
+            sent = time.perf_counter()
+            try:
+                status = await asyncio.wait_for(
+                    _fetch(port, FAST_PATH, cookie), REQUEST_TIMEOUT)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                status = None
+            finished = time.perf_counter()
+            if status != 200:
+                counts['fast_errors'] += 1
+            elif finished <= deadline:
+                latencies.append((finished - sent) * 1000)
+
+    async def slow_client():
+        while True:
+            try:
+                status = await asyncio.wait_for(
+                    _fetch(port, SLOW_PATH, cookie, slow_send, read_delay),
+                    REQUEST_TIMEOUT)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                status = None
+            if status == 200:
+                counts['slow_completed'] += 1
+            else:
+                counts['slow_errors'] += 1
+
+    slow = [asyncio.create_task(slow_client())
+            for _ in range(slow_clients)]
+    try:
+        await asyncio.gather(*(fast_client() for _ in range(fast_clients)))
+    finally:
+        for task in slow:
+            task.cancel()
+        await asyncio.gather(*slow, return_exceptions=True)
+    return {
+        'requests': len(latencies),
+        'requests_per_second': round(len(latencies) / duration, 2),
+        'p50_ms': round(percentile(latencies, 0.5), 3) if latencies else None,
+        'p95_ms': round(percentile(latencies, 0.95), 3) if latencies else None,
+        'errors': counts['fast_errors'],
+        'slow_completed': counts['slow_completed'],
+        'slow_errors': counts['slow_errors'],
+    }
+
+
+def run_server_benchmark(profiles=tuple(SERVER_PROFILES), workers: int = 2,
+                         duration: float = 20, fast_clients: int = 20,
+                         slow_clients: int = 16, slow_send: float = 5,
+                         read_rate: float = 64, progress=None) -> dict:
+    """
+    Measures each server profile under the same mix of fast and slow
+    clients.
+
+    A user and a session are created for the clients and removed again at
+    the end.
+
+    :param profiles: Names from :data:`SERVER_PROFILES` to measure.
+    :param workers: Gunicorn workers per server.
+    :type workers: int
+    :param duration: Seconds to run the clients against each server.
+    :type duration: float
+    :param fast_clients: Clients requesting the schedule back to back.
+    :type fast_clients: int
+    :param slow_clients: Clients downloading the export slowly.
+    :type slow_clients: int
+    :param slow_send: Seconds a slow client takes to send its request.
+    :type slow_send: float
+    :param read_rate: KiB per second a slow client reads; 0 for no limit.
+    :type read_rate: float
+    :param progress: Optional callable given a message per step.
+
+    :returns: ``{"meta": {...}, "results": {profile: metrics}}``, ready to
+              save as JSON.
+    :rtype: dict
+    :raises ImproperlyConfigured: If a profile's server is not installed.
+    """
+    for profile in profiles:
+        module = SERVER_PROFILES[profile][2]
+        if importlib.util.find_spec(module) is None:
+            raise ImproperlyConfigured(
+                f"The {profile} profile needs the {module} package.")
+    report = {'meta': {'workers': workers, 'duration': duration,
+                       'fast_clients': fast_clients,
+                       'slow_clients': slow_clients,
+                       'slow_send': slow_send, 'read_rate': read_rate},
+              'results': {}}
+    user = User.objects.create_user(BENCHMARK_SERVER_USERNAME)
+    client = Client()
+    client.force_login(user)
+    cookie = (f"{settings.SESSION_COOKIE_NAME}="
+              f"{client.cookies[settings.SESSION_COOKIE_NAME].value}")
+    try:
+        for profile in profiles:
+            if progress:
+                progress(f"Starting the {profile} server...")
+            server = _Server(profile, workers)
+            try:
+                server.wait_until_ready()
+                if progress:
+                    progress(f"Measuring {profile} for {duration:g} s...")
+                report['results'][profile] = asyncio.run(_drive(
+                    server.port, cookie, duration, fast_clients,
+                    slow_clients, slow_send, read_rate))
+            finally:
+                server.stop()
+    finally:
+        client.logout()
+        user.delete()
+    return report
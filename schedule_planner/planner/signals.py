@@ -0,0 +1,353 @@
+"""
+Signal receivers keeping derived schedule data in step with the models.
+"""
+from contextvars import ContextVar
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_migrate,
+                                      post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+
+from .availability import refresh_bitmaps, rule_keys, slot_keys
+from .cache import bump_schedule_version, invalidate_engineer_choices
+from .feeds import bump_feed_versions
+from .models import (EngineerUnavailability, Event, EventChange,
+                     RecurrenceException, RecurringEvent, SoundEngineer)
+from .stats import (STAT_FIELDS, add_deltas, apply_deltas,
+                    engineer_unassigned_deltas, stat_row)
+from .sync import record_changes
+
+
+# Set while planner.bulk deletes a batch of events through the ORM. It
+# brings the derived data in step for the whole batch afterwards, so the
+# per-event delete receivers below do nothing meanwhile.
+bulk_deleting = ContextVar('planner_bulk_deleting', default=False)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=SoundEngineer)
+@receiver(post_delete, sender=SoundEngineer)
+@receiver(post_save, sender=RecurringEvent)
+@receiver(post_delete, sender=RecurringEvent)
+@receiver(post_save, sender=RecurrenceException)
+@receiver(post_delete, sender=RecurrenceException)
+def invalidate_schedule_cache(sender, **kwargs):
+    """
+    Bumps the schedule version whenever an event, residency or engineer
+    changes.
+    """
+    if not bulk_deleting.get():
+        bump_schedule_version()
+
+
+@receiver(post_migrate)
+def reset_schedule_cache(sender, **kwargs):
+    """
+    Drops the cached schedule version and roster after ``migrate`` or
+    ``flush``, so nothing cached from a previous database is served.
+    """
+    if sender.name == 'planner':
+        bump_schedule_version()
+        invalidate_engineer_choices()
+
+
+@receiver(post_init, sender=Event)
+@receiver(post_init, sender=RecurringEvent)
+def remember_loaded_engineer(sender, instance, **kwargs):
+    """
+    Records the engineer an event was loaded with, so a reassignment can
+    invalidate the previous engineer's feed as well as the new one.
+    """
+    # Read the raw attribute so a deferred field is not fetched.
+    instance._loaded_engineer_id = instance.__dict__.get('sound_engineer_id')
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=RecurringEvent)
+@receiver(post_delete, sender=RecurringEvent)
+def invalidate_engineer_feeds(sender, instance, **kwargs):
+    """
+    Bumps the feed version of every engineer affected by a change to an
+    event or residency.
+    """
+    if bulk_deleting.get():
+        return
+    bump_feed_versions({instance.sound_engineer_id,
+                        getattr(instance, '_loaded_engineer_id', None)})
+    instance._loaded_engineer_id = instance.sound_engineer_id
+
+
+@receiver(post_save, sender=RecurrenceException)
+@receiver(post_delete, sender=RecurrenceException)
+def invalidate_residency_feed(sender, instance, **kwargs):
+    """
+    Bumps the feed version of the engineer booked for a residency when one
+    of its occurrences is cancelled or changed.
+    """
+    bump_feed_versions(RecurringEvent.objects
+                       .filter(pk=instance.recurring_event_id)
+                       .values_list('sound_engineer_id', flat=True))
+
+
+@receiver(post_save, sender=SoundEngineer)
+@receiver(post_delete, sender=SoundEngineer)
+def invalidate_roster(sender, **kwargs):
+    """
+    Drops the cached engineer choices when the roster changes. Also done
+    after commit, so a request reading the old roster meanwhile cannot
+    leave it cached.
+    """
+    invalidate_engineer_choices()
+    transaction.on_commit(invalidate_engineer_choices)
+
+
+@receiver(post_save, sender=SoundEngineer)
+def invalidate_own_feed(sender, instance, created, **kwargs):
+    """
+    Bumps an engineer's feed version when their details change, since the
+    feed is titled with their name.
+    """
+    if not created:
+        bump_feed_versions([instance.pk])
+
+
+@receiver(post_save, sender=Event)
+def log_event_saved(sender, instance, **kwargs):
+    """
+    Appends an upsert to the change log. :meth:`Event.save` wraps this in
+    the same transaction as the write itself.
+    """
+    record_changes([instance.pk], EventChange.UPSERT)
+
+
+@receiver(post_delete, sender=Event)
+def log_event_deleted(sender, instance, **kwargs):
+    """
+    Appends a tombstone to the change log. Deletions send this signal
+    inside their own transaction.
+    """
+    if bulk_deleting.get():
+        return
+    record_changes([instance.pk], EventChange.DELETE)
+
+
+@receiver(pre_delete, sender=SoundEngineer)
+def log_engineer_unassigned(sender, instance, **kwargs):
+    """
+    Logs the events that lose their engineer when one is deleted, since
+    ``SET_NULL`` updates them without sending any event signals.
+    """
+    record_changes(instance.events_as_engineer.values_list('pk', flat=True),
+                   EventChange.UPSERT)
+
+
+@receiver(post_init, sender=Event)
+def remember_loaded_stats(sender, instance, **kwargs):
+    """
+    Records the values an event was loaded with, so a save can move its
+    stats and availability slots if the day, venue, engineer or times
+    change.
+    """
+    values = instance.__dict__
+    if instance.pk is not None and all(
+            field in values for field in STAT_FIELDS):
+        instance._loaded_stats = tuple(values[field]
+                                       for field in STAT_FIELDS)
+    else:
+        instance._loaded_stats = None
+
+
+@receiver(pre_save, sender=Event)
+def load_missing_stats(sender, instance, **kwargs):
+    """
+    Reads the stored values of an existing event saved without them, for
+    instance one loaded with deferred fields.
+    """
+    if instance.pk is not None and instance._loaded_stats is None:
+        instance._loaded_stats = (Event.objects.filter(pk=instance.pk)
+                                  .values_list(*STAT_FIELDS).first())
+
+
+@receiver(post_save, sender=Event)
+def update_stats_on_save(sender, instance, created, **kwargs):
+    """
+    Moves the event's contribution to the daily stats to its new values.
+    """
+    deltas = add_deltas({}, [stat_row(instance)])
+    if not created and instance._loaded_stats is not None:
+        add_deltas(deltas, [instance._loaded_stats], sign=-1)
+    apply_deltas(deltas)
+
+
+@receiver(post_delete, sender=Event)
+def update_stats_on_delete(sender, instance, **kwargs):
+    """
+    Removes a deleted event from the daily stats.
+    """
+    if bulk_deleting.get():
+        return
+    apply_deltas(add_deltas({}, [instance._loaded_stats
+                                 or stat_row(instance)], sign=-1))
+
+
+@receiver(pre_delete, sender=SoundEngineer)
+def unassign_engineer_stats(sender, instance, **kwargs):
+    """
+    Moves a deleted engineer's totals to the unassigned rows, matching the
+    ``SET_NULL`` on their events; their own rows are removed by cascade.
+    """
+    apply_deltas(engineer_unassigned_deltas(instance.pk))
+
+
+def _booking_keys(values) -> set:
+    if values is None:
+        return set()
+    event_date, _, engineer_id, start, end = values
+    return slot_keys(engineer_id, event_date, start, end)
+
+
+@receiver(post_save, sender=Event)
+def update_bitmaps_on_save(sender, instance, created, **kwargs):
+    """
+    Recomputes the availability bitmaps an event was and is now booked in,
+    unless its engineer, day and times are unchanged.
+    """
+    old = instance._loaded_stats
+    new = stat_row(instance)
+    if not created and old is not None and \
+            old[:1] + old[2:] == new[:1] + new[2:]:
+        return
+    refresh_bitmaps(_booking_keys(new) | _booking_keys(old))
+
+
+@receiver(post_delete, sender=Event)
+def update_bitmaps_on_delete(sender, instance, **kwargs):
+    """
+    Frees the slots of a deleted event in its engineer's bitmaps.
+    """
+    if bulk_deleting.get():
+        return
+    refresh_bitmaps(_booking_keys(instance._loaded_stats
+                                  or stat_row(instance)))
+
+
+@receiver(post_init, sender=EngineerUnavailability)
+def remember_loaded_period(sender, instance, **kwargs):
+    """
+    Records which bitmaps an unavailability period was stored in.
+    """
+    values = instance.__dict__
+    fields = ('sound_engineer_id', 'date', 'start_time', 'end_time')
+    instance._loaded_keys = (
+        slot_keys(*(values[field] for field in fields))
+        if instance.pk is not None and all(field in values
+                                           for field in fields)
+        else set())
+
+
+@receiver(post_save, sender=EngineerUnavailability)
+def update_bitmaps_for_period(sender, instance, **kwargs):
+    """
+    Recomputes the bitmaps an unavailability period was and is now in.
+    """
+    keys = slot_keys(instance.sound_engineer_id, instance.date,
+                     instance.start_time, instance.end_time)
+    refresh_bitmaps(keys | instance._loaded_keys)
+    instance._loaded_keys = keys
+
+
+@receiver(post_delete, sender=EngineerUnavailability)
+def free_bitmaps_of_period(sender, instance, **kwargs):
+    """
+    Frees the slots of a deleted unavailability period.
+    """
+    refresh_bitmaps(slot_keys(instance.sound_engineer_id, instance.date,
+                              instance.start_time, instance.end_time))
+
+
+# Residency values that decide which bitmaps its occurrences are in, in
+# the argument order of rule_keys().
+RULE_KEY_FIELDS = ('sound_engineer_id', 'performance_time_start',
+                   'performance_time_end', 'start_date', 'until',
+                   'frequency', 'interval', 'weekdays')
+
+
+@receiver(post_init, sender=RecurringEvent)
+def remember_loaded_rule(sender, instance, **kwargs):
+    """
+    Records the values a residency was loaded with, so a save can free the
+    slots its old occurrences were booked in.
+    """
+    values = instance.__dict__
+    instance._loaded_rule = (
+        tuple(values[field] for field in RULE_KEY_FIELDS)
+        if instance.pk is not None and all(field in values
+                                           for field in RULE_KEY_FIELDS)
+        else None)
+
+
+@receiver(post_save, sender=RecurringEvent)
+def update_bitmaps_for_rule(sender, instance, **kwargs):
+    """
+    Recomputes the bitmaps a residency's occurrences were and are now in,
+    unless its engineer, times and pattern are unchanged.
+    """
+    new = tuple(getattr(instance, field) for field in RULE_KEY_FIELDS)
+    if new == instance._loaded_rule:
+        return
+    keys = rule_keys(*new)
+    if instance._loaded_rule is not None:
+        keys |= rule_keys(*instance._loaded_rule)
+    refresh_bitmaps(keys)
+    instance._loaded_rule = new
+
+
+@receiver(post_delete, sender=RecurringEvent)
+def free_bitmaps_of_rule(sender, instance, **kwargs):
+    """
+    Frees the slots of a deleted residency's occurrences.
+    """
+    refresh_bitmaps(rule_keys(*(getattr(instance, field)
+                                for field in RULE_KEY_FIELDS)))
+
+
+@receiver(post_init, sender=RecurrenceException)
+def remember_loaded_exception_date(sender, instance, **kwargs):
+    """
+    Records the date an exception was loaded with, so moving it refreshes
+    the day it left as well.
+    """
+    instance._loaded_date = (instance.__dict__.get('date')
+                             if instance.pk is not None else None)
+
+
+@receiver(post_save, sender=RecurrenceException)
+@receiver(post_delete, sender=RecurrenceException)
+def update_bitmaps_for_exception(sender, instance, **kwargs):
+    """
+    Recomputes the bitmaps of the occurrence an exception cancels or
+    moves. Changed times may run past midnight, so the next day is
+    included.
+    """
+    engineer_id = (RecurringEvent.objects
+                   .filter(pk=instance.recurring_event_id)
+                   .values_list('sound_engineer_id', flat=True).first())
+    if engineer_id is None:
+        return
+    days = {instance.date, instance._loaded_date} - {None}
+    refresh_bitmaps({(engineer_id, day + timedelta(days=offset))
+                     for day in days for offset in (0, 1)})
+    instance._loaded_date = instance.date
+
+
+# Connected last, so every receiver above still sees the values the event
+# was loaded with.
+@receiver(post_save, sender=Event)
+def remember_saved_values(sender, instance, **kwargs):
+    """
+    Makes the values just saved the baseline for the next save.
+    """
+    instance._loaded_stats = stat_row(instance)
@@ -0,0 +1,214 @@
+"""
+Slow-query log with query plans.
+
+Every database connection gets an execute wrapper that times each
+statement. A statement taking longer than ``SLOW_QUERY_THRESHOLD_MS`` is
+written to the ``planner.slowqueries`` logger as one JSON line, with:
+
+* its fingerprint, the SQL with literals and ``IN`` lists normalised away,
+  so the same ORM call groups together however its parameters vary;
+* the view that ran it, when inside a request;
+* the query plan, from ``EXPLAIN QUERY PLAN`` on SQLite or ``EXPLAIN`` on
+  PostgreSQL.
+
+The logger is routed to a file in the settings that every worker appends
+to and logrotate rotates, and the ``slow_queries`` management command
+summarises the log by fingerprint.
+"""
+import hashlib
+import json
+import logging
+import re
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .middleware import current_timer
+
+logger = logging.getLogger(__name__)
+
+# Only read-only statements are explained; EXPLAIN never runs them.
+_EXPLAINABLE = ('SELECT', 'WITH')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w."])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\bIN \(\?(?:, \?)*\)', re.IGNORECASE)
+_VALUES_LIST = re.compile(r'(\(\?(?:, \?)*\))(?:, \1)+')
+_SPACE = re.compile(r'\s+')
+
+
+def normalise_sql(sql: str) -> str:
+    """
+    Replaces literals and placeholders with ``?`` and collapses ``IN``
+    lists and multi-row ``VALUES``, so statements that differ only in
+    their parameters read the same.
+
+    :rtype: str
+    """
+    sql = _SPACE.sub(' ', sql.strip())
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _VALUES_LIST.sub(r'\1, ...', sql)
+
+
+def fingerprint(sql: str) -> str:
+    """
+    Returns a short stable identifier of a statement's normalised form.
+
+    :rtype: str
+    """
+    return hashlib.sha1(normalise_sql(sql).encode()).hexdigest()[:12]
+
+
+def explain(connection, sql: str, params) -> list:
+    """
+    Returns the database's plan for a statement.
+
+    The plan is read through the backend cursor directly, so it does not
+    pass through the execute wrappers and is not itself timed or counted.
+
+    :param connection: The connection the statement ran on.
+    :param sql: The statement, with placeholders.
+    :type sql: str
+    :param params: The statement's parameters.
+
+    :returns: The plan, one line per entry.
+    :rtype: list
+    """
+    if connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    elif connection.vendor == 'postgresql':
+        prefix = 'EXPLAIN '
+    else:
+        return []
+    # A failed statement would abort the surrounding transaction on
+    # PostgreSQL, so the plan is read inside a savepoint.
+    with transaction.atomic(using=connection.alias), \
+            connection.cursor() as cursor:
+        cursor.cursor.execute(prefix + sql, params)
+        rows = cursor.cursor.fetchall()
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+
+class SlowQueryRecorder:
+    """
+    Execute wrapper logging statements slower than the threshold.
+
+    :ivar connection: The connection the wrapper is installed on.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __call__(self, execute, sql, params, many, context):
+        threshold = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+        if threshold is None:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = (time.perf_counter() - started) * 1000
+        if duration >= threshold:
+            self.record(sql, params, many, duration)
+        return result
+
+    def record(self, sql: str, params, many: bool, duration: float):
+        """
+        Logs one slow statement with its fingerprint, view and plan.
+        """
+        plan = []
+        if (not many and sql.lstrip().upper().startswith(_EXPLAINABLE)
+                and not self.connection.needs_rollback):
+            try:
+                plan = explain(self.connection, sql, params)
+            except Exception as error:
+                plan = [f"EXPLAIN failed: {error}"]
+        timer = current_timer.get()
+        logger.warning(json.dumps({
+            'at': timezone.now().isoformat(),
+            'duration_ms': round(duration, 3),
+            'fingerprint': fingerprint(sql),
+            'sql': normalise_sql(sql),
+            'view': timer.view_path() if timer else None,
+            'vendor': self.connection.vendor,
+            'plan': plan,
+        }))
+
+
+@receiver(connection_created)
+def install_slow_query_recorder(sender, connection, **kwargs):
+    """
+    Adds the recorder to each new database connection. Connections are
+    reopened on the same wrapper object, so it is only added once.
+    """
+    if not any(isinstance(wrapper, SlowQueryRecorder)
+               for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.insert(0, SlowQueryRecorder(connection))
+
+
+def read_log(paths) -> list:
+    """
+    Reads slow-query log entries, skipping lines that are not entries.
+
+    :param paths: Log files to read, e.g. the current file and its
+                  rotated backups.
+
+    :returns: The entries as dicts.
+    :rtype: list
+    """
+    entries = []
+    for path in paths:
+        try:
+            stream = open(path, encoding='utf-8')
+        except FileNotFoundError:
+            continue
+        with stream:
+            for line in stream:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and 'fingerprint' in entry:
+                    entries.append(entry)
+    return entries
+
+
+def summarise_log(entries) -> list:
+    """
+    Groups slow-query entries by fingerprint, worst total time first.
+
+    :param entries: Entries as returned by :func:`read_log`.
+
+    :returns: One dict per fingerprint with ``count``, ``total_ms``,
+              ``max_ms``, ``mean_ms``, the ``views`` that ran it, its
+              ``sql`` and the most recent ``plan``.
+    :rtype: list
+    """
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(entry['fingerprint'], {
+            'fingerprint': entry['fingerprint'], 'sql': entry.get('sql'),
+            'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'views': set(),
+            'plan': [], 'last_at': ''})
+        duration = entry.get('duration_ms', 0.0)
+        group['count'] += 1
+        group['total_ms'] += duration
+        group['max_ms'] = max(group['max_ms'], duration)
+        if entry.get('view'):
+            group['views'].add(entry['view'])
+        if entry.get('at', '') >= group['last_at']:
+            group['last_at'] = entry.get('at', '')
+            group['plan'] = entry.get('plan') or []
+    for group in groups.values():
+        group['mean_ms'] = group['total_ms'] / group['count']
+        group['views'] = sorted(group['views'])
+    return sorted(groups.values(), key=lambda group: -group['total_ms'])
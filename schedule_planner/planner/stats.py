@@ -0,0 +1,220 @@
+"""
+Incrementally maintained booking statistics.
+
+:class:`~planner.models.DailyStat` holds one row per day, venue and engineer
+with the number of events and booked minutes. Every write to an event
+applies the difference it makes to those rows, so dashboard queries read a
+table whose size depends on the number of distinct days and venues rather
+than on the number of events. :func:`rebuild_stats` recomputes the table
+from scratch for backfills or to repair drift.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncWeek
+
+from .models import DailyStat, Event
+from .scheduling import event_interval
+
+# Event columns a stats row is derived from, in the order used by the
+# helpers below.
+STAT_FIELDS = ('date', 'venue', 'sound_engineer_id',
+               'performance_time_start', 'performance_time_end')
+
+REBUILD_BATCH_SIZE = 1000
+
+# Up to this many changed rows are updated one by one; a single event edit
+# touches at most two.
+ROW_BY_ROW_LIMIT = 2
+
+
+def event_minutes(event_date, start, end) -> int:
+    """
+    Returns the length of a set in minutes, allowing for sets that run
+    past midnight.
+
+    :rtype: int
+    """
+    start_at, end_at = event_interval(event_date, start, end)
+    return int((end_at - start_at).total_seconds() // 60)
+
+
+def stat_row(event: Event) -> tuple:
+    """
+    Reads the :data:`STAT_FIELDS` of an event instance.
+
+    :rtype: tuple
+    """
+    return (event.date, event.venue, event.sound_engineer_id,
+            event.performance_time_start, event.performance_time_end)
+
+
+def add_deltas(deltas: dict, rows, sign: int = 1) -> dict:
+    """
+    Accumulates the effect of adding (``sign=1``) or removing
+    (``sign=-1``) events on the stats.
+
+    :param deltas: Mapping of ``(date, venue, engineer id)`` to
+                   ``[count, minutes]`` changes, updated in place.
+    :type deltas: dict
+    :param rows: Tuples in :data:`STAT_FIELDS` order.
+    :param sign: ``1`` for added events, ``-1`` for removed ones.
+    :type sign: int
+
+    :returns: ``deltas``.
+    :rtype: dict
+    """
+    for event_date, venue, engineer_id, start, end in rows:
+        change = deltas.setdefault((event_date, venue, engineer_id), [0, 0])
+        change[0] += sign
+        change[1] += sign * event_minutes(event_date, start, end)
+    return deltas
+
+
+def _increment(key: tuple, count: int, minutes: int) -> int:
+    event_date, venue, engineer_id = key
+    return (DailyStat.objects
+            .filter(date=event_date, venue=venue,
+                    sound_engineer_id=engineer_id)
+            .update(event_count=F('event_count') + count,
+                    booked_minutes=F('booked_minutes') + minutes))
+
+
+def apply_deltas(deltas: dict):
+    """
+    Writes accumulated changes to the stats table.
+
+    A change to one or two rows, as made by saving a single event, is an
+    atomic ``UPDATE`` per row, with an insert when the row is new. Larger
+    changes cost three queries however many rows change: missing rows are
+    inserted empty, the affected rows are read under a row lock, and the
+    new totals are saved with one ``bulk_update``.
+
+    :param deltas: Changes as built by :func:`add_deltas`.
+    :type deltas: dict
+    """
+    deltas = {key: change for key, change in deltas.items() if any(change)}
+    if not deltas:
+        return
+    with transaction.atomic():
+        if len(deltas) <= ROW_BY_ROW_LIMIT:
+            for key, (count, minutes) in deltas.items():
+                if _increment(key, count, minutes):
+                    continue
+                event_date, venue, engineer_id = key
+                try:
+                    with transaction.atomic():
+                        DailyStat.objects.create(
+                            date=event_date, venue=venue,
+                            sound_engineer_id=engineer_id,
+                            event_count=count, booked_minutes=minutes)
+                except IntegrityError:
+                    # Another writer created the row first.
+                    _increment(key, count, minutes)
+            return
+
+        DailyStat.objects.bulk_create(
+            [DailyStat(date=event_date, venue=venue,
+                       sound_engineer_id=engineer_id)
+             for event_date, venue, engineer_id in deltas],
+            ignore_conflicts=True)
+        dates = [event_date for event_date, _, _ in deltas]
+        rows = (DailyStat.objects.select_for_update()
+                .filter(date__range=(min(dates), max(dates)),
+                        venue__in={venue for _, venue, _ in deltas}))
+        changed = []
+        for row in rows:
+            change = deltas.get((row.date, row.venue, row.sound_engineer_id))
+            if change:
+                row.event_count += change[0]
+                row.booked_minutes += change[1]
+                changed.append(row)
+        DailyStat.objects.bulk_update(changed,
+                                      ['event_count', 'booked_minutes'])
+
+
+def rebuild_stats(batch_size: int = REBUILD_BATCH_SIZE) -> int:
+    """
+    Recomputes the stats table from the events table.
+
+    Events are streamed, so memory use depends on the number of stats rows
+    rather than the number of events.
+
+    :param batch_size: Rows inserted per ``bulk_create``.
+    :type batch_size: int
+
+    :returns: The number of stats rows written.
+    :rtype: int
+    """
+    totals = add_deltas({}, Event.objects.order_by()
+                        .values_list(*STAT_FIELDS)
+                        .iterator(chunk_size=batch_size))
+    with transaction.atomic():
+        DailyStat.objects.all().delete()
+        DailyStat.objects.bulk_create(
+            (DailyStat(date=event_date, venue=venue,
+                       sound_engineer_id=engineer_id,
+                       event_count=count, booked_minutes=minutes)
+             for (event_date, venue, engineer_id), (count, minutes)
+             in totals.items()),
+            batch_size=batch_size)
+    return len(totals)
+
+
+def _with_hours(rows) -> list:
+    rows = list(rows)
+    for row in rows:
+        row['hours'] = row['minutes'] / 60
+    return rows
+
+
+def summarise(start_date, end_date) -> dict:
+    """
+    Totals the stats table over a date range for the dashboard.
+
+    Costs three queries over the stats table only.
+
+    :param start_date: First date included.
+    :type start_date: date
+    :param end_date: Last date included.
+    :type end_date: date
+
+    :returns: ``by_venue``, ``by_engineer`` (``None`` name for unassigned
+              events) and ``by_week`` lists of dicts with ``events``,
+              ``minutes`` and ``hours``, plus the ``unassigned`` count.
+    :rtype: dict
+    """
+    stats = DailyStat.objects.filter(date__range=(start_date, end_date),
+                                     event_count__gt=0)
+    totals = {'events': Sum('event_count'), 'minutes': Sum('booked_minutes')}
+    by_venue = _with_hours(stats.values('venue').annotate(**totals)
+                           .order_by('venue'))
+    by_engineer = _with_hours(stats.values('sound_engineer__name')
+                              .annotate(**totals)
+                              .order_by('sound_engineer__name'))
+    by_week = _with_hours(stats.annotate(week=TruncWeek('date'))
+                          .values('week').annotate(**totals)
+                          .order_by('week'))
+    unassigned = sum(row['events'] for row in by_engineer
+                     if row['sound_engineer__name'] is None)
+    return {'by_venue': by_venue, 'by_engineer': by_engineer,
+            'by_week': by_week, 'unassigned': unassigned}
+
+
+def engineer_unassigned_deltas(engineer_id: int) -> dict:
+    """
+    Builds the changes that move an engineer's totals to the unassigned
+    rows, for when the engineer is deleted and their events are kept.
+
+    :rtype: dict
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for event_date, venue, count, minutes in (
+            DailyStat.objects.filter(sound_engineer_id=engineer_id)
+            .values_list('date', 'venue', 'event_count',
+                         'booked_minutes')):
+        change = deltas[(event_date, venue, None)]
+        change[0] += count
+        change[1] += minutes
+    return dict(deltas)
@@ -0,0 +1,128 @@
+"""
+Delta synchronisation of the schedule through the event change log.
+
+Every write to an :class:`~planner.models.Event` appends an
+:class:`~planner.models.EventChange` row in the same transaction. Once it
+has committed, the next sync gives the entry the next number of the
+:class:`~planner.models.ChangeSequence`. Clients keep the number of the
+last change they have seen as their sync token and ask for everything
+after it, so a sync costs in proportion to the number of changes rather
+than the size of the schedule. Compaction drops superseded entries so the
+log grows with the number of events, not edits.
+
+Ids cannot serve as the token: they are handed out on insert but become
+visible on commit, so a long transaction can commit a lower id after a
+client has already synced past it. Numbers are only handed out to
+committed entries, one transaction at a time, so they become visible in
+increasing order.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Max, Min
+from django.utils import timezone
+
+from .models import ChangeSequence, Event, EventChange
+
+
+def record_changes(event_ids, action: str):
+    """
+    Appends one change log entry per event.
+
+    :param event_ids: Primary keys of the changed events.
+    :param action: :attr:`EventChange.UPSERT` or :attr:`EventChange.DELETE`.
+    :type action: str
+    """
+    EventChange.objects.bulk_create(
+        EventChange(event_id=pk, action=action) for pk in event_ids)
+
+
+def sequence_changes():
+    """
+    Numbers the committed change log entries that have no number yet.
+
+    Runs before every sync rather than after every write, so edits do not
+    pay for it. The counter row is locked first, so two callers number one
+    after the other and each sees the entries the other committed.
+    """
+    if not EventChange.objects.filter(sequence__isnull=True).exists():
+        return
+    with transaction.atomic():
+        # A no-op update takes the row lock before anything is read.
+        ChangeSequence.objects.filter(pk=1).update(last=F('last'))
+        counter, _ = ChangeSequence.objects.get_or_create(pk=1)
+        pending = (EventChange.objects.filter(sequence__isnull=True)
+                   .aggregate(first=Min('id'), last=Max('id')))
+        if pending['first'] is None:
+            return
+        # Shifting the ids keeps their order within the batch in one
+        # statement; the gaps left by uncommitted ids are harmless.
+        offset = counter.last + 1 - pending['first']
+        (EventChange.objects
+         .filter(sequence__isnull=True,
+                 id__range=(pending['first'], pending['last']))
+         .update(sequence=F('id') + offset))
+        counter.last = pending['last'] + offset
+        counter.save(update_fields=['last'])
+
+
+def changes_since(since: int, limit: int, columns: list):
+    """
+    Collects the changes after a sync token.
+
+    Several entries for one event are collapsed into its latest state:
+    events that still exist are returned as upserts with their current
+    values, the rest as tombstones.
+
+    :param since: The client's sync token (0 for a full sync).
+    :type since: int
+    :param limit: Maximum number of log entries to consume.
+    :type limit: int
+    :param columns: Database columns of the event fields to return.
+    :type columns: list
+
+    :returns: A tuple ``(upserts, deletes, next_token, more)`` where
+              upserts are ``values_list`` rows with the event id last.
+    :rtype: tuple
+    """
+    sequence_changes()
+    entries = list(EventChange.objects
+                   .filter(sequence__gt=since)
+                   .order_by('sequence')
+                   .values_list('sequence', 'event_id')[:limit + 1])
+    more = len(entries) > limit
+    entries = entries[:limit]
+    if not entries:
+        return [], [], since, False
+
+    event_ids = {event_id for _, event_id in entries}
+    upserts = list(Event.objects.filter(pk__in=event_ids)
+                   .order_by('id')
+                   .values_list(*columns, 'id'))
+    present = {row[-1] for row in upserts}
+    deletes = sorted(event_ids - present)
+    return upserts, deletes, entries[-1][0], more
+
+
+def compact_changes(older_than: timedelta) -> int:
+    """
+    Removes superseded change log entries older than ``older_than``.
+
+    Only the newest entry of each event is needed to bring any client up
+    to date, so older entries for the same event are dropped. Recent
+    entries are left alone while clients are still catching up on them.
+
+    :param older_than: Minimum age of entries eligible for removal.
+    :type older_than: timedelta
+
+    :returns: The number of entries removed.
+    :rtype: int
+    """
+    cutoff = timezone.now() - older_than
+    latest = (EventChange.objects.values('event_id')
+              .annotate(latest=Max('id')).values('latest'))
+    deleted, _ = (EventChange.objects
+                  .filter(changed_at__lt=cutoff)
+                  .exclude(id__in=latest)
+                  .delete())
+    return deleted
@@ -0,0 +1,41 @@
+"""
+Django template backend that times template rendering.
+
+Only templates rendered through the backend are timed, such as those of
+:func:`~django.shortcuts.render`. Their includes and parent templates are
+rendered inside them, so nothing is counted twice.
+"""
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from .middleware import current_timer
+
+
+class TimedTemplate(Template):
+    """
+    Adds its render time to the current request's timer.
+    """
+
+    def render(self, context=None, request=None):
+        timer = current_timer.get()
+        if timer is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timer.template_duration += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    The standard Django template backend, with timed templates.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
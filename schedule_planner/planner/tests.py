@@ -1,3 +1,1960 @@
-from django.test import TestCase
+import csv
+import io
+import itertools
+import os
+import re
+import tempfile
+from datetime import date, time, timedelta
+from urllib.parse import urlencode
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import Http404, HttpResponse
+from django.test import (AsyncRequestFactory, RequestFactory, SimpleTestCase,
+                         TestCase, override_settings, skipUnlessDBFeature)
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from . import api, async_views, views
+from .assignment import auto_assign, plan_assignments
+from .availability import busy_engineer_ids, rebuild_bitmaps
+from .benchmarking import generate_schedule
+from .bulk import BulkEditError, bulk_delete_events, bulk_update_events
+from .cache import (ENGINEER_CHOICES_KEY, get_engineer_choices,
+                    get_schedule_version)
+from .cloning import clone_schedule
+from .forms import EventForm
+from .importing import import_events, iter_csv_rows
+from .models import (ContactMessage, EngineerUnavailability, Event,
+                     EventChange, RecurrenceException, RecurringEvent,
+                     SoundEngineer)
+from .pagination import (apaginate_keyset, encode_cursor, paginate_keyset,
+                         row_key)
+from .querybudget import QueryBudgetExceeded, query_budget
+from .recurrence import occurrence_dates
+from .search import search_event_ids, search_events
+from .slowqueries import explain
+from .stats import rebuild_stats, summarise
+
+# Tables that must never be read with a full scan by a view.
+INDEXED_TABLES = ('planner_event', 'planner_contactmessage')
+
+# Events seeded for the plan tests; enough for SQLite's planner to prefer
+# an index wherever one applies once ANALYZE has run.
+PLAN_TEST_EVENTS = 5000
+
+_ALIAS = re.compile(r'"(\w+)" (\w+)\b')
+_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?(?: USING (.*))?$')
+_LIMIT = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+
+
+class QueryPlanAssertions:
+    """
+    Test case mixin checking the plans of the queries a block runs.
+
+    Every ``SELECT`` is captured with its parameters and explained after
+    the block; a plan that scans the whole of one of
+    :data:`INDEXED_TABLES` fails the test. Walking an index in order is
+    allowed when the query stops early with ``LIMIT`` (keyset pages), as
+    is reading a covering index alone (changelist counts).
+    """
+
+    def capture_queries(self):
+        return _CapturedQueries()
+
+    def full_scans(self, queries) -> list:
+        """
+        Returns ``(table, sql, plan)`` for each query that scans a watched
+        table in full.
+
+        :rtype: list
+        """
+        scans = []
+        for sql, params in queries:
+            aliases = {alias: table for table, alias in _ALIAS.findall(sql)
+                       if table in INDEXED_TABLES}
+            plan = explain(connection, sql, params)
+            for line in plan:
+                match = _SCAN.match(line.strip())
+                if not match:
+                    continue
+                using = match.group(3) or ''
+                if (using.startswith('COVERING INDEX')
+                        or (using.startswith('INDEX') and _LIMIT.search(sql))):
+                    continue
+                name = match.group(2) or match.group(1)
+                table = aliases.get(name, name)
+                if table in INDEXED_TABLES:
+                    scans.append((table, sql, plan))
+        return scans
+
+    def assertNoFullScans(self, queries, label=''):
+        scans = self.full_scans(queries)
+        if scans:
+            self.fail(f"{label}: full scan of " + "\n\n".join(
+                f"{table}:\n  {sql}\n  plan: {plan}"
+                for table, sql, plan in scans))
+
+
+class _CapturedQueries:
+    """
+    Execute wrapper collecting the ``SELECT`` statements run in a block.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self._context = None
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._context = connection.execute_wrapper(self)
+        self._context.__enter__()
+        return self.queries
+
+    def __exit__(self, *exc_info):
+        return self._context.__exit__(*exc_info)
+
+
+@skipUnlessDBFeature('supports_explaining_query_execution')
+class ViewQueryPlanTests(QueryPlanAssertions, TestCase):
+    """
+    The queries behind the planner views and admin changelists use indexes
+    on the event and contact message tables at a realistic data volume.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_schedule(PLAN_TEST_EVENTS, engineers=100,
+                          messages=PLAN_TEST_EVENTS // 5, seed=7)
+        cls.user = User.objects.create_superuser(
+            'planner', 'planner@example.com', 'planner-password')
+        cls.event = Event.objects.filter(
+            sound_engineer__isnull=False).order_by('id').first()
+        cls.engineer = cls.event.sound_engineer
+        cls.message = ContactMessage.objects.order_by('id').first()
+        with connection.cursor() as cursor:
+            # Let the planner see the data volume, as it would in
+            # production.
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertViewUsesIndexes(self, url, data=None, status=200):
+        with self.capture_queries() as queries:
+            response = self.client.get(url, data)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, status, url)
+        self.assertNoFullScans(queries, label=url)
+
+    def test_schedule_pages(self):
+        today = timezone.localdate()
+        iso_year, iso_week, _ = today.isocalendar()
+        for url in (
+                reverse('planner:index'),
+                reverse('planner:month_calendar',
+                        args=[today.year, today.month]),
+                reverse('planner:week_calendar', args=[iso_year, iso_week]),
+        ):
+            with self.subTest(url=url):
+                self.assertViewUsesIndexes(url)
+        self.assertViewUsesIndexes(
+            reverse('planner:month_calendar', args=[today.year, today.month]),
+            {'venue': self.event.venue})
+
+    def test_search(self):
+        self.assertViewUsesIndexes(reverse('planner:search'),
+                                   {'q': self.event.performer})
+
+    def test_event_forms(self):
+        self.assertViewUsesIndexes(reverse('planner:add_event'))
+        self.assertViewUsesIndexes(reverse('planner:add_event'), {
+            'date': self.event.date.isoformat(), 'start': '20:00',
+            'end': '23:00'})
+        self.assertViewUsesIndexes(reverse('planner:edit_event',
+                                           args=[self.event.pk]))
+        self.assertViewUsesIndexes(reverse('planner:delete',
+                                           args=[self.event.pk]))
+        self.assertViewUsesIndexes(reverse('planner:bulk_edit'),
+                                   {'ids': [self.event.pk]})
+
+    def test_event_edit_post(self):
+        with self.capture_queries() as queries:
+            response = self.client.post(
+                reverse('planner:edit_event', args=[self.event.pk]), {
+                    'date': (self.event.date
+                             + timedelta(days=1)).isoformat(),
+                    'performance_time_start': '10:00',
+                    'performance_time_end': '10:30',
+                    'venue': self.event.venue,
+                    'performer': self.event.performer,
+                    'sound_engineer': ''})
+        self.assertEqual(response.status_code, 302)
+        self.assertNoFullScans(queries, label='edit_event POST')
+
+    def test_reports(self):
+        self.assertViewUsesIndexes(reverse('planner:dashboard'))
+        self.assertViewUsesIndexes(reverse('planner:utilisation'))
+
+    def test_exports_and_feeds(self):
+        start = timezone.localdate().isoformat()
+        self.assertViewUsesIndexes(reverse('planner:export_csv'),
+                                   {'start_date': start})
+        self.assertViewUsesIndexes(reverse('planner:export_ics'),
+                                   {'engineer': self.engineer.pk})
+        self.assertViewUsesIndexes(reverse('planner:engineer_feed',
+                                           args=[self.engineer.feed_token]))
+
+    def test_api(self):
+        self.assertViewUsesIndexes(reverse('planner:api_events'),
+                                   {'start_date': date.today().isoformat()})
+        self.assertViewUsesIndexes(reverse('planner:api_changes'))
+        self.assertViewUsesIndexes(reverse('planner:api_engineer_search'),
+                                   {'q': 'eng'})
+        self.assertViewUsesIndexes(reverse('planner:api_free_engineers'), {
+            'date': self.event.date.isoformat(), 'start': '20:00',
+            'end': '23:00'})
+
+    def test_messages(self):
+        self.assertViewUsesIndexes(reverse('planner:display_message',
+                                           args=[self.message.pk]))
+
+    def test_admin_changelists(self):
+        for model in (Event, ContactMessage, SoundEngineer):
+            url = reverse(f'admin:planner_{model._meta.model_name}_'
+                          f'changelist')
+            with self.subTest(url=url):
+                self.assertViewUsesIndexes(url)
+        self.assertViewUsesIndexes(
+            reverse('admin:planner_contactmessage_changelist'),
+            {'is_read__exact': '0'})
+        self.assertViewUsesIndexes(
+            reverse('admin:planner_event_changelist'),
+            {'date__year': self.event.date.year,
+             'date__month': self.event.date.month})
+
+
+class AsyncViewTests(TestCase):
+    """
+    The async views serve the same pages as their synchronous versions.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_schedule(300, engineers=5, messages=3, seed=11)
+        cls.user = User.objects.create_superuser(
+            'planner', 'planner@example.com', 'planner-password')
+        cls.engineer = SoundEngineer.objects.order_by('id').first()
+        rule = RecurringEvent.objects.create(
+            venue='Courtyard', performer='House Band',
+            sound_engineer=cls.engineer, start_date=timezone.localdate(),
+            until=timezone.localdate() + timedelta(days=60),
+            performance_time_start=time(18), performance_time_end=time(19))
+        RecurrenceException.objects.create(
+            recurring_event=rule, date=rule.start_date + timedelta(days=7),
+            cancelled=True)
+        cls.message = ContactMessage.objects.order_by('id').first()
+
+    def sync_request(self, path, data=None, **headers):
+        request = RequestFactory().get(path, data, headers=headers)
+        request.user = self.user
+        return request
+
+    def async_request(self, path, data=None, **headers):
+        request = AsyncRequestFactory().get(path, data, headers=headers)
+        request.user = self.user
+
+        async def auser():
+            return self.user
+        request.auser = auser
+        return request
+
+    def sync_body(self, view, request, *args) -> bytes:
+        response = view(request, *args)
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.content
+
+    async def body(self, response) -> bytes:
+        if not response.streaming:
+            return response.content
+        return b''.join([chunk async for chunk in
+                         response.streaming_content])
+
+    async def test_exports_match_sync_views(self):
+        for sync_view, async_view in ((views.export_csv,
+                                       async_views.export_csv),
+                                      (views.export_ics,
+                                       async_views.export_ics)):
+            for data in ({}, {'engineer': self.engineer.pk},
+                         {'start_date': timezone.localdate().isoformat()}):
+                with self.subTest(view=sync_view.__name__, data=data):
+                    expected = await sync_to_async(self.sync_body)(
+                        sync_view, self.sync_request('/', data))
+                    response = await async_view(
+                        self.async_request('/', data))
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(await self.body(response), expected)
+
+    async def test_export_rejects_invalid_filters(self):
+        response = await async_views.export_csv(
+            self.async_request('/', {'engineer': 0}))
+        self.assertEqual(response.status_code, 400)
+
+    async def test_index_revalidates(self):
+        response = await async_views.index(self.async_request('/'))
+        self.assertEqual(response.status_code, 200)
+        first = await Event.objects.filter(
+            date__gte=timezone.localdate()).afirst()
+        self.assertContains(response, first.performer)
+        # The table fragment is cached now, and an unchanged schedule is
+        # not sent again.
+        again = await async_views.index(self.async_request('/'))
+        self.assertEqual(again.content, response.content)
+        unchanged = await async_views.index(self.async_request(
+            '/', if_none_match=response['ETag']))
+        self.assertEqual(unchanged.status_code, 304)
+
+    async def test_feed_and_message(self):
+        path = f'/feeds/{self.engineer.feed_token}.ics'
+        expected = await sync_to_async(self.sync_body)(
+            views.engineer_feed, self.sync_request(path),
+            self.engineer.feed_token)
+        response = await async_views.engineer_feed(
+            self.async_request(path), self.engineer.feed_token)
+        self.assertEqual(response.content, expected)
+        unchanged = await async_views.engineer_feed(
+            self.async_request(path, if_none_match=response['ETag']),
+            self.engineer.feed_token)
+        self.assertEqual(unchanged.status_code, 304)
+        with self.assertRaises(Http404):
+            await async_views.engineer_feed(self.async_request(path),
+                                            'unknown')
+
+        response = await async_views.display_message(
+            self.async_request('/'), self.message.pk)
+        self.assertContains(response, self.message.name)
+        with self.assertRaises(Http404):
+            await async_views.display_message(self.async_request('/'), 0)
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Each view guarded by :func:`~planner.querybudget.query_budget` stays
+    within its budget on its most expensive path. Budgets raise under the
+    test runner, so going over fails the request.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            'planner', 'planner@example.com', 'planner-password')
+        cls.engineers = SoundEngineer.objects.bulk_create(
+            SoundEngineer(name=f"Engineer {index}",
+                          contact_email=f"engineer{index}@example.com",
+                          contact_number=f"0700000000{index}")
+            for index in range(2))
+        today = timezone.localdate()
+        for offset in range(-3, 4):
+            for hour in (18, 21):
+                Event.objects.create(
+                    date=today + timedelta(days=offset),
+                    performance_time_start=time(hour),
+                    performance_time_end=time(hour + 2),
+                    venue=f"Venue {hour}", performer=f"Band {offset}",
+                    sound_engineer=cls.engineers[hour % 2])
+        # Booking an engineer, so clash checks expand its occurrences.
+        RecurringEvent.objects.create(
+            venue='Courtyard', performer='House Band',
+            sound_engineer=cls.engineers[0],
+            start_date=today - timedelta(days=10),
+            until=today + timedelta(days=30),
+            performance_time_start=time(12), performance_time_end=time(13))
+        cls.event = Event.objects.filter(date=today).order_by('id').first()
+
+    def setUp(self):
+        # Start from a cold cache so the fragments are rendered.
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def assertWithinBudget(self, method, url, data=None, status=200):
+        view = resolve(url.split('?')[0]).func
+        self.assertTrue(hasattr(view, 'query_budget'),
+                        f"{url} has no query budget")
+        response = getattr(self.client, method)(url, data)
+        self.assertEqual(response.status_code, status, url)
+        return response
+
+    def test_budgets_raise_in_tests(self):
+        @query_budget(0)
+        def view(request):
+            return HttpResponse(str(Event.objects.count()))
+        with self.assertRaises(QueryBudgetExceeded):
+            view(RequestFactory().get('/'))
+
+    @override_settings(PLANNER_PAGE_SIZE=4)
+    def test_schedule(self):
+        response = self.assertWithinBudget('get', reverse('planner:index'))
+        page = response.context['page']
+        self.assertWithinBudget('get', reverse('planner:index'),
+                                {'after': page.next_cursor})
+        self.assertWithinBudget('get', reverse('planner:index'),
+                                {'before': page.previous_cursor})
+
+    def test_calendars(self):
+        today = timezone.localdate()
+        iso_year, iso_week, _ = today.isocalendar()
+        self.assertWithinBudget('get', reverse(
+            'planner:month_calendar', args=[today.year, today.month]),
+            {'venue': 'Venue 18'})
+        self.assertWithinBudget('get', reverse(
+            'planner:week_calendar', args=[iso_year, iso_week]))
+
+    def test_search(self):
+        self.assertWithinBudget('get', reverse('planner:search'),
+                                {'q': 'Band', 'page': 2})
+
+    def test_edit_event(self):
+        url = reverse('planner:edit_event', args=[self.event.pk])
+        self.assertWithinBudget('get', url)
+        # Moving to another day with another engineer touches both
+        # engineers' feeds and bitmaps and both days' statistics.
+        self.assertWithinBudget('post', url, {
+            'date': (self.event.date + timedelta(days=10)).isoformat(),
+            'performance_time_start': '10:00',
+            'performance_time_end': '11:00',
+            'venue': 'Elsewhere', 'performer': 'Moved',
+            'sound_engineer': self.engineers[0].pk}, status=302)
+
+    def test_bulk_edit(self):
+        ids = list(Event.objects.filter(date=self.event.date)
+                   .values_list('pk', flat=True))
+        url = reverse('planner:bulk_edit')
+        self.assertWithinBudget('get',
+                                f"{url}?{urlencode({'ids': ids}, True)}")
+        self.assertWithinBudget('post', url, {
+            'ids': ids, 'action': 'update', 'shift_days': 20,
+            'sound_engineer': self.engineers[0].pk}, status=302)
+
+    def test_delete(self):
+        url = reverse('planner:delete', args=[self.event.pk])
+        self.assertWithinBudget('get', url)
+        self.assertWithinBudget('post', url, status=302)
+
+    def test_reports(self):
+        self.assertWithinBudget('get', reverse('planner:dashboard'))
+        self.assertWithinBudget('get', reverse('planner:utilisation'),
+                                {'format': 'csv'})
+
+    async def test_async_schedule(self):
+        request = AsyncRequestFactory().get('/')
+
+        async def auser():
+            return self.user
+        request.auser = auser
+        response = await async_views.index(request)
+        self.assertEqual(response.status_code, 200)
+
+
+_contact_numbers = itertools.count(1)
+
+
+def create_event(day, start, end, venue='Main Hall', performer='Band',
+                 engineer=None) -> Event:
+    return Event.objects.create(date=day, performance_time_start=start,
+                                performance_time_end=end, venue=venue,
+                                performer=performer, sound_engineer=engineer)
+
+
+def create_engineer(name) -> SoundEngineer:
+    return SoundEngineer.objects.create(
+        name=name, contact_email=f"{name.lower()}@example.com",
+        contact_number=f"07{next(_contact_numbers):09d}")
+
+
+class EventFormConflictTests(TestCase):
+    """
+    The event form refuses to double-book an engineer or a venue.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = date(2030, 5, 10)
+        cls.engineer = create_engineer('Ada')
+        cls.late_set = create_event(cls.day, time(23), time(2),
+                                    venue='Cellar', engineer=cls.engineer)
+
+    def form(self, day, start, end, venue='Main Hall', engineer=None,
+             instance=None):
+        return EventForm({
+            'date': day.isoformat(), 'performance_time_start': start,
+            'performance_time_end': end, 'venue': venue, 'performer': 'Act',
+            'sound_engineer': engineer.pk if engineer else ''},
+            instance=instance)
+
+    def test_overnight_set_blocks_engineer_next_day(self):
+        form = self.form(self.day + timedelta(days=1), '01:00', '03:00',
+                         engineer=self.engineer)
+        self.assertFalse(form.is_valid())
+        self.assertIn('sound_engineer', form.errors)
+        self.assertNotIn('venue', form.errors)
+
+    def test_overnight_set_blocks_venue(self):
+        form = self.form(self.day, '22:00', '23:30', venue='Cellar')
+        self.assertFalse(form.is_valid())
+        self.assertIn('venue', form.errors)
+
+    def test_back_to_back_sets_are_allowed(self):
+        form = self.form(self.day + timedelta(days=1), '02:00', '04:00',
+                         venue='Cellar', engineer=self.engineer)
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_event_does_not_clash_with_itself(self):
+        form = self.form(self.day, '23:30', '02:00', venue='Cellar',
+                         engineer=self.engineer, instance=self.late_set)
+        self.assertTrue(form.is_valid(), form.errors)
+
+
+class ResidencyConflictTests(TestCase):
+    """
+    Residency occurrences count as bookings in the clash and availability
+    checks.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = date(2030, 9, 6)
+        cls.ada = create_engineer('Ada')
+        # Friday nights in the Cellar, running past midnight.
+        cls.rule = RecurringEvent.objects.create(
+            venue='Cellar', performer='Residents', sound_engineer=cls.ada,
+            start_date=cls.day, until=cls.day + timedelta(days=55),
+            frequency=RecurringEvent.WEEKLY, weekdays='FR',
+            performance_time_start=time(21), performance_time_end=time(1))
+        cls.friday = cls.day + timedelta(days=7)
+
+    def form(self, start, end, venue='Main Hall', engineer=None):
+        return EventForm({
+            'date': self.friday.isoformat(), 'performance_time_start': start,
+            'performance_time_end': end, 'venue': venue, 'performer': 'Act',
+            'sound_engineer': engineer.pk if engineer else ''})
+
+    def test_form_rejects_occurrence(self):
+        form = self.form('22:00', '23:00', engineer=self.ada)
+        self.assertFalse(form.is_valid())
+        self.assertIn('sound_engineer', form.errors)
+        form = self.form('18:00', '21:30', venue='Cellar')
+        self.assertFalse(form.is_valid())
+        self.assertIn('venue', form.errors)
+
+    def test_cancelled_occurrence_frees_the_slot(self):
+        self.assertIn(self.ada.pk,
+                      busy_engineer_ids(self.friday, time(22), time(23)))
+        RecurrenceException.objects.create(
+            recurring_event=self.rule, date=self.friday, cancelled=True)
+        self.assertTrue(self.form('22:00', '23:00', venue='Cellar',
+                                  engineer=self.ada).is_valid())
+        self.assertNotIn(self.ada.pk,
+                         busy_engineer_ids(self.friday, time(22), time(23)))
+
+    def test_bitmaps_follow_the_residency(self):
+        saturday = self.friday + timedelta(days=1)
+        self.assertIn(self.ada.pk,
+                      busy_engineer_ids(saturday, time(0), time(2)))
+        self.rule.sound_engineer = None
+        self.rule.save()
+        self.assertNotIn(self.ada.pk,
+                         busy_engineer_ids(saturday, time(0), time(2)))
+        rebuild_bitmaps()
+        self.assertNotIn(self.ada.pk,
+                         busy_engineer_ids(saturday, time(0), time(2)))
+
+    def test_auto_assign_skips_occurrence(self):
+        create_event(self.friday, time(23), time(23, 30))
+        result = plan_assignments(self.friday, self.friday)
+        self.assertEqual(result.assigned_count, 0)
+        self.assertEqual(result.unassigned_count, 1)
+
+    def test_find_conflicts_reports_occurrence(self):
+        create_event(self.friday, time(20), time(22), engineer=self.ada)
+        out = io.StringIO()
+        call_command('find_conflicts', stdout=out)
+        self.assertIn(f"overlaps #r{self.rule.pk}-{self.friday:%Y%m%d}",
+                      out.getvalue())
+        self.assertIn("1 conflict(s) found.", out.getvalue())
+
+
+class UnavailabilityTests(TestCase):
+    """
+    Declared unavailability is enforced by the event form and auto-assign,
+    not only by the engineer dropdown.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = date(2030, 11, 1)
+        cls.bob = create_engineer('Bob')
+        EngineerUnavailability.objects.create(
+            sound_engineer=cls.bob, date=cls.day, start_time=time(22),
+            end_time=time(2), reason="Travelling")
+        cls.early_set = create_event(cls.day, time(18), time(20),
+                                     engineer=cls.bob)
+
+    def form(self, day, start, end, instance=None):
+        return EventForm({
+            'date': day.isoformat(), 'performance_time_start': start,
+            'performance_time_end': end, 'venue': 'Main Hall',
+            'performer': 'Act', 'sound_engineer': self.bob.pk},
+            instance=instance)
+
+    def test_form_rejects_unavailable_engineer(self):
+        form = self.form(self.day + timedelta(days=1), '01:00', '01:30')
+        self.assertFalse(form.is_valid())
+        self.assertIn('unavailable', form.errors['sound_engineer'][0])
+        self.assertTrue(self.form(self.day + timedelta(days=1), '02:00',
+                                  '03:00').is_valid())
+
+    def test_form_accepts_own_booking(self):
+        form = self.form(self.day, '18:30', '20:30', instance=self.early_set)
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_auto_assign_skips_unavailable_engineer(self):
+        event = create_event(self.day + timedelta(days=1), time(0, 30),
+                             time(1))
+        result = plan_assignments(event.date, event.date)
+        self.assertEqual(result.unassigned, [event])
+        ada = create_engineer('Ada')
+        result = plan_assignments(event.date, event.date)
+        self.assertEqual([(planned.pk, engineer) for planned, engineer
+                          in result.assigned], [(event.pk, ada)])
+
+
+class BulkEditTests(TestCase):
+    """
+    Bulk edits move events across midnight and refuse the same clashes as
+    the event form.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = date(2030, 12, 6)
+        cls.ada = create_engineer('Ada')
+        cls.late_set = create_event(cls.day, time(23, 30), time(0, 30),
+                                    venue='Cellar', engineer=cls.ada)
+
+    def test_shift_across_midnight(self):
+        self.assertEqual(bulk_update_events([self.late_set.pk],
+                                            shift=timedelta(hours=1)), 1)
+        self.late_set.refresh_from_db()
+        saturday = self.day + timedelta(days=1)
+        self.assertEqual((self.late_set.date,
+                          self.late_set.performance_time_start,
+                          self.late_set.performance_time_end),
+                         (saturday, time(0, 30), time(1, 30)))
+        self.assertNotIn(self.ada.pk,
+                         busy_engineer_ids(self.day, time(23), time(23, 59)))
+        self.assertIn(self.ada.pk,
+                      busy_engineer_ids(saturday, time(1), time(2)))
+
+    def test_shift_into_overnight_clash(self):
+        create_event(self.day + timedelta(days=1), time(1), time(2),
+                     engineer=self.ada)
+        with self.assertRaises(BulkEditError) as raised:
+            bulk_update_events([self.late_set.pk], shift=timedelta(hours=1))
+        self.assertIn('Sound engineer clash', raised.exception.messages[0])
+        self.late_set.refresh_from_db()
+        self.assertEqual(self.late_set.date, self.day)
+
+    def test_shift_into_unavailability(self):
+        EngineerUnavailability.objects.create(
+            sound_engineer=self.ada, date=self.day + timedelta(days=7))
+        with self.assertRaises(BulkEditError) as raised:
+            bulk_update_events([self.late_set.pk], shift=timedelta(days=7))
+        self.assertIn('unavailable', raised.exception.messages[0])
+        # Clone refuses the same copy.
+        result = clone_schedule(self.day, self.day,
+                                self.day + timedelta(days=7), commit=False)
+        self.assertEqual(result.conflict_count, 1)
+
+    def test_shift_is_bounded(self):
+        self.client.force_login(User.objects.create_superuser(
+            'planner', 'planner@example.com', 'planner-password'))
+        for data in ({'shift_days': 10 ** 10}, {'shift_days': 3000000},
+                     {'shift_minutes': 24 * 60 + 1}):
+            with self.subTest(data=data):
+                response = self.client.post(reverse('planner:bulk_edit'), {
+                    'ids': [self.late_set.pk], 'action': 'update', **data})
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.context['form'].errors)
+
+    def test_delete_maintains_derived_data_once(self):
+        other = create_event(self.day, time(20), time(21), venue='Loft',
+                             engineer=self.ada)
+        ids = [self.late_set.pk, other.pk]
+        self.assertEqual(bulk_delete_events(ids), 2)
+        self.assertFalse(Event.objects.filter(pk__in=ids).exists())
+        self.assertEqual(EventChange.objects.filter(
+            event_id__in=ids, action=EventChange.DELETE).count(), 2)
+        self.assertEqual(summarise(self.day, self.day)['by_venue'], [])
+        self.assertNotIn(self.ada.pk,
+                         busy_engineer_ids(self.day, time(20), time(1)))
+
+    def test_shift_past_the_calendar(self):
+        last = create_event(date.max, time(20), time(22))
+        with self.assertRaises(BulkEditError) as raised:
+            bulk_update_events([last.pk], shift=timedelta(days=1))
+        self.assertIn('cannot be moved that far',
+                      raised.exception.messages[0])
+
+
+class CloneScheduleTests(TestCase):
+    """
+    Cloning copies what fits at the target and skips venue clashes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            'planner', 'planner@example.com', 'planner-password')
+        cls.day = date(2031, 1, 6)
+        cls.week_later = cls.day + timedelta(days=7)
+        create_event(cls.day, time(20), time(22), venue='Cellar',
+                     performer='Blocked')
+        create_event(cls.day, time(20), time(22), venue='Main Hall',
+                     performer='Copied')
+        create_event(cls.week_later, time(21), time(23), venue='Cellar',
+                     performer='Already there')
+
+    def test_venue_conflict_is_skipped(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('planner:clone_schedule'), {
+            'start_date': self.day.isoformat(),
+            'end_date': self.day.isoformat(),
+            'target_start': self.week_later.isoformat(),
+            'align_weekdays': 'on'})
+        self.assertEqual(response.status_code, 200)
+        result = response.context['result']
+        self.assertEqual([copy.performer for _, copy in result.copies],
+                         ['Copied'])
+        self.assertEqual([copy.performer for _, copy, _ in result.conflicts],
+                         ['Blocked'])
+        self.assertIn('Cellar already has Already there',
+                      result.conflicts[0][2])
+        self.assertEqual(sorted(Event.objects.filter(date=self.week_later)
+                                .values_list('performer', flat=True)),
+                         ['Already there', 'Copied'])
+
+    def test_view_refuses_non_superusers(self):
+        self.client.force_login(User.objects.create_user('office',
+                                                         is_staff=True))
+        response = self.client.get(reverse('planner:clone_schedule'))
+        self.assertEqual(response.status_code, 403)
+
+
+class AutoAssignTests(TestCase):
+    """
+    Automatic assignment fills free slots without double-booking anyone.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = date(2030, 6, 14)
+        cls.ada = create_engineer('Ada')
+        cls.bob = create_engineer('Bob')
+        cls.fixed = create_event(cls.day, time(19), time(23), venue='Cellar',
+                                 engineer=cls.ada)
+
+    def test_fixed_booking_is_respected(self):
+        event = create_event(self.day, time(20), time(21))
+        result = auto_assign(self.day, self.day)
+        self.assertEqual(result.assigned_count, 1)
+        event.refresh_from_db()
+        self.assertEqual(event.sound_engineer, self.bob)
+        self.fixed.refresh_from_db()
+        self.assertEqual(self.fixed.sound_engineer, self.ada)
+
+    def test_overnight_booking_is_respected(self):
+        create_event(self.day, time(23), time(3), venue='Loft',
+                     engineer=self.bob)
+        event = create_event(self.day + timedelta(days=1), time(1), time(2))
+        result = auto_assign(self.day + timedelta(days=1),
+                             self.day + timedelta(days=1))
+        self.assertEqual(result.assigned_count, 1)
+        event.refresh_from_db()
+        self.assertEqual(event.sound_engineer, self.ada)
+
+    def test_workload_is_balanced_and_overflow_reported(self):
+        day = self.day + timedelta(days=7)
+        for venue in ('One', 'Two', 'Three'):
+            create_event(day, time(18), time(20), venue=venue)
+        create_event(day, time(21), time(22), venue='One')
+        result = auto_assign(day, day, commit=False)
+        self.assertEqual(result.unassigned_count, 1)
+        counts = {}
+        for _, engineer in result.assigned:
+            counts[engineer.name] = counts.get(engineer.name, 0) + 1
+        self.assertEqual(counts, {'Ada': 2, 'Bob': 1})
+        # A preview saves nothing.
+        self.assertFalse(Event.objects.filter(
+            date=day, sound_engineer__isnull=False).exists())
+
+    def test_view_refuses_users_without_permission(self):
+        user = User.objects.create_user('visitor', password='visitor-pass')
+        self.client.force_login(user)
+        response = self.client.get(reverse('planner:auto_assign'))
+        self.assertEqual(response.status_code, 403)
+
+
+class GenerateScheduleTests(TestCase):
+    """
+    Generated data is visible to the cached roster straight away.
+    """
+
+    def test_roster_includes_generated_engineers(self):
+        create_engineer('Ada')
+        self.assertEqual(len(get_engineer_choices()), 1)
+        generate_schedule(10, engineers=3, messages=0, seed=1)
+        self.assertEqual(len(get_engineer_choices()), 4)
+
+
+class ImportEventsTests(TestCase):
+    """
+    Imports keep valid rows and report the line and reason of every
+    rejected one.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.engineer = create_engineer('Ada')
+        create_event(date(2030, 7, 1), time(20), time(23), venue='Cellar')
+
+    def import_csv(self, text, batch_size=500):
+        return import_events(iter_csv_rows(io.StringIO(text, newline='')),
+                             batch_size=batch_size)
+
+    def test_valid_and_invalid_rows(self):
+        result = self.import_csv(
+            "Date,Performance_Time_Start,Performance_Time_End,Venue,"
+            "Performer,Sound_Engineer,Event_Notes\n"
+            "2030-07-02,20:00,22:00,Loft,Trio,ada,\n"
+            "2030-07-02,not a time,22:00,Loft,Duo,,\n"
+            "2030-07-03,20:00,22:00,Loft,Solo,Nobody,\n")
+        self.assertEqual(result.created, 1)
+        self.assertEqual([line for line, _ in result.errors], [3, 4])
+        self.assertIn('performance_time_start', result.errors[0][1])
+        self.assertIn('Unknown sound engineer', result.errors[1][1])
+        self.assertEqual(Event.objects.get(performer='Trio').sound_engineer,
+                         self.engineer)
+
+    def test_clashing_rows_are_rejected(self):
+        result = self.import_csv(
+            "date,performance_time_start,performance_time_end,venue,"
+            "performer,sound_engineer,event_notes\n"
+            "2030-07-01,22:00,23:30,Cellar,Clash,,\n"
+            "2030-07-05,21:00,01:00,Loft,First,Ada,\n"
+            "2030-07-06,00:30,02:00,Attic,Second,Ada,\n"
+            "2030-07-06,02:00,03:00,Attic,Third,Ada,\n", batch_size=2)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([line for line, _ in result.errors], [2, 4])
+        self.assertIn('Venue Cellar', result.errors[0][1])
+        self.assertIn('Sound engineer Ada', result.errors[1][1])
+        self.assertEqual(set(Event.objects.filter(date__gte=date(2030, 7, 5))
+                             .values_list('performer', flat=True)),
+                         {'First', 'Third'})
+
+    def test_unavailable_engineer_is_rejected(self):
+        EngineerUnavailability.objects.create(
+            sound_engineer=self.engineer, date=date(2030, 7, 9),
+            start_time=time(23), end_time=time(1), reason="Travelling")
+        result = self.import_csv(
+            "date,performance_time_start,performance_time_end,venue,"
+            "performer,sound_engineer,event_notes\n"
+            "2030-07-09,19:00,21:00,Loft,Early,Ada,\n"
+            "2030-07-09,22:00,00:30,Loft,Late,Ada,\n"
+            "2030-07-10,00:30,02:00,Attic,After midnight,Ada,\n")
+        self.assertEqual(result.created, 1)
+        self.assertEqual([line for line, _ in result.errors], [3, 4])
+        self.assertIn('Sound engineer Ada is unavailable',
+                      result.errors[0][1])
+        self.assertTrue(Event.objects.filter(performer='Early').exists())
+
+    def test_failed_import_keeps_committed_batches(self):
+        header = ("date,performance_time_start,performance_time_end,venue,"
+                  "performer,sound_engineer,event_notes\n")
+        lines = ''.join(f"2030-08-01,20:00,22:00,Room {index},Act,,\n"
+                        for index in range(1000))
+        upload = SimpleUploadedFile(
+            'events.csv', (header + lines).encode() + b'\xff\xfe,bad\n',
+            content_type='text/csv')
+        version = get_schedule_version()
+        self.client.force_login(User.objects.create_superuser(
+            'planner', 'planner@example.com', 'planner-password'))
+        response = self.client.post(reverse('planner:import_events'),
+                                    {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        created = Event.objects.filter(date=date(2030, 8, 1)).count()
+        # The first batch was committed before the bad bytes were decoded.
+        self.assertEqual(created, 500)
+        self.assertContains(response, f"Imported {created} event(s)")
+        self.assertContains(response, "must be UTF-8 encoded")
+        self.assertNotEqual(get_schedule_version(), version)
+
+
+class EngineerApiTests(TestCase):
+    """
+    The engineer list only shows contact details to staff.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.engineer = create_engineer('Ada')
+        cls.url = reverse('planner:api_engineers')
+
+    def test_contact_fields_need_staff(self):
+        self.client.force_login(User.objects.create_user('client'))
+        fields = {'fields': 'id,name,contact_email,contact_number'}
+        self.assertEqual(self.client.get(self.url, fields).status_code, 400)
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['results'],
+                         [{'id': self.engineer.pk, 'name': 'Ada'}])
+
+        self.client.force_login(User.objects.create_user('office',
+                                                         is_staff=True))
+        response = self.client.get(self.url, fields)
+        self.assertEqual(response.json()['results'][0]['contact_email'],
+                         'ada@example.com')
+
+
+class EventSyncTests(TestCase):
+    """
+    The change feed never skips an entry that commits after a later one.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('client')
+        cls.url = reverse('planner:api_changes')
+
+    def sync(self, since):
+        response = self.client.get(self.url, {'since': since,
+                                              'fields': 'id,performer'})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_slow_transaction_is_not_skipped(self):
+        self.client.force_login(self.user)
+        first = create_event(date(2030, 8, 1), time(18), time(19),
+                             performer='First')
+        token = self.sync(0)['next']
+
+        # A slow transaction inserts its entry, then a quick one inserts
+        # the next id and commits while the slow one is still open.
+        slow = create_event(date(2030, 8, 2), time(18), time(19),
+                            performer='Slow')
+        quick = create_event(date(2030, 8, 3), time(18), time(19),
+                             performer='Quick')
+        EventChange.objects.filter(event_id__in=[slow.pk, quick.pk]).delete()
+        base = EventChange.objects.get(event_id=first.pk).pk
+        EventChange.objects.create(id=base + 2, event_id=quick.pk,
+                                   action=EventChange.UPSERT)
+        changes = self.sync(token)
+        self.assertEqual([row['performer'] for row in changes['upserts']],
+                         ['Quick'])
+        token = changes['next']
+
+        # The slow transaction commits after the client has synced.
+        EventChange.objects.create(id=base + 1, event_id=slow.pk,
+                                   action=EventChange.UPSERT)
+        changes = self.sync(token)
+        self.assertEqual([row['performer'] for row in changes['upserts']],
+                         ['Slow'])
+        self.assertGreater(changes['next'], token)
+        self.assertEqual(self.sync(changes['next'])['upserts'], [])
+
+
+class CalendarTests(TestCase):
+    """
+    Calendars outside the range of dates are not found.
+    """
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('client'))
+
+    def test_month_range(self):
+        for year, month in ((1, 1), (9999, 12), (2030, 13), (2030, 0)):
+            with self.subTest(year=year, month=month):
+                response = self.client.get(reverse(
+                    'planner:month_calendar', args=[year, month]))
+                self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('planner:month_calendar',
+                                           args=[2, 1]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_week_range(self):
+        for year, week in ((1, 1), (9999, 52), (2030, 54)):
+            with self.subTest(year=year, week=week):
+                response = self.client.get(reverse(
+                    'planner:week_calendar', args=[year, week]))
+                self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('planner:week_calendar',
+                                           args=[9998, 52]))
+        self.assertEqual(response.status_code, 200)
+
+
+class DashboardStatsTests(TestCase):
+    """
+    The dashboard totals follow edits and deletions, and only superusers
+    see them.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.day = date(2030, 10, 7)
+        cls.user = User.objects.create_superuser(
+            'planner', 'planner@example.com', 'planner-password')
+        cls.ada = create_engineer('Ada')
+        cls.first = create_event(cls.day, time(20), time(22), venue='Cellar',
+                                 engineer=cls.ada)
+        cls.second = create_event(cls.day + timedelta(days=1), time(23),
+                                  time(1))
+
+    def totals(self):
+        summary = summarise(self.day, self.day + timedelta(days=13))
+        return ({row['venue']: (row['events'], row['minutes'])
+                 for row in summary['by_venue']},
+                {row['sound_engineer__name']: (row['events'], row['minutes'])
+                 for row in summary['by_engineer']},
+                summary['unassigned'])
+
+    def assertTotals(self, venues, engineers, unassigned):
+        self.assertEqual(self.totals(), (venues, engineers, unassigned))
+        # The running totals match a rebuild from the events.
+        rebuild_stats()
+        self.assertEqual(self.totals(), (venues, engineers, unassigned))
+
+    def test_totals_follow_edit_and_delete(self):
+        self.client.force_login(self.user)
+        self.assertTotals({'Cellar': (1, 120), 'Main Hall': (1, 120)},
+                          {'Ada': (1, 120), None: (1, 120)}, 1)
+
+        response = self.client.post(
+            reverse('planner:edit_event', args=[self.second.pk]), {
+                'date': (self.day + timedelta(days=8)).isoformat(),
+                'performance_time_start': '21:00',
+                'performance_time_end': '21:30',
+                'venue': 'Cellar', 'performer': 'Moved',
+                'sound_engineer': self.ada.pk})
+        self.assertEqual(response.status_code, 302)
+        self.assertTotals({'Cellar': (2, 150)}, {'Ada': (2, 150)}, 0)
+
+        response = self.client.post(reverse('planner:delete',
+                                            args=[self.first.pk]))
+        self.assertEqual(response.status_code, 302)
+        self.assertTotals({'Cellar': (1, 30)}, {'Ada': (1, 30)}, 0)
+
+    def test_dashboard_needs_superuser(self):
+        url = reverse('planner:dashboard')
+        self.client.force_login(User.objects.create_user('office',
+                                                         is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_utilisation_needs_superuser(self):
+        url = reverse('planner:utilisation')
+        self.client.force_login(User.objects.create_user('office',
+                                                         is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.user)
+        response = self.client.get(url, {'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+
+
+class MetricsViewTests(TestCase):
+    """
+    /metrics is served for the scraper's token and to superusers, whatever
+    address the request comes from.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(METRICS_DIR=directory.name,
+                                            METRICS_TOKEN='scraper-token'))
+        self.directory = directory.name
+
+    def test_local_address_needs_token(self):
+        url = reverse('planner:metrics')
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='127.0.0.1')
+                         .status_code, 403)
+        self.assertEqual(self.client.get(
+            url, HTTP_AUTHORIZATION='Bearer wrong-token').status_code, 403)
+        response = self.client.get(
+            url, HTTP_AUTHORIZATION='Bearer scraper-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'],
+                         'text/plain; version=0.0.4; charset=utf-8')
+
+    def test_no_token_configured(self):
+        url = reverse('planner:metrics')
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get(
+                url, HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+            self.client.force_login(User.objects.create_superuser(
+                'planner', 'planner@example.com', 'planner-password'))
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_clear_metrics(self):
+        for name in ('worker-1.json', 'worker-2.json.tmp', 'notes.txt'):
+            with open(os.path.join(self.directory, name), 'w') as file:
+                file.write('{}')
+        out = io.StringIO()
+        call_command('clear_metrics', stdout=out)
+        self.assertIn('Removed 2 metrics files', out.getvalue())
+        self.assertEqual(os.listdir(self.directory), ['notes.txt'])
+
+
+class KeysetPaginationTests(TestCase):
+    """
+    Walking the schedule forwards, backwards and back again shows every
+    event exactly once, including events that share a date and start time.
+    """
+
+    PAGE_SIZE = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            'planner', 'planner@example.com', 'planner-password')
+        day = timezone.localdate() + timedelta(days=1)
+        # Acts 1 to 4 share a key apart from their id.
+        times = [(day, time(18))] + [(day, time(20))] * 4 + [
+            (day + timedelta(days=1), time(19)),
+            (day + timedelta(days=1), time(21))]
+        cls.events = [create_event(event_date, start, time(23),
+                                   performer=f'Act {index}')
+                      for index, (event_date, start) in enumerate(times)]
+        # Before the window start, so only reachable by going back.
+        create_event(day - timedelta(days=30), time(20), time(22),
+                     performer='Act past')
+
+    def cursor(self, index):
+        return encode_cursor(*row_key(self.events[index]))
+
+    def names(self, page):
+        return [event.performer for event in page]
+
+    def paginate(self, **cursors):
+        return paginate_keyset(Event.objects.all(), self.PAGE_SIZE,
+                               start_date=timezone.localdate(), **cursors)
+
+    def test_forward_pages(self):
+        page = self.paginate()
+        self.assertEqual(self.names(page), ['Act 0', 'Act 1', 'Act 2'])
+        page = self.paginate(after=page.next_cursor)
+        self.assertEqual(self.names(page), ['Act 3', 'Act 4', 'Act 5'])
+        page = self.paginate(after=page.next_cursor)
+        self.assertEqual(self.names(page), ['Act 6'])
+        self.assertFalse(page.has_next)
+
+    def test_backward_then_forward(self):
+        page = self.paginate(after=self.cursor(2))
+        self.assertEqual(self.names(page), ['Act 3', 'Act 4', 'Act 5'])
+        back = self.paginate(before=page.previous_cursor)
+        self.assertEqual(self.names(back), ['Act 0', 'Act 1', 'Act 2'])
+        self.assertEqual(self.names(self.paginate(after=back.next_cursor)),
+                         ['Act 3', 'Act 4', 'Act 5'])
+        # The first page of the window can still go back to past events.
+        earliest = self.paginate(before=back.previous_cursor)
+        self.assertEqual(self.names(earliest), ['Act past'])
+        self.assertFalse(earliest.has_previous)
+        self.assertEqual(
+            self.names(self.paginate(after=earliest.next_cursor)),
+            ['Act 0', 'Act 1', 'Act 2'])
+
+    def test_backward_between_equal_keys(self):
+        page = self.paginate(before=self.cursor(4))
+        self.assertEqual(self.names(page), ['Act 1', 'Act 2', 'Act 3'])
+        self.assertEqual(self.names(self.paginate(after=page.next_cursor)),
+                         ['Act 4', 'Act 5', 'Act 6'])
+
+    async def test_async_pages_match(self):
+        for cursors in ({}, {'after': self.cursor(2)},
+                        {'before': self.cursor(4)},
+                        {'before': self.cursor(0)}):
+            with self.subTest(cursors=cursors):
+                expected = await sync_to_async(self.paginate)(**cursors)
+                page = await apaginate_keyset(
+                    Event.objects.all(), self.PAGE_SIZE,
+                    start_date=timezone.localdate(), **cursors)
+                self.assertEqual(self.names(page), self.names(expected))
+                self.assertEqual(page.next_cursor, expected.next_cursor)
+                self.assertEqual(page.previous_cursor,
+                                 expected.previous_cursor)
+
+    def walk(self, get):
+        """
+        Follows the Next links to the end and the Previous links back,
+        returning the performers shown on each page.
+        """
+        content = get({})
+        seen = [re.findall(r'<td>(Act \w+)</td>', content)]
+        for direction in ('after', 'before'):
+            while link := re.search(rf'href="\?{direction}=([^"]+)"',
+                                    content):
+                content = get({direction: link.group(1)})
+                seen.append(re.findall(r'<td>(Act \w+)</td>', content))
+        return seen
+
+    def test_views_round_trip(self):
+        self.client.force_login(self.user)
+
+        def get(query):
+            return self.client.get(reverse('planner:index'),
+                                   query).content.decode()
+
+        expected = [['Act 0', 'Act 1', 'Act 2'], ['Act 3', 'Act 4', 'Act 5'],
+                    ['Act 6'], ['Act 3', 'Act 4', 'Act 5'],
+                    ['Act 0', 'Act 1', 'Act 2'], ['Act past']]
+        with self.settings(PLANNER_PAGE_SIZE=self.PAGE_SIZE):
+            self.assertEqual(self.walk(get), expected)
+
+            def async_get(query):
+                request = AsyncRequestFactory().get('/', query)
+                request.user = self.user
+
+                async def auser():
+                    return self.user
+                request.auser = auser
+                return async_to_sync(async_views.index)(
+                    request).content.decode()
+
+            self.assertEqual(self.walk(async_get), expected)
+
+
+class SearchTests(TestCase):
+    """
+    Search ranks performer matches above venue and notes matches, and the
+    index follows every write.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        day = date(2031, 4, 12)
+        cls.ada = create_engineer('Ada')
+        cls.in_notes = Event.objects.create(
+            date=day, performance_time_start=time(18),
+            performance_time_end=time(19), venue='Loft', performer='Duo',
+            event_notes='Quiet set down by the harbour')
+        cls.at_venue = create_event(day, time(20), time(21),
+                                    venue='Harbour Bar', performer='Trio',
+                                    engineer=cls.ada)
+        cls.by_performer = create_event(day, time(22), time(23),
+                                        venue='Cellar',
+                                        performer='Harbour Lights')
+
+    def ids(self, query):
+        return search_event_ids(query, limit=10)
+
+    def test_ranking(self):
+        self.assertEqual(self.ids('harbour'), [self.by_performer.pk,
+                                               self.at_venue.pk,
+                                               self.in_notes.pk])
+
+    def test_matches_prefixes_and_every_word(self):
+        self.assertEqual(self.ids('HARB'), self.ids('harbour'))
+        self.assertEqual(self.ids('quiet harbour'), [self.in_notes.pk])
+        self.assertEqual(self.ids('harbour bar'), [self.at_venue.pk])
+        # Index query syntax in the input is dropped, not interpreted.
+        self.assertEqual(self.ids('"trio" OR'), [])
+        self.assertEqual(self.ids('-*'), [])
+
+    def test_results_carry_the_engineer(self):
+        results, has_next = search_events('trio', page=1, page_size=10)
+        self.assertFalse(has_next)
+        self.assertEqual([(row['performer'], row['sound_engineer__name'])
+                          for row in results], [('Trio', 'Ada')])
+
+    def test_index_follows_writes(self):
+        added = create_event(date(2031, 4, 13), time(20), time(21),
+                             performer='Lantern Choir')
+        self.assertEqual(self.ids('lantern'), [added.pk])
+        added.performer = 'Beacon Choir'
+        added.save()
+        self.assertEqual(self.ids('lantern'), [])
+        self.assertEqual(self.ids('beacon'), [added.pk])
+        Event.objects.filter(pk=added.pk).update(event_notes='Lantern lit')
+        self.assertEqual(self.ids('lantern'), [added.pk])
+        added.delete()
+        self.assertEqual(self.ids('beacon'), [])
+        self.assertEqual(self.ids('choir'), [])
+
+    def test_pages(self):
+        self.client.force_login(User.objects.create_user('visitor'))
+        url = reverse('planner:search')
+        response = self.client.get(url, {'q': 'harbour'})
+        self.assertEqual([row['id'] for row in response.context['results']],
+                         self.ids('harbour'))
+        with self.settings(PLANNER_PAGE_SIZE=2):
+            response = self.client.get(url, {'q': 'harbour', 'page': 2})
+            self.assertEqual(
+                [row['id'] for row in response.context['results']],
+                [self.in_notes.pk])
+            # Pages past the deepest one served are empty, not errors.
+            response = self.client.get(url, {'q': 'harbour',
+                                              'page': 10 ** 20})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.context['results'], [])
+
+
+class ResidencyScheduleTests(TestCase):
+    """
+    The schedule pages merge in residency occurrences, each shown once
+    whichever way the pages are walked.
+    """
+
+    PAGE_SIZE = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            'planner', 'planner@example.com', 'planner-password')
+        cls.today = today = timezone.localdate()
+        cls.engineer = create_engineer('Ada')
+        cls.rule = rule = RecurringEvent.objects.create(
+            venue='Courtyard', performer='House', frequency='DAILY',
+            sound_engineer=cls.engineer,
+            start_date=today - timedelta(days=2),
+            until=today + timedelta(days=4),
+            performance_time_start=time(20), performance_time_end=time(21))
+        RecurrenceException.objects.create(
+            recurring_event=rule, date=today + timedelta(days=2),
+            cancelled=True)
+        RecurrenceException.objects.create(
+            recurring_event=rule, date=today + timedelta(days=3),
+            cancelled=False, performance_time_start=time(18),
+            performance_time_end=time(19))
+        for offset, start, performer in ((0, time(20), 'Act'),
+                                         (1, time(19), 'Act'),
+                                         (3, time(21), 'Act'),
+                                         (-1, time(12), 'Past')):
+            create_event(today + timedelta(days=offset), start, time(23),
+                         performer=performer)
+
+    def names(self, page):
+        return [f"{row.performer} {(row.date - self.today).days}"
+                for row in page]
+
+    def paginate(self, **cursors):
+        return paginate_keyset(Event.objects.all(), self.PAGE_SIZE,
+                               start_date=self.today, occurrences=True,
+                               **cursors)
+
+    def test_walk_forward_and_back(self):
+        pages = [self.paginate()]
+        while pages[-1].has_next:
+            pages.append(self.paginate(after=pages[-1].next_cursor))
+        self.assertEqual([self.names(page) for page in pages], [
+            ['Act 0', 'House 0'], ['Act 1', 'House 1'],
+            ['House 3', 'Act 3'], ['House 4']])
+        back = [pages[-1]]
+        while back[-1].has_previous:
+            back.append(self.paginate(before=back[-1].previous_cursor))
+        self.assertEqual([self.names(page) for page in back[1:]], [
+            ['House 3', 'Act 3'], ['Act 1', 'House 1'],
+            ['Act 0', 'House 0'], ['Past -1', 'House -1'], ['House -2']])
+        self.assertEqual(
+            self.names(self.paginate(after=back[-2].next_cursor)),
+            ['Act 0', 'House 0'])
+
+    async def test_async_pages_match(self):
+        first = await sync_to_async(self.paginate)()
+        for cursors in ({}, {'after': first.next_cursor},
+                        {'before': first.previous_cursor},
+                        {'before': first.next_cursor}):
+            with self.subTest(cursors=cursors):
+                expected = await sync_to_async(self.paginate)(**cursors)
+                page = await apaginate_keyset(
+                    Event.objects.all(), self.PAGE_SIZE,
+                    start_date=self.today, occurrences=True, **cursors)
+                self.assertEqual(self.names(page), self.names(expected))
+                self.assertEqual(page.next_cursor, expected.next_cursor)
+                self.assertEqual(page.previous_cursor,
+                                 expected.previous_cursor)
+
+    def test_earlier_occurrences_keep_previous_link(self):
+        Event.objects.filter(performer='Past').delete()
+        # The page, the residencies and their exceptions, then nothing
+        # earlier among the events, so the occurrences are checked.
+        with self.assertNumQueries(6):
+            page = self.paginate()
+        self.assertTrue(page.has_previous)
+        RecurringEvent.objects.update(start_date=self.today)
+        self.assertFalse(self.paginate().has_previous)
+
+    def test_index_shows_occurrences(self):
+        self.client.force_login(self.user)
+        with self.settings(PLANNER_PAGE_SIZE=self.PAGE_SIZE):
+            response = self.client.get(reverse('planner:index'))
+        self.assertEqual(self.names(response.context['page']),
+                         ['Act 0', 'House 0'])
+        self.assertContains(response, 'title="Recurring"', count=1)
+        event = Event.objects.get(date=self.today)
+        self.assertContains(response, reverse('planner:edit_event',
+                                              args=[event.pk]))
+        self.assertContains(response, 'name="ids"', count=1)
+
+    def test_api_lists_occurrences(self):
+        self.client.force_login(self.user)
+        url = reverse('planner:api_events')
+        data = {'limit': 2, 'start_date': self.today.isoformat(),
+                'fields': 'id,date,performer,sound_engineer'}
+        results = []
+        while True:
+            body = self.client.get(url, data).json()
+            results += body['results']
+            if not body['next']:
+                break
+            data['after'] = body['next']
+        self.assertEqual(
+            [(row['performer'], row['date']) for row in results],
+            [(performer, (self.today + timedelta(days=offset)).isoformat())
+             for performer, offset in (('Act', 0), ('House', 0),
+                                       ('Act', 1), ('House', 1),
+                                       ('House', 3), ('Act', 3),
+                                       ('House', 4))])
+        self.assertEqual(results[1], {
+            'id': f'r{self.rule.pk}-{self.today:%Y%m%d}',
+            'date': self.today.isoformat(), 'performer': 'House',
+            'sound_engineer': self.engineer.pk})
+        self.assertIsNone(results[0]['sound_engineer'])
+
+
+class OccurrenceDateTests(SimpleTestCase):
+    """
+    Rules expand to the right dates however the window cuts them.
+    """
+
+    def dates(self, frequency, start, until, interval=1, weekdays='',
+              window=(date.min, date.max)):
+        return list(occurrence_dates(start, until, frequency, interval,
+                                     weekdays, *window))
+
+    def test_daily_interval_from_mid_window(self):
+        start = date(2030, 1, 1)
+        self.assertEqual(
+            self.dates('DAILY', start, date(2030, 1, 31), interval=3,
+                       window=(date(2030, 1, 5), date(2030, 1, 13))),
+            [date(2030, 1, 7), date(2030, 1, 10), date(2030, 1, 13)])
+
+    def test_until_is_inclusive(self):
+        self.assertEqual(
+            self.dates('DAILY', date(2030, 1, 1), date(2030, 1, 3)),
+            [date(2030, 1, 1), date(2030, 1, 2), date(2030, 1, 3)])
+        self.assertEqual(self.dates('DAILY', date(2030, 1, 3),
+                                    date(2030, 1, 1)), [])
+
+    def test_weekly_byday(self):
+        # 2030-01-02 is a Wednesday; the Monday of that week is skipped.
+        self.assertEqual(
+            self.dates('WEEKLY', date(2030, 1, 2), date(2030, 1, 14),
+                       weekdays='MO,FR,WE'),
+            [date(2030, 1, 2), date(2030, 1, 4), date(2030, 1, 7),
+             date(2030, 1, 9), date(2030, 1, 11), date(2030, 1, 14)])
+        # Without BYDAY the rule repeats on its first weekday.
+        self.assertEqual(
+            self.dates('WEEKLY', date(2030, 1, 2), date(2030, 1, 20)),
+            [date(2030, 1, 2), date(2030, 1, 9), date(2030, 1, 16)])
+
+    def test_weekly_interval_keeps_its_weeks(self):
+        expected = [date(2030, 1, 1), date(2030, 1, 4), date(2030, 1, 15),
+                    date(2030, 1, 18), date(2030, 1, 29)]
+        self.assertEqual(
+            self.dates('WEEKLY', date(2030, 1, 1), date(2030, 1, 31),
+                       interval=2, weekdays='TU,FR'), expected)
+        # A window opening in an off week still lands on the rule's weeks.
+        self.assertEqual(
+            self.dates('WEEKLY', date(2030, 1, 1), date(2030, 1, 31),
+                       interval=2, weekdays='TU,FR',
+                       window=(date(2030, 1, 8), date(2030, 1, 20))),
+            expected[2:4])
+
+    def test_monthly_skips_short_months(self):
+        self.assertEqual(
+            self.dates('MONTHLY', date(2030, 1, 31), date(2030, 8, 31)),
+            [date(2030, 1, 31), date(2030, 3, 31), date(2030, 5, 31),
+             date(2030, 7, 31), date(2030, 8, 31)])
+        self.assertEqual(
+            self.dates('MONTHLY', date(2031, 1, 29), date(2032, 3, 1),
+                       interval=13),
+            [date(2031, 1, 29), date(2032, 2, 29)])
+
+    def test_monthly_interval_from_mid_window(self):
+        self.assertEqual(
+            self.dates('MONTHLY', date(2030, 1, 15), date(2031, 1, 15),
+                       interval=4,
+                       window=(date(2030, 3, 1), date(2030, 12, 31))),
+            [date(2030, 5, 15), date(2030, 9, 15)])
+
+
+class ScheduleCacheTests(TestCase):
+    """
+    Every write that changes the schedule replaces its version, so the
+    cached tables are rendered again.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            'planner', 'planner@example.com', 'planner-password')
+        cls.today = timezone.localdate()
+        cls.engineer = create_engineer('Ada')
+        cls.event = create_event(cls.today, time(20), time(23),
+                                 performer='Band', engineer=cls.engineer)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertBumps(self, write):
+        version = get_schedule_version()
+        write()
+        self.assertNotEqual(get_schedule_version(), version)
+
+    def test_writes_bump_the_version(self):
+        event = Event.objects.get(pk=self.event.pk)
+        event.performer = 'Renamed'
+        self.assertBumps(event.save)
+        self.assertBumps(lambda: create_event(self.today, time(12),
+                                              time(13)))
+        self.assertBumps(event.delete)
+
+        rule = RecurringEvent(
+            venue='Courtyard', performer='House',
+            frequency=RecurringEvent.DAILY, start_date=self.today,
+            until=self.today + timedelta(days=7),
+            performance_time_start=time(18), performance_time_end=time(19))
+        self.assertBumps(rule.save)
+        exception = RecurrenceException(recurring_event=rule,
+                                        date=self.today)
+        self.assertBumps(exception.save)
+        self.assertBumps(exception.delete)
+        self.assertBumps(rule.delete)
+
+        engineer = SoundEngineer(name='Grace',
+                                 contact_email='grace@example.com',
+                                 contact_number='0')
+        self.assertBumps(engineer.save)
+        engineer.name = 'Grace H.'
+        self.assertBumps(engineer.save)
+        self.assertBumps(engineer.delete)
+
+    def assertTableFollowsWrites(self, user):
+        self.client.force_login(user)
+        url = reverse('planner:index')
+        self.assertContains(self.client.get(url), 'Band')
+        # A queryset update sends no signals, so the cached table is
+        # served as it was.
+        Event.objects.update(performer='Stale')
+        self.assertContains(self.client.get(url), 'Band')
+
+        event = Event.objects.get(pk=self.event.pk)
+        event.performer = 'Fresh'
+        event.save()
+        self.assertContains(self.client.get(url), 'Fresh')
+
+        self.engineer.name = 'Ada L.'
+        self.engineer.save()
+        self.assertContains(self.client.get(url), 'Ada L.')
+
+        RecurringEvent.objects.create(
+            venue='Courtyard', performer='House',
+            frequency=RecurringEvent.DAILY, start_date=self.today,
+            until=self.today, performance_time_start=time(21),
+            performance_time_end=time(22))
+        self.assertContains(self.client.get(url), 'House')
+
+        event.delete()
+        self.assertNotContains(self.client.get(url), 'Fresh')
+
+    def test_superuser_table_follows_writes(self):
+        self.assertTableFollowsWrites(self.user)
+
+    def test_client_table_follows_writes(self):
+        self.assertTableFollowsWrites(User.objects.create_user('client'))
+
+
+class ConditionalGetTests(TestCase):
+    """
+    The schedule and message pages answer revalidation of an unchanged
+    page with a 304, and send the page again once it changes.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(
+            'planner', 'planner@example.com', 'planner-password')
+        cls.event = create_event(timezone.localdate(), time(20), time(23))
+        cls.message = ContactMessage.objects.create(
+            name='Ada', email='ada@example.com', message='Hello')
+
+    def setUp(self):
+        cache.clear()
+
+    def sync_get(self, view, *args, **headers):
+        request = RequestFactory().get('/', headers=headers)
+        request.user = self.user
+        return view(request, *args)
+
+    def async_get(self, view, *args, **headers):
+        request = AsyncRequestFactory().get('/', headers=headers)
+        request.user = self.user
+
+        async def auser():
+            return self.user
+        request.auser = auser
+        return async_to_sync(view)(request, *args)
+
+    def assertRevalidates(self, get, change):
+        response = get()
+        self.assertEqual(response.status_code, 200)
+        etag, modified = response['ETag'], response['Last-Modified']
+        for headers in ({'if_none_match': etag},
+                        {'if_modified_since': modified}):
+            with self.subTest(headers=headers):
+                self.assertEqual(get(**headers).status_code, 304)
+
+        change()
+        # A changed ETag wins over a Last-Modified date in the same second.
+        response = get(if_none_match=etag, if_modified_since=modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(get(if_none_match=response['ETag']).status_code,
+                         304)
+
+    def change_event(self):
+        self.event.performer = 'Changed'
+        self.event.save()
+
+    def change_message(self):
+        self.message.is_read = True
+        self.message.save()
+
+    def test_schedule(self):
+        for get, view in ((self.sync_get, views.index),
+                          (self.async_get, async_views.index)):
+            with self.subTest(view=view.__module__):
+                self.assertRevalidates(
+                    lambda **headers: get(view, **headers),
+                    self.change_event)
+
+    def test_schedule_follows_deletes(self):
+        for get, view in ((self.sync_get, views.index),
+                          (self.async_get, async_views.index)):
+            with self.subTest(view=view.__module__):
+                extra = create_event(timezone.localdate(), time(12),
+                                     time(13))
+                self.assertRevalidates(
+                    lambda **headers: get(view, **headers), extra.delete)
+
+    def test_message(self):
+        for get, view in ((self.sync_get, views.display_message),
+                          (self.async_get, async_views.display_message)):
+            with self.subTest(view=view.__module__):
+                self.assertRevalidates(
+                    lambda **headers: get(view, self.message.pk, **headers),
+                    self.change_message)
+
+
+class ExportTests(TestCase):
+    """
+    The CSV and iCalendar exports stream the filtered schedule, residency
+    occurrences included, in schedule order.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('client')
+        cls.day = day = timezone.localdate() + timedelta(days=1)
+        cls.ada = create_engineer('Ada')
+        cls.grace = create_engineer('Grace')
+        cls.opener = create_event(day, time(20), time(22, 30),
+                                  performer='Opener', engineer=cls.ada)
+        cls.opener.event_notes = 'Bring cables, two mics'
+        cls.opener.save()
+        cls.late = create_event(day, time(23), time(1, 30),
+                                venue='Courtyard', performer='Late Set',
+                                engineer=cls.grace)
+        cls.late.event_notes = 'Encore ' * 20
+        cls.late.save()
+        create_event(day + timedelta(days=1), time(19), time(20),
+                     performer='Other')
+        cls.rule = RecurringEvent.objects.create(
+            venue='Courtyard', performer='House', sound_engineer=cls.ada,
+            frequency=RecurringEvent.DAILY, start_date=day,
+            until=day + timedelta(days=1),
+            performance_time_start=time(18), performance_time_end=time(19))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def export(self, name, **filters):
+        response = self.client.get(reverse(f'planner:{name}'), filters)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode(), response
+
+    def csv_rows(self, **filters):
+        body, _ = self.export('export_csv', **filters)
+        header, *rows = csv.reader(io.StringIO(body))
+        self.assertEqual(header, ['date', 'performance_time_start',
+                                  'performance_time_end', 'venue',
+                                  'performer', 'sound_engineer',
+                                  'event_notes'])
+        return rows
+
+    def test_csv(self):
+        day, next_day = self.day.isoformat(), (self.day
+                                               + timedelta(days=1)).isoformat()
+        self.assertEqual(self.csv_rows(), [
+            [day, '18:00', '19:00', 'Courtyard', 'House', 'Ada', ''],
+            [day, '20:00', '22:30', 'Main Hall', 'Opener', 'Ada',
+             'Bring cables, two mics'],
+            [day, '23:00', '01:30', 'Courtyard', 'Late Set', 'Grace',
+             'Encore ' * 20],
+            [next_day, '18:00', '19:00', 'Courtyard', 'House', 'Ada', ''],
+            [next_day, '19:00', '20:00', 'Main Hall', 'Other', '', ''],
+        ])
+
+    def test_filters(self):
+        def performers(**filters):
+            return [row[4] for row in self.csv_rows(**filters)]
+        self.assertEqual(performers(venue='Courtyard'),
+                         ['House', 'Late Set', 'House'])
+        self.assertEqual(performers(engineer=self.ada.pk),
+                         ['House', 'Opener', 'House'])
+        self.assertEqual(performers(start_date=self.day + timedelta(days=1)),
+                         ['House', 'Other'])
+        self.assertEqual(performers(end_date=self.day),
+                         ['House', 'Opener', 'Late Set'])
+        response = self.client.get(reverse('planner:export_csv'),
+                                   {'start_date': 'soon'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_ics(self):
+        body, response = self.export('export_ics', venue='Courtyard')
+        self.assertEqual(response['Content-Type'],
+                         'text/calendar; charset=utf-8')
+        self.assertIn('attachment; filename="schedule.ics"',
+                      response['Content-Disposition'])
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertTrue(body.endswith('END:VCALENDAR\r\n'))
+        self.assertTrue(all(len(line.encode()) <= 75
+                            for line in body.split('\r\n')))
+        events = body.split('BEGIN:VEVENT\r\n')[1:]
+        self.assertEqual(len(events), 3)
+        self.assertIn(f'UID:event-r{self.rule.pk}-{self.day:%Y%m%d}'
+                      f'@schedule-planner', events[0])
+        # The late set runs past midnight, so it ends the next day.
+        next_day = self.day + timedelta(days=1)
+        self.assertIn(f'UID:event-{self.late.pk}@schedule-planner',
+                      events[1])
+        self.assertIn(f'DTSTART:{self.day:%Y%m%d}T230000', events[1])
+        self.assertIn(f'DTEND:{next_day:%Y%m%d}T013000', events[1])
+        self.assertIn('X-SOUND-ENGINEER:Grace', events[1])
+        # Long lines are folded and unfold to the original text.
+        self.assertIn('DESCRIPTION:' + 'Encore ' * 20,
+                      events[1].replace('\r\n ', ''))
+
+    def test_ics_escapes_text(self):
+        body, _ = self.export('export_ics', venue='Main Hall',
+                              end_date=self.day)
+        self.assertIn('DESCRIPTION:Bring cables\\, two mics', body)
+
+
+class EngineerFeedTests(TestCase):
+    """
+    Each engineer's feed lists only their bookings, revalidates with one
+    query and changes only when their own bookings do.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        day = timezone.localdate() + timedelta(days=1)
+        cls.ada = create_engineer('Ada')
+        cls.grace = create_engineer('Grace')
+        create_event(day, time(20), time(22), performer='Opener',
+                     engineer=cls.ada)
+        create_event(timezone.localdate() - timedelta(days=60), time(20),
+                     time(22), performer='Long Ago', engineer=cls.ada)
+        cls.late = create_event(day, time(23), time(1), venue='Courtyard',
+                                performer='Late Set', engineer=cls.grace)
+        cls.rule = RecurringEvent.objects.create(
+            venue='Courtyard', performer='House', sound_engineer=cls.ada,
+            frequency=RecurringEvent.DAILY, start_date=day, until=day,
+            performance_time_start=time(18), performance_time_end=time(19))
+
+    def setUp(self):
+        cache.clear()
+
+    def feed(self, engineer, **headers):
+        return self.client.get(reverse('planner:engineer_feed',
+                                       args=[engineer.feed_token]),
+                               headers=headers)
+
+    def etag(self, engineer):
+        return self.feed(engineer)['ETag']
+
+    def test_unknown_token(self):
+        response = self.client.get(reverse('planner:engineer_feed',
+                                           args=['unknown']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_lists_own_bookings(self):
+        response = self.feed(self.ada)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'],
+                         'text/calendar; charset=utf-8')
+        self.assertContains(response, 'X-WR-CALNAME:Ada - bookings')
+        self.assertEqual(re.findall(r'SUMMARY:(.*)\r\n',
+                                    response.content.decode()),
+                         ['House', 'Opener'])
+
+    def test_revalidation_is_one_query(self):
+        url = reverse('planner:engineer_feed', args=[self.ada.feed_token])
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, headers={'if_none_match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_body_is_cached_per_version(self):
+        first = self.feed(self.ada).content
+        # A queryset update sends no signals and leaves the version alone.
+        Event.objects.update(performer='Stale')
+        self.assertEqual(self.feed(self.ada).content, first)
+
+    def test_only_affected_feeds_change(self):
+        ada, grace = self.etag(self.ada), self.etag(self.grace)
+        self.late.performer = 'Later Set'
+        self.late.save()
+        self.assertEqual(self.feed(self.ada, if_none_match=ada).status_code,
+                         304)
+        self.assertNotEqual(self.etag(self.grace), grace)
+
+        # A reassignment changes the feeds of both engineers.
+        grace = self.etag(self.grace)
+        self.late.sound_engineer = self.ada
+        self.late.save()
+        self.assertNotEqual(self.etag(self.grace), grace)
+        response = self.feed(self.ada, if_none_match=ada)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'SUMMARY:Later Set')
+
+    def test_residency_and_rename_change_the_feed(self):
+        ada = self.etag(self.ada)
+        RecurrenceException.objects.create(recurring_event=self.rule,
+                                           date=self.rule.start_date)
+        response = self.feed(self.ada, if_none_match=ada)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'SUMMARY:House')
+
+        ada = response['ETag']
+        self.ada.name = 'Ada L.'
+        self.ada.save()
+        response = self.feed(self.ada, if_none_match=ada)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'X-WR-CALNAME:Ada L. - bookings')
+
+
+class EngineerTypeaheadTests(TestCase):
+    """
+    The typeahead matches name prefixes whatever their case, and the
+    cached roster behind the event form follows every roster change.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('client')
+        cls.ada = create_engineer('Ada')
+        cls.adam = create_engineer('ADAM')
+        create_engineer('Nadia')
+        create_engineer('Grace')
+        cls.url = reverse('planner:api_engineer_search')
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, **params):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.json()['results']]
+
+    def test_prefix_ignores_case(self):
+        self.assertEqual(self.search(q='ad'), ['Ada', 'ADAM'])
+        self.assertEqual(self.search(q='  aDa '), ['Ada', 'ADAM'])
+        self.assertEqual(self.search(q='adam'), ['ADAM'])
+        self.assertEqual(self.search(q='dia'), [])
+        self.assertEqual(self.search(), ['Ada', 'ADAM', 'Grace', 'Nadia'])
+
+    def test_results_are_limited(self):
+        for number in range(api.TYPEAHEAD_LIMIT + 5):
+            create_engineer(f'Eng {number:02d}')
+        self.assertEqual(len(self.search(q='eng')), api.TYPEAHEAD_LIMIT)
+        self.assertEqual(self.search(q='eng', limit=3),
+                         ['Eng 00', 'Eng 01', 'Eng 02'])
+        self.assertEqual(len(self.search(limit=api.MAX_LIMIT + 1)),
+                         api.TYPEAHEAD_LIMIT + 9)
+
+    def test_slot_excludes_busy_engineers(self):
+        day = date(2030, 6, 1)
+        create_event(day, time(20), time(22), engineer=self.ada)
+        slot = {'q': 'ad', 'date': day.isoformat(), 'start': '21:00',
+                'end': '23:00'}
+        self.assertEqual(self.search(**slot), ['ADAM'])
+        self.assertEqual(self.search(**slot, keep=self.ada.pk),
+                         ['Ada', 'ADAM'])
+
+    def test_needs_login(self):
+        self.assertEqual(self.client.get(self.url, {'q': 'ad'}).status_code,
+                         401)
+
+    def test_choices_follow_roster_changes(self):
+        self.assertEqual([name for _, name in get_engineer_choices()],
+                         ['ADAM', 'Ada', 'Grace', 'Nadia'])
+        with self.assertNumQueries(0):
+            get_engineer_choices()
+
+        grace = create_engineer('Grace H.')
+        self.assertIn((grace.pk, 'Grace H.'), get_engineer_choices())
+        grace.name = 'Hopper'
+        grace.save()
+        self.assertIn((grace.pk, 'Hopper'), get_engineer_choices())
+        self.assertNotIn((grace.pk, 'Grace H.'), get_engineer_choices())
+        grace.delete()
+        self.assertNotIn(grace.pk, dict(get_engineer_choices()))
+
+        # The form offers the cached roster.
+        form = EventForm()
+        self.assertEqual(
+            [name for _, name in form.fields['sound_engineer'].choices][1:],
+            ['ADAM', 'Ada', 'Grace', 'Nadia'])
+
+    def test_choices_dropped_again_after_commit(self):
+        get_engineer_choices()
+        with self.captureOnCommitCallbacks(execute=True):
+            engineer = create_engineer('Zoe')
+            # A request reading the roster before the commit caches it
+            # without the new engineer ...
+            cache.set(ENGINEER_CHOICES_KEY, [])
+        # ... and the commit drops that copy.
+        self.assertIn((engineer.pk, 'Zoe'), get_engineer_choices())
@@ -1,23 +1,60 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
 
 app_name = 'planner'
 
+# The read-heavy pages have async versions for ASGI deployments.
+read_views = async_views if settings.PLANNER_ASYNC_VIEWS else views
+
 urlpatterns = [
     # READ
-    path('', views.index, name='index'),
+    path('', read_views.index, name='index'),
+    path('calendar/', views.calendar_view, name='calendar'),
+    path('calendar/<int:year>/<int:month>/', views.month_calendar,
+         name='month_calendar'),
+    path('calendar/<int:year>/week/<int:week>/', views.week_calendar,
+         name='week_calendar'),
+    path('search/', views.search_view, name='search'),
+    path('export.csv', read_views.export_csv, name='export_csv'),
+    path('export.ics', read_views.export_ics, name='export_ics'),
+    path('feeds/<str:token>.ics', read_views.engineer_feed,
+         name='engineer_feed'),
     # CREATE
     path('add/', views.add_event, name='add_event'),
+    # BULK CREATE
+    path('import/', views.import_events_view, name='import_events'),
     # EDIT
     path('edit/<int:pk>', views.edit_event, name="edit_event"),
+    # BULK EDIT / DELETE
+    path('bulk/', views.bulk_edit_view, name='bulk_edit'),
     # DELETE
     path('delete/<int:pk>', views.delete_view, name='delete'),
+    # Dashboard
+    path('dashboard/', views.dashboard_view, name='dashboard'),
+    path('dashboard/utilisation/', views.utilisation_view,
+         name='utilisation'),
+    # Automatic engineer assignment
+    path('auto-assign/', views.auto_assign_view, name='auto_assign'),
+    # Copy a stretch of the schedule
+    path('clone/', views.clone_schedule_view, name='clone_schedule'),
     # Conditions
     path('conditions/', views.conditions_view, name="conditions"),
     # Contact
     path('contact/', views.contact_view, name='contact'),
     # Messages
-    path('message/<int:pk>', views.display_message, name="display_message"),
+    path('message/<int:pk>', read_views.display_message,
+         name="display_message"),
+    # Prometheus metrics
+    path('metrics', views.metrics_view, name='metrics'),
+    # JSON API
+    path('api/events/', api.event_list, name='api_events'),
+    path('api/engineers/', api.engineer_list, name='api_engineers'),
+    path('api/engineers/free/', api.free_engineer_list,
+         name='api_free_engineers'),
+    path('api/engineers/search/', api.engineer_search,
+         name='api_engineer_search'),
+    path('api/changes/', api.event_changes, name='api_changes'),
     # Manage Event Engineers
     # path('event/<int:event_pk>/edit-engineer/',
     #      views.manage_event_engineer, name='manage_event_engineer')
@@ -0,0 +1,233 @@
+"""
+Sound engineer utilisation and workload report.
+
+The assigned events in a date range are read once as plain tuples and
+turned into NumPy arrays of minutes since the epoch, sorted by engineer and
+start. Every metric is then computed with array operations and per-engineer
+reductions, so the cost is a handful of passes over contiguous arrays
+rather than a Python loop per event. As elsewhere, a set that ends at or
+before its start time finishes on the following day.
+"""
+import csv
+from datetime import date, timedelta
+
+import numpy as np
+
+from django.db.models import CharField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .exporting import Echo
+from .models import Event, SoundEngineer
+
+MINUTES_PER_DAY = 24 * 60
+
+# Unix day 0 (1970-01-01) was a Thursday; shifting by three days makes
+# weeks start on Monday.
+EPOCH_WEEKDAY_OFFSET = 3
+
+# A set finishing later than this many minutes after the start of its day
+# counts as a late finish (i.e. after midnight).
+LATE_FINISH_MINUTES = MINUTES_PER_DAY
+
+# Changeovers between different venues closer than this are too tight to
+# travel between.
+TRAVEL_GAP_MINUTES = 60
+
+# Weeks covered by the report when no range is given, ending today.
+DEFAULT_REPORT_WEEKS = 12
+
+# Columns of the report, in CSV order.
+REPORT_COLUMNS = ('engineer', 'events', 'total_hours', 'mean_weekly_hours',
+                  'max_weekly_hours', 'longest_run_days', 'late_finishes',
+                  'tight_changeovers', 'overlaps')
+
+
+def default_range() -> tuple:
+    """
+    Returns the date range reported on by default: the last
+    :data:`DEFAULT_REPORT_WEEKS` weeks up to today.
+
+    :rtype: tuple
+    """
+    today = timezone.localdate()
+    return today - timedelta(weeks=DEFAULT_REPORT_WEEKS, days=-1), today
+
+
+def _clock_minutes(values) -> np.ndarray:
+    # Parse "HH:MM[:SS]" strings by viewing their characters as code
+    # points, avoiding a Python call per value.
+    digits = (np.asarray(values, dtype='U5').view(np.uint32)
+              .reshape(-1, 5).astype(np.int64) - ord('0'))
+    return ((digits[:, 0] * 10 + digits[:, 1]) * 60
+            + digits[:, 3] * 10 + digits[:, 4])
+
+
+def load_arrays(start_date: date, end_date: date) -> dict:
+    """
+    Reads assigned events in a date range into sorted NumPy arrays.
+
+    :param start_date: First date included.
+    :type start_date: date
+    :param end_date: Last date included.
+    :type end_date: date
+
+    :returns: ``engineer``, ``day`` (days since the epoch), ``start`` and
+              ``end`` (minutes since the epoch) and ``venue`` (category
+              codes) arrays, sorted by engineer and start.
+    :rtype: dict
+    """
+    # Dates and times are read as text and parsed by NumPy in bulk, which
+    # is far cheaper than building a date or time object per value.
+    rows = list(Event.objects
+                .filter(date__range=(start_date, end_date),
+                        sound_engineer__isnull=False)
+                .order_by()
+                .values_list('sound_engineer_id',
+                             Cast('date', CharField()),
+                             Cast('performance_time_start', CharField()),
+                             Cast('performance_time_end', CharField()),
+                             'venue'))
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return {'engineer': empty, 'day': empty, 'start': empty,
+                'end': empty, 'venue': empty}
+    engineers, dates, starts, ends, venues = zip(*rows)
+    engineer = np.asarray(engineers, dtype=np.int64)
+    day = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    start_clock = _clock_minutes(starts)
+    end_clock = _clock_minutes(ends)
+    # Sets ending at or before their start run past midnight.
+    end_clock += np.where(end_clock <= start_clock, MINUTES_PER_DAY, 0)
+    start = day * MINUTES_PER_DAY + start_clock
+    end = day * MINUTES_PER_DAY + end_clock
+    _, venue = np.unique(np.asarray(venues, dtype=object),
+                         return_inverse=True)
+
+    order = np.lexsort((start, engineer))
+    return {'engineer': engineer[order], 'day': day[order],
+            'start': start[order], 'end': end[order],
+            'venue': venue[order].astype(np.int64)}
+
+
+def _group_max(values: np.ndarray, groups: np.ndarray, size: int):
+    result = np.zeros(size, dtype=values.dtype)
+    np.maximum.at(result, groups, values)
+    return result
+
+
+def compute_metrics(arrays: dict, weeks_in_range: int) -> dict:
+    """
+    Computes the per-engineer workload metrics from :func:`load_arrays`.
+
+    :param arrays: Sorted event arrays.
+    :type arrays: dict
+    :param weeks_in_range: Number of weeks the range spans, used for the
+                           mean weekly hours so idle weeks count as zero.
+    :type weeks_in_range: int
+
+    :returns: ``engineer_ids`` plus one array per metric in
+              :data:`REPORT_COLUMNS`, aligned with the ids.
+    :rtype: dict
+    """
+    engineer, day = arrays['engineer'], arrays['day']
+    start, end, venue = arrays['start'], arrays['end'], arrays['venue']
+    engineer_ids, group = np.unique(engineer, return_inverse=True)
+    size = len(engineer_ids)
+
+    minutes = end - start
+    events = np.bincount(group, minlength=size)
+    total_minutes = np.bincount(group, weights=minutes, minlength=size)
+
+    # Hours per Monday-based week: sum each (engineer, week) pair, then
+    # take the busiest week of each engineer.
+    week = (day + EPOCH_WEEKDAY_OFFSET) // 7
+    pairs, pair_index = np.unique(np.stack([group, week]), axis=1,
+                                  return_inverse=True)
+    weekly_minutes = np.bincount(pair_index.ravel(), weights=minutes)
+    max_weekly_minutes = _group_max(weekly_minutes, pairs[0], size)
+
+    # Longest run of consecutive working days: a new run starts wherever
+    # the engineer changes or a day is skipped.
+    work_days = np.unique(np.stack([group, day]), axis=1)
+    breaks = np.ones(work_days.shape[1], dtype=bool)
+    breaks[1:] = ((np.diff(work_days[0]) != 0)
+                  | (np.diff(work_days[1]) != 1))
+    run_starts = np.flatnonzero(breaks)
+    run_lengths = np.diff(np.append(run_starts, work_days.shape[1]))
+    longest_run = _group_max(run_lengths, work_days[0][run_starts], size)
+
+    late = (end - day * MINUTES_PER_DAY) > LATE_FINISH_MINUTES
+    late_finishes = np.bincount(group, weights=late, minlength=size)
+
+    # Consecutive sets of the same engineer, in start order.
+    same_engineer = group[1:] == group[:-1]
+    gap = start[1:] - end[:-1]
+    overlapping = same_engineer & (gap < 0)
+    tight = (same_engineer & (gap >= 0) & (gap < TRAVEL_GAP_MINUTES)
+             & (venue[1:] != venue[:-1]))
+    overlaps = np.bincount(group[1:], weights=overlapping, minlength=size)
+    tight_changeovers = np.bincount(group[1:], weights=tight,
+                                    minlength=size)
+
+    return {
+        'engineer_ids': engineer_ids,
+        'events': events,
+        'total_hours': total_minutes / 60,
+        'mean_weekly_hours': total_minutes / 60 / max(weeks_in_range, 1),
+        'max_weekly_hours': max_weekly_minutes / 60,
+        'longest_run_days': longest_run,
+        'late_finishes': late_finishes.astype(np.int64),
+        'tight_changeovers': tight_changeovers.astype(np.int64),
+        'overlaps': overlaps.astype(np.int64),
+    }
+
+
+def utilisation_report(start_date: date, end_date: date) -> list:
+    """
+    Builds the utilisation report for every engineer with bookings in a
+    date range.
+
+    Costs two queries: one for the events and one for engineer names.
+
+    :param start_date: First date included.
+    :type start_date: date
+    :param end_date: Last date included.
+    :type end_date: date
+
+    :returns: One dict per engineer keyed by :data:`REPORT_COLUMNS`,
+              ordered by name.
+    :rtype: list
+    """
+    weeks_in_range = ((end_date - start_date).days + 1 + 6) // 7
+    metrics = compute_metrics(load_arrays(start_date, end_date),
+                              weeks_in_range)
+    if not len(metrics['engineer_ids']):
+        return []
+    names = dict(SoundEngineer.objects
+                 .filter(pk__in=metrics['engineer_ids'].tolist())
+                 .values_list('pk', 'name'))
+    for column in ('total_hours', 'mean_weekly_hours', 'max_weekly_hours'):
+        metrics[column] = metrics[column].round(2)
+    columns = [metrics[column].tolist() for column in REPORT_COLUMNS[1:]]
+    report = [dict(zip(REPORT_COLUMNS, (names.get(pk, pk), *values)))
+              for pk, *values in zip(metrics['engineer_ids'].tolist(),
+                                     *columns)]
+    report.sort(key=lambda row: str(row['engineer']))
+    return report
+
+
+def report_csv_lines(report: list):
+    """
+    Formats a utilisation report as CSV, header first.
+
+    :param report: Rows from :func:`utilisation_report`.
+    :type report: list
+
+    :returns: A generator of CSV lines.
+    :rtype: generator
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(REPORT_COLUMNS)
+    for row in report:
+        yield writer.writerow([row[column] for column in REPORT_COLUMNS])
@@ -1,20 +1,85 @@
+import io
+import secrets
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied, ValidationError
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpRequest
-from django.contrib.auth.decorators import login_required, permission_required
+from django.urls import reverse
+from django.http import (Http404, HttpRequest, HttpResponse,
+                         HttpResponseBadRequest, StreamingHttpResponse)
+from django.contrib.auth.decorators import (login_required,
+                                            permission_required,
+                                            user_passes_test)
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from .models import Event, ContactMessage
-from .forms import EventForm, ContactForm
+from .forms import (EventForm, ContactForm, AutoAssignForm, ImportEventsForm,
+                    ExportFilterForm, SearchForm, DashboardForm,
+                    FreeSlotForm, BulkEditForm, CloneScheduleForm)
+from .assignment import auto_assign
+from .bulk import BulkEditError, bulk_delete_events, bulk_update_events
+from .cloning import clone_schedule
+from .importing import (ImportResult, import_events, iter_csv_rows,
+                        iter_ics_rows)
+from .exporting import csv_lines, export_rows, ics_lines
+from .cache import get_schedule_version
+from .conditional import (engineer_feed_etag, engineer_feed_state,
+                          message_etag, message_last_modified, schedule_etag,
+                          schedule_last_modified)
+from .feeds import feed_body
+from .metrics import collect, render_prometheus
+from .pagination import paginate_keyset
+from .search import search_events
+from .stats import summarise
+from .utilisation import (default_range, report_csv_lines,
+                          utilisation_report)
+from .calendars import CALENDAR_YEARS, build_calendar, month_days, week_days
+from .querybudget import query_budget
 # from django.contrib import messages
 
 # Create your views here.
 
 
+def superuser_check(user) -> bool:
+    """
+    Test for :func:`~django.contrib.auth.decorators.user_passes_test` that
+    answers 403 to logged-in users who are not superusers, rather than
+    sending them back to the login page.
+
+    :raises PermissionDenied: If the user is not a superuser.
+    """
+    if not user.is_superuser:
+        raise PermissionDenied
+    return True
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=schedule_etag, last_modified_func=schedule_last_modified)
+# The page of events, the residencies and exceptions merged into it, and
+# whether anything comes before it: an earlier event or, failing that, an
+# earlier occurrence.
+@query_budget(6)
 def index(request: HttpRequest) -> HttpRequest:
     """
     Displays the main event schedule for logged-in users.
 
-    Events are ordered by date and start time. Superusers see a different
-    template ('planner.html') than regular users ('planner_client.html').
+    Events are ordered by date and start time and served one page at a time
+    using keyset pagination, with the occurrences of residencies merged in.
+    Without a cursor the window starts at today;
+    the ``after`` and ``before`` query parameters move to the next and
+    previous pages. Superusers see a different template ('planner.html')
+    than regular users ('planner_client.html').
+
+    The rendered table is cached per template variant and keyed by the
+    schedule version, so the page of events is only queried when the
+    fragment is missing from the cache. Clients revalidating an unchanged
+    schedule receive a 304 response from the ETag/Last-Modified checks
+    before the view runs at all.
 
     :param request: The HTTP request object.
 
@@ -24,10 +89,23 @@ def index(request: HttpRequest) -> HttpRequest:
 
     :rtype: HttpRequest
     """
-    # Display full entertainment schedule
-    events = Event.objects.all().order_by('date', 'performance_time_start')
+    # Display one window of the entertainment schedule. The page is lazy
+    # so a cached table fragment never touches the events table.
+    today = timezone.localdate()
+    page = SimpleLazyObject(lambda: paginate_keyset(
+        Event.objects.select_related('sound_engineer'),
+        page_size=settings.PLANNER_PAGE_SIZE,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        start_date=today,
+        occurrences=True,
+    ))
     context = {
-        'events': events,
+        'events': page,
+        'page': page,
+        'window_start': today,
+        'schedule_version': get_schedule_version(),
+        'cache_timeout': settings.SCHEDULE_CACHE_TIMEOUT,
     }
     if request.user.is_superuser:
         return render(request, 'pages/planner.html', context)
@@ -35,14 +113,264 @@ def index(request: HttpRequest) -> HttpRequest:
         return render(request, 'pages/planner_client.html', context)
 
 
+def _export_response(request: HttpRequest, formatter, content_type: str,
+                     filename: str):
+    """
+    Streams the filtered schedule through ``formatter``.
+
+    :returns: A streaming response, or a 400 response for invalid filters.
+    :rtype: HttpResponse
+    """
+    form = ExportFilterForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+    response = StreamingHttpResponse(
+        formatter(export_rows(**form.cleaned_data)),
+        content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def export_csv(request: HttpRequest) -> HttpRequest:
+    """
+    Streams the schedule as a CSV file.
+
+    The optional ``start_date``, ``end_date``, ``venue`` and ``engineer``
+    query parameters narrow the export. Rows are read in chunks and written
+    as they arrive, so memory use does not depend on the number of events.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :returns: A streaming CSV attachment.
+
+    :rtype: HttpRequest
+    """
+    return _export_response(request, csv_lines, 'text/csv; charset=utf-8',
+                            'schedule.csv')
+
+
+@login_required
+def export_ics(request: HttpRequest) -> HttpRequest:
+    """
+    Streams the schedule as an iCalendar (.ics) file.
+
+    Accepts the same filters as :func:`export_csv`.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :returns: A streaming iCalendar attachment.
+
+    :rtype: HttpRequest
+    """
+    return _export_response(request, ics_lines,
+                            'text/calendar; charset=utf-8', 'schedule.ics')
+
+
+@condition(etag_func=engineer_feed_etag)
+def engineer_feed(request: HttpRequest, token: str) -> HttpRequest:
+    """
+    Serves a sound engineer's bookings as an iCalendar subscription feed.
+
+    The feed is authenticated by the secret token in its URL rather than a
+    login, so phone calendar apps can subscribe to it. Polls for an
+    unchanged feed are answered with a 304 response after a single lookup
+    of the token; otherwise the body is served from the cache when the
+    engineer's events have not changed since it was built.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :param token: The engineer's feed token.
+
+    :type token: str
+
+    :returns: The engineer's iCalendar feed.
+
+    :rtype: HttpRequest
+    """
+    state = engineer_feed_state(request, token)
+    if state is None:
+        raise Http404("Unknown feed.")
+    response = HttpResponse(feed_body(*state),
+                            content_type='text/calendar; charset=utf-8')
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@login_required
+def calendar_view(request: HttpRequest) -> HttpRequest:
+    """
+    Redirects to the calendar of the current month.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :returns: A redirect to :func:`month_calendar`.
+
+    :rtype: HttpRequest
+    """
+    today = timezone.localdate()
+    return redirect('planner:month_calendar', year=today.year,
+                    month=today.month)
+
+
+def _venue_query(venue: str) -> str:
+    return f"?{urlencode({'venue': venue})}" if venue else ''
+
+
+@login_required
+@query_budget(3)
+def month_calendar(request: HttpRequest, year: int,
+                   month: int) -> HttpRequest:
+    """
+    Displays one month of the schedule as a calendar grid.
+
+    Only the visible dates are queried, with one query for events and, when
+    residencies overlap the month, two for their rules and exceptions.
+    Results can be narrowed to one venue with the ``venue`` parameter.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :param year: The year to show.
+
+    :type year: int
+
+    :param month: The month to show (1-12).
+
+    :type month: int
+
+    :returns: Renders the 'calendar.html' template.
+
+    :rtype: HttpRequest
+    """
+    if not 1 <= month <= 12 or year not in CALENDAR_YEARS:
+        raise Http404("No such month.")
+    venue = request.GET.get('venue', '').strip()
+    first = date(year, month, 1)
+    previous_month = first - timedelta(days=1)
+    next_month = first + timedelta(days=31)
+    query = _venue_query(venue)
+    context = {
+        'weeks': build_calendar(month_days(year, month), venue),
+        'heading': first,
+        'period': 'month',
+        'month': month,
+        'venue': venue,
+        'previous_url': reverse('planner:month_calendar',
+                                args=[previous_month.year,
+                                      previous_month.month]) + query,
+        'next_url': reverse('planner:month_calendar',
+                            args=[next_month.year, next_month.month]) + query,
+    }
+    return render(request, 'pages/calendar.html', context)
+
+
+@login_required
+@query_budget(3)
+def week_calendar(request: HttpRequest, year: int, week: int) -> HttpRequest:
+    """
+    Displays one ISO week of the schedule.
+
+    Accepts the same ``venue`` filter as :func:`month_calendar`.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :param year: The ISO year to show.
+
+    :type year: int
+
+    :param week: The ISO week number to show.
+
+    :type week: int
+
+    :returns: Renders the 'calendar.html' template.
+
+    :rtype: HttpRequest
+    """
+    if year not in CALENDAR_YEARS:
+        raise Http404("No such week.")
+    try:
+        weeks = week_days(year, week)
+    except ValueError:
+        raise Http404("No such week.")
+    venue = request.GET.get('venue', '').strip()
+    monday = weeks[0][0]
+    previous_week = (monday - timedelta(days=7)).isocalendar()
+    next_week = (monday + timedelta(days=7)).isocalendar()
+    query = _venue_query(venue)
+    context = {
+        'weeks': build_calendar(weeks, venue),
+        'heading': monday,
+        'period': 'week',
+        'week': week,
+        'venue': venue,
+        'previous_url': reverse('planner:week_calendar',
+                                args=[previous_week.year,
+                                      previous_week.week]) + query,
+        'next_url': reverse('planner:week_calendar',
+                            args=[next_week.year, next_week.week]) + query,
+    }
+    return render(request, 'pages/calendar.html', context)
+
+
+@login_required
+@query_budget(4)
+def search_view(request: HttpRequest) -> HttpRequest:
+    """
+    Searches performers, venues and event notes.
+
+    Results are ranked by the full-text index (see :mod:`planner.search`)
+    and shown one page at a time.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :returns: Renders the 'search.html' template.
+
+    :rtype: HttpRequest
+    """
+    form = SearchForm(request.GET)
+    query, page = '', 1
+    if form.is_valid():
+        query = form.cleaned_data['q'].strip()
+        page = form.cleaned_data['page'] or 1
+    results, has_next = [], False
+    if query:
+        results, has_next = search_events(query, page,
+                                          settings.PLANNER_PAGE_SIZE)
+    context = {
+        'form': form,
+        'query': query,
+        'results': results,
+        'page': page,
+        'has_next': has_next,
+        'has_previous': page > 1,
+    }
+    return render(request, 'pages/search.html', context)
+
+
 @login_required
 @permission_required('planner.add_event', raise_exception=True)
 def add_event(request: HttpRequest) -> HttpRequest:
     """
     Handles adding new events to the database.
 
-    On a GET request, it displays a blank form. On a POST request, it
-    validates and saves the submitted event details to the database.
+    On a GET request, it displays a blank form; given ``date``, ``start``
+    and ``end`` query parameters it is prefilled with that slot and offers
+    only the sound engineers free for it. On a POST request, it validates
+    and saves the submitted event details to the database.
     Requires 'planner.add_event' permission.
 
     :param request: The HTTP request object (GET or POST).
@@ -67,22 +395,90 @@ def add_event(request: HttpRequest) -> HttpRequest:
             form.save()
             # Redirect thereafter
             return redirect('planner:index')
-    # conditional else return a blank form
+    # conditional else return a blank form, prefilled with a slot (and
+    # only the engineers free for it) when one is given in the URL
     else:
-        form = EventForm()
+        slot = FreeSlotForm(request.GET)
+        if slot.is_valid():
+            form = EventForm(initial={
+                'date': slot.cleaned_data['date'],
+                'performance_time_start': slot.cleaned_data['start'],
+                'performance_time_end': slot.cleaned_data['end'],
+            })
+            form.limit_to_free_engineers(slot.cleaned_data['date'],
+                                         slot.cleaned_data['start'],
+                                         slot.cleaned_data['end'])
+        else:
+            form = EventForm()
     # Serve the initial blank form on the initial GET request.
     return render(request, 'pages/add_event.html', {'form': form})
 
 
+@login_required
+@permission_required('planner.add_event', raise_exception=True)
+def import_events_view(request: HttpRequest) -> HttpRequest:
+    """
+    Handles bulk uploads of events from a CSV or iCalendar file.
+
+    The upload is streamed row by row through the same validation rules as
+    the event form and inserted in batches. Rejected lines are listed with
+    their line number. A file that turns out not to be UTF-8 part way
+    through keeps, and reports, the batches imported before the bad line.
+    Requires 'planner.add_event' permission.
+
+    :param request: The HTTP request object (GET or POST).
+
+    :type request: HttpRequest
+
+    :returns: Renders the 'import_events.html' template with the upload
+              form and, after a POST, the import summary.
+
+    :rtype: HttpRequest
+    """
+    result = None
+    if request.method == 'POST':
+        form = ImportEventsForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            # Read the upload through a text wrapper so it is decoded
+            # lazily instead of being loaded into memory in one piece.
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig',
+                                      newline='')
+            if upload.name.lower().endswith('.ics'):
+                rows = iter_ics_rows(stream)
+            else:
+                rows = iter_csv_rows(stream)
+            result = ImportResult()
+            try:
+                import_events(rows, result=result)
+            except UnicodeDecodeError:
+                form.add_error('file', (
+                    f"The file must be UTF-8 encoded. The {result.created} "
+                    f"event(s) before the undecodable line were imported."))
+            finally:
+                stream.detach()
+    else:
+        form = ImportEventsForm()
+    return render(request, 'pages/import_events.html',
+                  {'form': form, 'result': result})
+
+
 @login_required
 @permission_required('planner.edit_event', raise_exception=True)
+# Six reads for the event, the form and its clash and unavailability
+# checks, then on save the update, the change log entry, both engineers'
+# feed versions, and the statistics and bitmaps of the old and new day.
+# Residencies booking the engineer or venue add an exception read to the
+# clash check and to the bitmap refresh.
+@query_budget(17)
 def edit_event(request: HttpRequest, pk: int) -> HttpRequest:
     """
     Handles editing existing event records.
 
     Retrieves an event instance based on its primary key (pk).
     On a POST request, it updates the event details. On a GET request, it
-    displays the form pre-filled with the existing event's data.
+    displays the form pre-filled with the existing event's data, offering
+    only the sound engineers free for its slot.
     Requires 'planner.edit_event' permission.
 
     :param request: The HTTP request object (GET or POST).
@@ -98,8 +494,10 @@ def edit_event(request: HttpRequest, pk: int) -> HttpRequest:
 
     :rtype: HttpRequest
     """
-    # Retrieve existing event record or 404 if not found.
-    event = get_object_or_404(Event, pk=pk)
+    # Retrieve existing event record or 404 if not found. The engineer is
+    # joined in so rendering the form does not cost an extra lookup.
+    event = get_object_or_404(
+        Event.objects.select_related('sound_engineer'), pk=pk)
     if request.method == 'POST':
         # Bind/Instantiate object submitted data to form for validation
         # to the class EventForm
@@ -109,11 +507,74 @@ def edit_event(request: HttpRequest, pk: int) -> HttpRequest:
             return redirect('planner:index')
     else:
         form = EventForm(instance=event)
+        form.limit_to_free_engineers(event.date,
+                                     event.performance_time_start,
+                                     event.performance_time_end)
     return render(request, 'pages/add_event.html', {'form': form})
 
 
+@login_required
+@permission_required('planner.edit_event', raise_exception=True)
+@query_budget(16)
+def bulk_edit_view(request: HttpRequest) -> HttpRequest:
+    """
+    Applies one change to many events in a single request.
+
+    The events are chosen with the checkboxes on the schedule and passed
+    as repeated ``ids`` parameters. On a GET request, it lists them with
+    the bulk edit form. On a POST request, it moves them, changes their
+    venue or engineer, or deletes them, all in one transaction; if any
+    event would clash, nothing is changed and the clashes are listed.
+    Requires 'planner.edit_event' permission, and 'planner.delete_view'
+    to delete.
+
+    :param request: The HTTP request object (GET or POST).
+
+    :type request: HttpRequest
+
+    :returns: Redirects to the index page after a successful change,
+              otherwise renders the 'bulk_edit.html' template.
+
+    :rtype: HttpRequest
+    """
+    if request.method == 'POST':
+        form = BulkEditForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            try:
+                if data['action'] == BulkEditForm.DELETE:
+                    if not request.user.has_perm('planner.delete_view'):
+                        raise PermissionDenied
+                    bulk_delete_events(data['ids'])
+                else:
+                    bulk_update_events(data['ids'], shift=data['shift'],
+                                       venue=data['venue'],
+                                       engineer=data['sound_engineer'],
+                                       unassign=data['unassign'])
+            except BulkEditError as error:
+                for message in error.messages:
+                    form.add_error(None, message)
+            else:
+                return redirect('planner:index')
+        ids = form.cleaned_data.get('ids', [])
+    else:
+        form = BulkEditForm(initial={'ids': request.GET.getlist('ids')})
+        try:
+            ids = form.fields['ids'].clean(request.GET.getlist('ids'))
+        except ValidationError:
+            ids = []
+    events = (Event.objects.filter(pk__in=ids)
+              .select_related('sound_engineer').defer('event_notes'))
+    return render(request, 'pages/bulk_edit.html',
+                  {'form': form, 'events': events})
+
+
 @login_required
 @permission_required('planner.delete_view', raise_exception=True)
+# The event, then the delete with its change log entry, feed version,
+# statistics and bitmap refresh, which reads residency exceptions when the
+# engineer has a residency then.
+@query_budget(9)
 def delete_view(request: HttpRequest, pk: int) -> HttpRequest:
     """
     Handles deleting an event record from the database.
@@ -136,8 +597,9 @@ def delete_view(request: HttpRequest, pk: int) -> HttpRequest:
     :rtype: HttpRequest
     """
     # Retrieve existing event record from model file with
-    #  pk or 404 if not found.
-    event = get_object_or_404(Event, pk=pk)
+    #  pk or 404 if not found. The confirmation page only shows the
+    # event's own columns, so the notes are left out.
+    event = get_object_or_404(Event.objects.defer('event_notes'), pk=pk)
     # Conditional, if POST, delete
     if request.method == 'POST':
         # Update table with delete.
@@ -151,6 +613,161 @@ def delete_view(request: HttpRequest, pk: int) -> HttpRequest:
         return render(request, 'pages/confirm_delete.html', {'event': event})
 
 
+# Weeks shown by the dashboard either side of the current week by default.
+DASHBOARD_WEEKS_BEFORE = 4
+DASHBOARD_WEEKS_AFTER = 8
+
+
+@login_required
+@user_passes_test(superuser_check)
+@query_budget(3)
+def dashboard_view(request: HttpRequest) -> HttpRequest:
+    """
+    Shows booking totals per venue, per engineer and per week.
+
+    Reads only the daily statistics table (see :mod:`planner.stats`), so
+    the cost does not grow with the number of events. Residency
+    occurrences are not counted, as the page says. Defaults to the weeks
+    around the current one. Restricted to superusers.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :returns: Renders the 'dashboard.html' template.
+
+    :rtype: HttpRequest
+    """
+    monday = timezone.localdate()
+    monday -= timedelta(days=monday.weekday())
+    start_date = monday - timedelta(weeks=DASHBOARD_WEEKS_BEFORE)
+    end_date = (monday + timedelta(weeks=DASHBOARD_WEEKS_AFTER)
+                - timedelta(days=1))
+    form = DashboardForm(request.GET or None,
+                         initial={'start_date': start_date,
+                                  'end_date': end_date})
+    if form.is_valid():
+        start_date = form.cleaned_data['start_date'] or start_date
+        end_date = form.cleaned_data['end_date'] or end_date
+    context = {'form': form, 'start_date': start_date, 'end_date': end_date}
+    if not form.is_bound or form.is_valid():
+        context.update(summarise(start_date, end_date))
+    return render(request, 'pages/dashboard.html', context)
+
+
+@login_required
+@user_passes_test(superuser_check)
+@query_budget(2)
+def utilisation_view(request: HttpRequest) -> HttpRequest:
+    """
+    Shows the sound engineer utilisation report for a date range.
+
+    Counts one-off events only, not residency occurrences. Defaults to
+    the last twelve weeks. With ``format=csv`` the report is downloaded as
+    CSV instead. Restricted to superusers.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :returns: Renders the 'utilisation.html' template, or the CSV file.
+
+    :rtype: HttpRequest
+    """
+    start_date, end_date = default_range()
+    form = DashboardForm(request.GET or None,
+                         initial={'start_date': start_date,
+                                  'end_date': end_date})
+    if form.is_bound and not form.is_valid():
+        return render(request, 'pages/utilisation.html', {'form': form})
+    if form.is_bound:
+        start_date = form.cleaned_data['start_date'] or start_date
+        end_date = form.cleaned_data['end_date'] or end_date
+    report = utilisation_report(start_date, end_date)
+
+    if request.GET.get('format') == 'csv':
+        response = HttpResponse(report_csv_lines(report),
+                                content_type='text/csv')
+        response['Content-Disposition'] = (
+            f'attachment; filename="utilisation-{start_date:%Y%m%d}-'
+            f'{end_date:%Y%m%d}.csv"')
+        return response
+    context = {'form': form, 'report': report, 'start_date': start_date,
+               'end_date': end_date}
+    return render(request, 'pages/utilisation.html', context)
+
+
+@login_required
+@permission_required('planner.can_manage_event_engineer',
+                     raise_exception=True)
+def auto_assign_view(request: HttpRequest) -> HttpRequest:
+    """
+    Assigns sound engineers to every unassigned event in a date range.
+
+    On a GET request, it displays the date range form. On a POST request,
+    it runs the automatic assignment (or previews it) and shows which
+    events were filled and how many slots could not be covered.
+    Requires 'planner.can_manage_event_engineer' permission.
+
+    :param request: The HTTP request object (GET or POST).
+
+    :type request: HttpRequest
+
+    :returns: Renders the 'auto_assign.html' template with the form and,
+              after a POST, the assignment result.
+
+    :rtype: HttpRequest
+    """
+    result = None
+    if request.method == 'POST':
+        form = AutoAssignForm(request.POST)
+        if form.is_valid():
+            result = auto_assign(form.cleaned_data['start_date'],
+                                 form.cleaned_data['end_date'],
+                                 commit=not form.cleaned_data['dry_run'])
+    else:
+        form = AutoAssignForm()
+    return render(request, 'pages/auto_assign.html',
+                  {'form': form, 'result': result})
+
+
+@login_required
+@user_passes_test(superuser_check)
+def clone_schedule_view(request: HttpRequest) -> HttpRequest:
+    """
+    Copies a date range of the schedule to another period.
+
+    On a GET request, it displays the form. On a POST request, it copies
+    the events (or previews the copy) and lists the new events alongside
+    the ones skipped because they clash at the target.
+    Restricted to superusers.
+
+    :param request: The HTTP request object (GET or POST).
+
+    :type request: HttpRequest
+
+    :returns: Renders the 'clone_schedule.html' template with the form
+              and, after a POST, the copy result.
+
+    :rtype: HttpRequest
+    """
+    result = None
+    if request.method == 'POST':
+        form = CloneScheduleForm(request.POST)
+        if form.is_valid():
+            data = form.cleaned_data
+            result = clone_schedule(data['start_date'], data['end_date'],
+                                    data['target_start'],
+                                    keep_engineers=data['keep_engineers'],
+                                    keep_notes=data['keep_notes'],
+                                    align_weekdays=data['align_weekdays'],
+                                    commit=not data['dry_run'])
+    else:
+        form = CloneScheduleForm()
+    return render(request, 'pages/clone_schedule.html',
+                  {'form': form, 'result': result})
+
+
 def contact_view(request: HttpRequest) -> HttpRequest:
     """
     Handles contact form submissions.
@@ -180,11 +797,14 @@ def contact_view(request: HttpRequest) -> HttpRequest:
     return render(request, 'pages/contact.html', {'form': form})
 
 
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=message_etag, last_modified_func=message_last_modified)
 def display_message(request: HttpRequest, pk: int) -> HttpRequest:
     """
     Displays the contents of a submitted contact message.
 
     Retrieves a ContactMessage instance based on its primary key (pk).
+    Revalidation of an unchanged message is answered with a 304 response.
 
     :param request: The HTTP request object.
 
@@ -215,3 +835,31 @@ def conditions_view(request: HttpRequest) -> HttpRequest:
     :rtype: HttpRequest
     """
     return render(request, 'pages/conditions.html')
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """
+    Exposes the per-route request metrics of every worker in the
+    Prometheus text format.
+
+    Open to requests sending ``Authorization: Bearer <METRICS_TOKEN>``
+    (the scraper) and to superusers. The client address is not trusted,
+    since behind a reverse proxy every request comes from the proxy.
+
+    :param request: The HTTP request object.
+
+    :type request: HttpRequest
+
+    :returns: The metrics as plain text.
+
+    :rtype: HttpResponse
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not (token and secrets.compare_digest(
+                authorization.encode(), f'Bearer {token}'.encode())
+            or request.user.is_superuser):
+        raise PermissionDenied
+    return HttpResponse(render_prometheus(collect()),
+                        content_type='text/plain; version=0.0.4; '
+                                     'charset=utf-8')
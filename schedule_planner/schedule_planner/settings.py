@@ -15,6 +15,8 @@ from django.urls import reverse_lazy
 
 # Import os for environment variables and dj_database_url for PostgreSQL
 import os
+import sys
+import tempfile
 import dj_database_url  # Already there, good!
 
 # Add this import for WhiteNoise static files (after installing WhiteNoise)
@@ -27,6 +29,9 @@ import dj_database_url  # Already there, good!
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Running under ``manage.py test``.
+TESTING = sys.argv[1:2] == ['test']
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
@@ -83,6 +88,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so the timings cover the rest of the middleware too.
+    "planner.middleware.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -97,7 +104,8 @@ ROOT_URLCONF = "schedule_planner.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # The standard Django backend, timing renders for Server-Timing.
+        "BACKEND": "planner.templating.TimedDjangoTemplates",
         "DIRS": [],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -131,6 +139,32 @@ if 'DATABASE_URL' in os.environ:
     )
 
 
+# Cache
+# A file-based cache is shared by every gunicorn worker of this checkout,
+# which keeps the schedule version and cached fragments consistent between
+# them. It lives inside the project so other checkouts on the host never
+# read it; tests use a private in-memory cache.
+
+if TESTING:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ.get("DJANGO_CACHE_DIR",
+                                       BASE_DIR / ".cache"),
+        }
+    }
+
+# Lifetime in seconds of cached schedule fragments. Fragments are keyed by
+# the schedule version, so this only bounds how long stale entries linger.
+SCHEDULE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -175,6 +209,64 @@ STORAGES = {
 # Restricted View redirect
 LOGIN_URL = reverse_lazy('accounts:login')
 
+# Number of events shown per page of the schedule.
+PLANNER_PAGE_SIZE = 50
+
+# Serve the schedule, message, export and feed pages with the async views in
+# planner.async_views. Set by the uvicorn deployment profile
+# (gunicorn_asgi.conf.py); leave off under WSGI.
+PLANNER_ASYNC_VIEWS = os.environ.get("DJANGO_ASYNC_VIEWS", "False") == "True"
+
+# Raise instead of logging when a view exceeds its query budget; on under
+# the test runner so a regression fails the suite.
+QUERY_BUDGET_RAISE = TESTING
+
+# Performance instrumentation. Each worker writes its request metrics to a
+# file in METRICS_DIR, and /metrics adds them up; it is served to requests
+# sending "Authorization: Bearer <METRICS_TOKEN>" (the Prometheus scraper)
+# and to superusers. ``manage.py clear_metrics`` empties METRICS_DIR before
+# the server starts.
+SERVER_TIMING_HEADER = True
+METRICS_DIR = os.environ.get(
+    "DJANGO_METRICS_DIR",
+    os.path.join(tempfile.gettempdir(), "schedule_planner_metrics"))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Statements slower than this many milliseconds are written, with their
+# query plan, to the slow-query log (None turns it off). Every worker
+# appends to the same file, so it is rotated by logrotate rather than by
+# the workers, e.g. "size 5M", "rotate 3" and "delaycompress"; each worker
+# reopens the file once it has been moved. The slow_queries command reads
+# the first SLOW_QUERY_LOG_BACKUPS uncompressed backups as well.
+SLOW_QUERY_THRESHOLD_MS = int(os.environ.get("SLOW_QUERY_THRESHOLD_MS", 200))
+SLOW_QUERY_LOG = os.environ.get(
+    "SLOW_QUERY_LOG",
+    os.path.join(tempfile.gettempdir(), "schedule_planner_slow_queries.log"))
+SLOW_QUERY_LOG_BACKUPS = 1
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "message": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "slow_queries": {
+            "class": "logging.handlers.WatchedFileHandler",
+            "filename": SLOW_QUERY_LOG,
+            "formatter": "message",
+            "delay": True,
+        },
+    },
+    "loggers": {
+        "planner.slowqueries": {
+            "handlers": ["slow_queries"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
+
 # Bootstratp & Crispy Form
 
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"